@@ -10,8 +10,10 @@ from app.views.business import init_app as init_business_views
 from app.views.underwriting import bp as underwriting_bp
 from app.views.underwriting.ai_parameter import bp as ai_parameter_bp
 from app.models.auth.user import User
+from app.utils.serialization import FastJSONProvider
+from app.utils.metrics import init_metrics
+from app.utils.nplusone import init_nplusone
 import logging
-from logging.handlers import RotatingFileHandler
 import psutil
 from sqlalchemy import text, inspect
 import psycopg2
@@ -31,10 +33,19 @@ def create_app(config_class=None):
     app.config.from_object(config_class)
     logger.info(f'已加载配置: {config_class.__name__}')
     
+    # JSON序列化使用更快的编码器(安装了orjson时使用orjson)
+    app.json = FastJSONProvider(app)
+    
     # 初始化日志
     init_logging(app)
     logger.info('日志系统初始化完成')
     
+    # 请求性能指标(Server-Timing响应头和/metrics)
+    init_metrics(app)
+    
+    # N+1查询检测(按配置启用)
+    init_nplusone(app)
+    
     # 添加健康检查端点 (最优先)
     @app.route('/health')
     def health_check():
@@ -55,50 +66,24 @@ def create_app(config_class=None):
     @app.route('/admin')
     @app.route('/admin/')
     def admin_index():
-        logger.info('[路由] /admin 路径请求:', {
-            'path': '/admin',
-            'method': 'GET',
-            'headers': dict(request.headers),
-            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
-        })
         response = send_from_directory('static/admin', 'index.html')
         response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, post-check=0, pre-check=0, max-age=0'
         response.headers['Pragma'] = 'no-cache'
         response.headers['Expires'] = '-1'
-        logger.info('[路由] /admin 响应完成:', {
-            'status_code': response.status_code,
-            'content_type': response.content_type,
-            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
-        })
+        logger.debug('[路由] %s %s %s', request.path, response.status_code, response.content_type)
         return response
     
     @app.route('/login.html')
     def login_page():
-        logger.info('[路由] /login.html 路径请求:', {
-            'path': '/login.html',
-            'method': 'GET',
-            'headers': dict(request.headers),
-            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
-        })
         response = send_from_directory('static/admin', 'index.html')
         response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, post-check=0, pre-check=0, max-age=0'
         response.headers['Pragma'] = 'no-cache'
         response.headers['Expires'] = '-1'
-        logger.info('[路由] /login.html 响应完成:', {
-            'status_code': response.status_code,
-            'content_type': response.content_type,
-            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
-        })
+        logger.debug('[路由] %s %s %s', request.path, response.status_code, response.content_type)
         return response
     
     @app.route('/admin/<path:path>')
     def serve_admin(path):
-        logger.info('[路由] /admin/* 路径请求:', {
-            'path': f'/admin/{path}',
-            'method': 'GET',
-            'headers': dict(request.headers),
-            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
-        })
         response = send_from_directory('static/admin', path)
         if path.endswith('.html'):
             response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, post-check=0, pre-check=0, max-age=0'
@@ -107,13 +92,7 @@ def create_app(config_class=None):
         else:
             # 为静态资源设置适当的缓存
             response.headers['Cache-Control'] = 'public, max-age=31536000'
-        logger.info('[路由] /admin/* 响应完成:', {
-            'path': f'/admin/{path}',
-            'status_code': response.status_code,
-            'content_type': response.content_type,
-            'is_html': path.endswith('.html'),
-            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
-        })
+        logger.debug('[路由] %s %s %s', request.path, response.status_code, response.content_type)
         return response
     
     # 移动端资源文件路由
@@ -266,31 +245,13 @@ def create_app(config_class=None):
     app.register_blueprint(underwriting_bp, url_prefix='/api/v1/underwriting')
     logger.info('核保规则蓝图注册完成')
 
-    # 配置日志
-    if not app.debug and not app.testing:
-        if os.environ.get('LOG_TO_STDOUT', 'true').lower() == 'true':
-            stream_handler = logging.StreamHandler()
-            stream_handler.setFormatter(logging.Formatter(
-                '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
-            ))
-            stream_handler.setLevel(logging.INFO)
-            app.logger.addHandler(stream_handler)
-        else:
-            if not os.path.exists('logs'):
-                os.mkdir('logs')
-            file_handler = RotatingFileHandler(
-                'logs/app.log',
-                maxBytes=10240,
-                backupCount=10
-            )
-            file_handler.setFormatter(logging.Formatter(
-                '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
-            ))
-            file_handler.setLevel(logging.INFO)
-            app.logger.addHandler(file_handler)
-        
-        app.logger.setLevel(logging.INFO)
-        app.logger.info('应用启动')
+    # 上次运行遗留的导入任务(进程退出时仍在pending/processing)标记为失败
+    from app.services.underwriting.import_jobs import fail_orphaned_records
+    with app.app_context():
+        fail_orphaned_records()
+
+    # 日志处理器已在init_logging中配置在根日志记录器上，app.logger不再单独添加
+    app.logger.info('应用启动')
     
     logger.info('应用初始化完成')
     return app
@@ -11,6 +11,7 @@ from .company import (
 )
 from .product_type import get_product_types, get_product_type
 from .product import get_products, get_product, create_product, update_product, delete_product
+from app.utils.conditional import add_etag
 import logging
 
 logger = logging.getLogger(__name__)
@@ -62,6 +63,9 @@ def log_request():
     if request.is_json:
         logger.info(f'JSON数据: {request.get_json()}')
 
+# 为GET请求的JSON响应补充ETag
+bp.after_request(add_etag)
+
 # 添加请求后的日志记录
 @bp.after_request
 def log_response(response):
@@ -1,6 +1,9 @@
 from flask import request, jsonify
 from app.services.business.channel import ChannelService
 from app.utils.response import success_response, error_response
+from app.utils.pagination import parse_count_mode
+from app.utils.conditional import conditional
+from app.models.business.channel import Channel
 from app.decorators import login_required
 import traceback
 from app.extensions import db
@@ -11,6 +14,7 @@ logger = logging.getLogger(__name__)
 channel_service = ChannelService()
 
 @login_required
+@conditional(Channel)
 def get_channels():
     """获取渠道列表"""
     try:
@@ -19,27 +23,33 @@ def get_channels():
         page_size = request.args.get('pageSize', 20, type=int)
         keyword = request.args.get('keyword', '')
         status = request.args.get('status', '')
+        cursor = request.args.get('cursor')
+        try:
+            count = parse_count_mode(request.args.get('count'))
+        except ValueError as e:
+            return error_response(400, str(e))
         
-        logger.info(f'获取渠道列表请求参数: page={page}, page_size={page_size}, keyword={keyword}, status={status}')
+        logger.info(f'获取渠道列表请求参数: page={page}, page_size={page_size}, keyword={keyword}, status={status}, cursor={cursor}, count={count}')
         
         # 获取数据
-        items, total = channel_service.get_channel_list(
-            page=page,
-            page_size=page_size,
-            keyword=keyword,
-            status=status
-        )
+        try:
+            page_result = channel_service.get_channel_list(
+                page=page,
+                page_size=page_size,
+                keyword=keyword,
+                status=status,
+                cursor=cursor,
+                count=count
+            )
+        except ValueError as e:
+            return error_response(400, str(e))
         
         # 返回结果
         result = {
-            'list': [item.to_dict() for item in items],
-            'pagination': {
-                'current': page,
-                'pageSize': page_size,
-                'total': total
-            }
+            'list': [item.to_dict() for item in page_result.items],
+            'pagination': page_result.pagination()
         }
-        logger.info(f'获取渠道列表成功: total={total}')
+        logger.info(f'获取渠道列表成功: total={page_result.total}')
         return success_response(result)
     except Exception as e:
         logger.error(f'获取渠道列表失败: {str(e)}')
@@ -48,6 +58,7 @@ def get_channels():
         return error_response(500, f'获取渠道列表失败: {str(e)}')
 
 @login_required
+@conditional(Channel)
 def get_channel(id):
     """获取渠道详情"""
     try:
@@ -158,6 +169,7 @@ def delete_channel(id):
         db.session.rollback()
         return error_response(500, f'删除渠道失败: {str(e)}')
 
+@conditional(Channel)
 def get_public_channels():
     """获取公开渠道列表（测试用）"""
     try:
@@ -166,27 +178,33 @@ def get_public_channels():
         page_size = request.args.get('pageSize', 20, type=int)
         keyword = request.args.get('keyword', '')
         status = request.args.get('status', '')
+        cursor = request.args.get('cursor')
+        try:
+            count = parse_count_mode(request.args.get('count'))
+        except ValueError as e:
+            return error_response(400, str(e))
         
-        logger.info(f'获取公开渠道列表请求参数: page={page}, page_size={page_size}, keyword={keyword}, status={status}')
+        logger.info(f'获取公开渠道列表请求参数: page={page}, page_size={page_size}, keyword={keyword}, status={status}, cursor={cursor}, count={count}')
         
         # 获取数据
-        items, total = channel_service.get_channel_list(
-            page=page,
-            page_size=page_size,
-            keyword=keyword,
-            status=status
-        )
+        try:
+            page_result = channel_service.get_channel_list(
+                page=page,
+                page_size=page_size,
+                keyword=keyword,
+                status=status,
+                cursor=cursor,
+                count=count
+            )
+        except ValueError as e:
+            return error_response(400, str(e))
         
         # 返回结果
         result = {
-            'list': [item.to_dict() for item in items],
-            'pagination': {
-                'current': page,
-                'pageSize': page_size,
-                'total': total
-            }
+            'list': [item.to_dict() for item in page_result.items],
+            'pagination': page_result.pagination()
         }
-        logger.info(f'获取公开渠道列表成功: total={total}')
+        logger.info(f'获取公开渠道列表成功: total={page_result.total}')
         return success_response(result)
     except Exception as e:
         logger.error(f'获取公开渠道列表失败: {str(e)}')
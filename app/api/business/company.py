@@ -1,6 +1,9 @@
 from flask import request
 from app.services.business.company import CompanyService
 from app.utils.response import success_response, error_response
+from app.utils.pagination import parse_count_mode
+from app.utils.conditional import conditional
+from app.models.business.company.insurance_company import InsuranceCompany
 from app.decorators import login_required
 import traceback
 from app.extensions import db
@@ -11,6 +14,7 @@ logger = logging.getLogger(__name__)
 company_service = CompanyService()
 
 @login_required
+@conditional(InsuranceCompany)
 def get_companies():
     """获取保险公司列表"""
     try:
@@ -20,28 +24,34 @@ def get_companies():
         name = request.args.get('name', '')
         code = request.args.get('code', '')
         status = request.args.get('status', '')
+        cursor = request.args.get('cursor')
+        try:
+            count = parse_count_mode(request.args.get('count'))
+        except ValueError as e:
+            return error_response(400, str(e))
         
-        logger.info(f'API层 - 获取保险公司列表，请求参数: page={page}, per_page={per_page}, name={name}, code={code}, status={status}')
+        logger.info(f'API层 - 获取保险公司列表，请求参数: page={page}, per_page={per_page}, name={name}, code={code}, status={status}, cursor={cursor}, count={count}')
         
         # 获取数据
-        items, total = company_service.get_company_list(
-            page=page,
-            per_page=per_page,
-            name=name,
-            code=code,
-            status=status
-        )
+        try:
+            page_result = company_service.get_company_list(
+                page=page,
+                per_page=per_page,
+                name=name,
+                code=code,
+                status=status,
+                cursor=cursor,
+                count=count
+            )
+        except ValueError as e:
+            return error_response(400, str(e))
         
         # 返回结果
         result = {
-            'list': items,
-            'pagination': {
-                'current': page,
-                'pageSize': per_page,
-                'total': total
-            }
+            'list': page_result.items,
+            'pagination': page_result.pagination()
         }
-        logger.info(f'API层 - 获取保险公司列表成功: total={total}')
+        logger.info(f'API层 - 获取保险公司列表成功: total={page_result.total}')
         return success_response(result)
     except Exception as e:
         logger.error(f'API层 - 获取保险公司列表失败: {str(e)}')
@@ -50,6 +60,7 @@ def get_companies():
         return error_response(500, f'获取保险公司列表失败: {str(e)}')
 
 @login_required
+@conditional(InsuranceCompany)
 def get_company(id):
     """获取保险公司详情"""
     try:
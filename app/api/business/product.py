@@ -1,6 +1,7 @@
 from flask import Blueprint, request
 from app.utils.response import success_response, error_response
-from app.services.business.product import ProductService
+from app.services.business.product import PRODUCT_MODELS, ProductService
+from app.utils.conditional import conditional
 from app.decorators import login_required
 import logging
 import traceback
@@ -11,6 +12,7 @@ bp = Blueprint('product', __name__)
 
 @bp.route('/products', methods=['GET'])
 @login_required
+@conditional(*PRODUCT_MODELS)
 def get_products():
     """获取产品列表"""
     try:
@@ -63,6 +65,7 @@ def get_products():
 
 @bp.route('/products/<int:id>', methods=['GET'])
 @login_required
+@conditional(*PRODUCT_MODELS)
 def get_product(id):
     """获取单个产品"""
     try:
@@ -1,6 +1,7 @@
 from flask import Blueprint, request
 from app.utils.response import success_response, error_response
 from app.models.business.product.product_type import ProductType
+from app.utils.conditional import conditional
 from app.decorators import login_required
 import logging
 
@@ -10,6 +11,7 @@ bp = Blueprint('product_type', __name__)
 
 @bp.route('/product-types', methods=['GET'])
 @login_required
+@conditional(ProductType)
 def get_product_types():
     """获取产品类型列表"""
     try:
@@ -37,6 +39,7 @@ def get_product_types():
 
 @bp.route('/product-types/<int:id>', methods=['GET'])
 @login_required
+@conditional(ProductType)
 def get_product_type(id):
     """获取单个产品类型"""
     try:
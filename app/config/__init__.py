@@ -84,8 +84,53 @@ class Config:
     # Session配置
     PERMANENT_SESSION_LIFETIME = timedelta(days=7)
     
+    IMPORT_JOB_WORKERS = int(os.environ.get('IMPORT_JOB_WORKERS', 2))  # 后台导入任务线程数
+    IMPORT_JOB_STALE_AFTER = int(os.environ.get('IMPORT_JOB_STALE_AFTER', 6 * 3600))  # 启动时其他主机遗留的导入记录超过该秒数标记为失败
+    RULE_ARTIFACT_DIR = os.environ.get('RULE_ARTIFACT_DIR')  # 规则二进制制品目录，默认为instance/rule_artifacts
+    
+    # 批量核保评估单次请求的最大申请人数
+    UNDERWRITING_BATCH_MAX_SIZE = int(os.environ.get('UNDERWRITING_BATCH_MAX_SIZE', 10000))
+    # 申请人数达到该值时使用向量化评估内核(需要安装numpy)，0表示不使用
+    UNDERWRITING_VECTOR_MIN_BATCH = int(os.environ.get('UNDERWRITING_VECTOR_MIN_BATCH', 256))
+    
+    # 规则图缓存核对规则数据水位的最小间隔(秒)，其他进程修改规则数据后最迟在该间隔后重新编译，0表示每次都核对
+    RULE_GRAPH_CHECK_INTERVAL = float(os.environ.get('RULE_GRAPH_CHECK_INTERVAL', 2))
+    
+    # 疾病评估结果缓存：最多缓存的结果数(0表示不缓存)和估算的内存上限(字节)
+    EVALUATION_CACHE_MAX_ENTRIES = int(os.environ.get('EVALUATION_CACHE_MAX_ENTRIES', 100000))
+    EVALUATION_CACHE_MAX_BYTES = int(os.environ.get('EVALUATION_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    
+    # 疾病结果表：枚举答案路径时每个疾病最多保存的条目数，超过时该疾病不建表，评估时在规则图上行走
+    OUTCOME_TABLE_MAX_ENTRIES = int(os.environ.get('OUTCOME_TABLE_MAX_ENTRIES', 4096))
+    
+    # 疾病、疾病大类等参考数据缓存的过期时间(秒)，失效通知只在当前进程生效，其他进程依靠过期刷新
+    REFERENCE_CACHE_TTL = int(os.environ.get('REFERENCE_CACHE_TTL', 300))
+    
+    # 问卷会话：进程内最多保存的会话数和空闲过期时间(秒)，过期或被淘汰的会话可由会话令牌恢复
+    QUESTIONNAIRE_SESSION_MAX = int(os.environ.get('QUESTIONNAIRE_SESSION_MAX', 10000))
+    QUESTIONNAIRE_SESSION_TTL = int(os.environ.get('QUESTIONNAIRE_SESSION_TTL', 1800))
+    
+    # 请求性能指标：Server-Timing响应头和/metrics端点
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    # /metrics和/metrics/reset是内部端点，默认不注册；/metrics需要登录或携带采集令牌(Authorization: Bearer <METRICS_TOKEN>)
+    METRICS_ENDPOINT_ENABLED = os.environ.get('METRICS_ENDPOINT_ENABLED', 'false').lower() == 'true'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    
+    # N+1查询检测：off/log/raise，同一形状的查询在一个请求中达到阈值时记录或抛出异常
+    NPLUSONE_DETECT = os.environ.get('NPLUSONE_DETECT', 'off')
+    NPLUSONE_THRESHOLD = int(os.environ.get('NPLUSONE_THRESHOLD', 5))
+    
     # 日志配置
     LOG_TO_STDOUT = os.environ.get('LOG_TO_STDOUT', 'true').lower() == 'true'
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')  # 根日志级别
+    LOG_LEVELS = os.environ.get('LOG_LEVELS', '')  # 按日志记录器设置级别，如 app.models=WARNING,sqlalchemy.engine=INFO
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')  # text 或 json
+    LOG_SAMPLE_RATE = int(os.environ.get('LOG_SAMPLE_RATE', 1))  # DEBUG日志每N条保留1条
+    LOG_FILE = os.environ.get('LOG_FILE', os.path.join('logs', 'app.log'))  # LOG_TO_STDOUT为false时写入的文件
+    LOG_FILE_MAX_BYTES = int(os.environ.get('LOG_FILE_MAX_BYTES', 50 * 1024 * 1024))  # 单个日志文件大小上限
+    LOG_FILE_BACKUP_COUNT = int(os.environ.get('LOG_FILE_BACKUP_COUNT', 10))  # 保留的轮转文件数
+    LOG_FILE_FORMAT = os.environ.get('LOG_FILE_FORMAT', 'json')  # 日志文件格式，默认JSON Lines
+    LOG_QUEUE = os.environ.get('LOG_QUEUE', 'true').lower() == 'true'  # 经队列由后台线程写出日志
     
     @staticmethod
     def init_app(app):
@@ -102,6 +147,7 @@ class ProductionConfig(Config):
 
 class TestingConfig(Config):
     TESTING = True
+    NPLUSONE_DETECT = os.environ.get('NPLUSONE_DETECT', 'raise')
 
 def get_config():
     return Config 
\ No newline at end of file
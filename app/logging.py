@@ -1,10 +1,45 @@
+"""日志系统
+
+所有日志经根日志记录器上的 ``QueueHandler`` 放入队列，由后台线程(``QueueListener``)
+格式化并写出，请求线程不做格式化和I/O。
+
+配置项(均可通过同名环境变量设置):
+
+- ``LOG_LEVEL``: 根日志级别，默认INFO
+- ``LOG_LEVELS``: 按日志记录器设置级别，如 ``app.models=WARNING,sqlalchemy.engine=INFO``
+- ``LOG_FORMAT``: 标准输出的格式，``text``(默认) 或 ``json``(每行一个JSON对象，``extra`` 中的字段原样输出)
+- ``LOG_SAMPLE_RATE``: DEBUG日志每个记录器每N条只保留1条，默认1(全部保留)
+- ``LOG_TO_STDOUT``: 输出到标准输出(默认)，否则写入 ``LOG_FILE``
+- ``LOG_FILE``: 日志文件，默认 logs/app.log，按 ``LOG_FILE_MAX_BYTES``(默认50MB)
+  和 ``LOG_FILE_BACKUP_COUNT``(默认10)轮转，格式由 ``LOG_FILE_FORMAT`` 指定，默认JSON Lines
+- ``LOG_QUEUE``: 默认true；为false时在调用线程中同步写出，仅用于排查问题和性能对比
+"""
 import os
+import sys
+import json
+import queue
+import atexit
 import logging
-from logging.handlers import RotatingFileHandler
+import itertools
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from functools import wraps
+from typing import Dict
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s [in %(pathname)s:%(lineno)d]'
+
+DEFAULT_LOG_FILE = os.path.join('logs', 'app.log')
+DEFAULT_FILE_MAX_BYTES = 50 * 1024 * 1024
+DEFAULT_FILE_BACKUP_COUNT = 10
+
+# LogRecord的标准属性，其余属性视为通过extra传入的结构化字段
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
 
 # 全局变量用于跟踪初始化状态
 _is_initialized = False
+_listener = None
+_atexit_registered = False
 
 def singleton_init(func):
     """确保函数只执行一次的装饰器"""
@@ -16,42 +51,191 @@ def singleton_init(func):
             return func(*args, **kwargs)
     return wrapper
 
-@singleton_init
-def init_logging(app):
-    """初始化日志系统"""
-    # 创建logs目录
-    if not os.path.exists('logs'):
-        os.mkdir('logs')
-        
-    # 设置日志文件
-    file_handler = RotatingFileHandler(
-        'logs/app.log',
-        maxBytes=10240,
-        backupCount=10
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出为一行JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc_info'] = record.exc_text
+        if record.stack_info:
+            entry['stack_info'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """高频DEBUG日志采样：每个日志记录器每rate条保留1条，更高级别的日志全部保留"""
+
+    def __init__(self, rate: int = 1, level: int = logging.DEBUG):
+        super().__init__()
+        self.rate = max(int(rate), 1)
+        self.level = level
+        self._counters: Dict[str, itertools.count] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate == 1 or record.levelno > self.level:
+            return True
+        counter = self._counters.get(record.name)
+        if counter is None:
+            with self._lock:
+                counter = self._counters.setdefault(record.name, itertools.count())
+        return next(counter) % self.rate == 0
+
+
+class LazyQueueHandler(QueueHandler):
+    """放入队列前不格式化消息
+
+    标准的 ``QueueHandler.prepare`` 会在调用线程中格式化消息和异常堆栈，
+    这里只把参数转为字符串(保证跨线程安全)，格式化由监听线程完成。
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info and not record.exc_text:
+            # 异常对象持有栈帧，在调用线程中转为文本
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+def parse_levels(spec: str) -> Dict[str, int]:
+    """解析 ``name=LEVEL,name=LEVEL`` 形式的日志级别配置"""
+    levels = {}
+    for item in (spec or '').split(','):
+        name, _, level = item.partition('=')
+        name, level = name.strip(), level.strip().upper()
+        if not name or not level:
+            continue
+        value = logging.getLevelName(level)
+        if isinstance(value, int):
+            levels[name] = value
+    return levels
+
+
+def _setting(config, name: str, default):
+    """读取配置项，配置中没有时读取同名环境变量"""
+    value = config.get(name) if config is not None else None
+    if value is None:
+        value = os.environ.get(name, default)
+    return value
+
+
+def _flag(config, name: str, default: bool) -> bool:
+    value = _setting(config, name, default)
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
+
+
+def build_formatter(fmt: str = 'text') -> logging.Formatter:
+    if (fmt or 'text').lower() == 'json':
+        return JsonFormatter()
+    return logging.Formatter(TEXT_FORMAT)
+
+
+def build_handlers(config=None):
+    """实际输出日志的处理器，启用队列时在监听线程中执行"""
+    if _flag(config, 'LOG_TO_STDOUT', True):
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(build_formatter(_setting(config, 'LOG_FORMAT', 'text')))
+        return [handler]
+
+    path = _setting(config, 'LOG_FILE', DEFAULT_LOG_FILE)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    handler = RotatingFileHandler(
+        path,
+        maxBytes=int(_setting(config, 'LOG_FILE_MAX_BYTES', DEFAULT_FILE_MAX_BYTES)),
+        backupCount=int(_setting(config, 'LOG_FILE_BACKUP_COUNT', DEFAULT_FILE_BACKUP_COUNT)),
+        encoding='utf-8'
     )
-    
-    # 设置日志格式
-    file_handler.setFormatter(logging.Formatter(
-        '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
-    ))
-    
-    # 设置日志级别
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    
-    app.logger.setLevel(logging.INFO)
-    app.logger.info('日志系统初始化完成')
+    handler.setFormatter(build_formatter(_setting(config, 'LOG_FILE_FORMAT', 'json')))
+    return [handler]
+
+
+def stop_logging():
+    """停止监听线程并写出队列中剩余的日志"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def configure_logging(config=None):
+    """配置根日志记录器，可重复调用(重新配置前会停止已有的监听线程)
+
+    Args:
+        config: 配置(如 ``app.config``)，未提供的配置项读取环境变量
+
+    Returns:
+        启用队列时返回监听线程，否则返回None
+    """
+    global _listener, _atexit_registered
+    stop_logging()
+
+    level = logging.getLevelName(str(_setting(config, 'LOG_LEVEL', 'INFO')).upper())
+    if not isinstance(level, int):
+        level = logging.INFO
+    sampling = SamplingFilter(int(_setting(config, 'LOG_SAMPLE_RATE', 1)))
+    handlers = build_handlers(config)
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    root.setLevel(level)
+
+    if _flag(config, 'LOG_QUEUE', True):
+        log_queue = queue.SimpleQueue()
+        queue_handler = LazyQueueHandler(log_queue)
+        queue_handler.addFilter(sampling)
+        root.addHandler(queue_handler)
+        _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        if not _atexit_registered:
+            atexit.register(stop_logging)
+            _atexit_registered = True
+    else:
+        for handler in handlers:
+            handler.addFilter(sampling)
+            root.addHandler(handler)
 
-    # 配置Flask日志记录器
-    for handler in app.logger.handlers[:]:
-        app.logger.removeHandler(handler)
-    app.logger.setLevel(logging.INFO)
-    
     # 配置SQLAlchemy日志记录器
     logging.getLogger('sqlalchemy.engine').setLevel(logging.WARNING)
-    
+
     # 配置Werkzeug日志记录器
     logging.getLogger('werkzeug').setLevel(logging.INFO)
-    
-    # 设置根日志记录器级别
-    logging.getLogger().setLevel(logging.INFO) 
\ No newline at end of file
+
+    # 按配置覆盖各日志记录器的级别
+    for name, value in parse_levels(_setting(config, 'LOG_LEVELS', '')).items():
+        logging.getLogger(name).setLevel(value)
+    return _listener
+
+
+@singleton_init
+def init_logging(app):
+    """初始化日志系统"""
+    configure_logging(app.config)
+
+    # Flask日志记录器通过根日志记录器输出
+    for handler in app.logger.handlers[:]:
+        app.logger.removeHandler(handler)
+    app.logger.setLevel(logging.NOTSET)
+
+    app.logger.info('日志系统初始化完成')
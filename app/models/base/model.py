@@ -4,6 +4,9 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# 各模型类的有效字段
+_valid_fields = {}
+
 class BaseModel(db.Model):
     """基础模型类"""
     __abstract__ = True
@@ -13,27 +16,22 @@ class BaseModel(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def __init__(self, **kwargs):
-        logger.info(f'BaseModel.__init__ 开始，模型类: {self.__class__.__name__}')
-        logger.info('原始参数:')
-        for key, value in kwargs.items():
-            logger.info(f'  {key}: {value}')
-        
         # 移除不支持的字段
-        valid_fields = {c.name for c in self.__table__.columns}
-        logger.info(f'有效字段: {valid_fields}')
-        
+        valid_fields = _valid_fields.get(self.__class__)
+        if valid_fields is None:
+            valid_fields = _valid_fields[self.__class__] = frozenset(c.name for c in self.__table__.columns)
         filtered_kwargs = {k: v for k, v in kwargs.items() if k in valid_fields}
-        logger.info('过滤后的参数:')
-        for key, value in filtered_kwargs.items():
-            logger.info(f'  {key}: {value}')
-        
+
+        # 模型在导入和查询中被大量创建，参数只在DEBUG级别输出
+        if logger.isEnabledFor(logging.DEBUG):
+            ignored = sorted(set(kwargs) - valid_fields)
+            logger.debug('%s.__init__ 参数: %s, 忽略字段: %s', self.__class__.__name__, sorted(filtered_kwargs), ignored)
+
         # 调用父类的__init__方法
         try:
             super().__init__(**filtered_kwargs)
-            logger.info('BaseModel.__init__ 完成')
         except Exception as e:
-            logger.error(f'BaseModel.__init__ 失败: {str(e)}')
-            logger.error(f'错误类型: {type(e).__name__}')
+            logger.error(f'BaseModel.__init__ 失败: 模型类={self.__class__.__name__}, 错误类型={type(e).__name__}, error={str(e)}')
             raise
 
     def to_dict(self):
@@ -3,18 +3,29 @@ from app.models.base.model import BaseModel
 from app.models.base.enums import StatusEnum
 
 class RuleVersion(BaseModel):
-    """规则版本模型"""
+    """规则版本模型
+
+    发布规则时把规则及其疾病、问题、答案冻结为快照，快照发布后不再修改，
+    评估按版本加载快照，不读取可变的规则数据。
+    """
     __tablename__ = 'rule_versions'
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        db.UniqueConstraint('rule_id', 'version', name='uq_rule_versions_rule_version'),
+        {'extend_existing': True}
+    )
     
     name = db.Column(db.String(100), nullable=False)  # 规则名称
     code = db.Column(db.String(50), unique=True, index=True)  # 规则编码
     version = db.Column(db.String(50))  # 版本号
     description = db.Column(db.Text)  # 描述
     status = db.Column(db.String(20), default=StatusEnum.ENABLED.value)  # 状态
+    rule_id = db.Column(db.Integer, db.ForeignKey('underwriting_rules.id'), index=True)  # 所属规则ID
+    snapshot = db.Column(db.JSON)  # 规则快照(疾病/问题/答案)
+    checksum = db.Column(db.String(64))  # 快照SHA-256
+    published_at = db.Column(db.DateTime)  # 发布时间
+    published_by = db.Column(db.String(50))  # 发布人
 
-    # 暂时注释掉关联关系
-    # underwriting_rules = db.relationship('UnderwritingRule', back_populates='rule_version')
+    rule = db.relationship('UnderwritingRule', backref=db.backref('versions', lazy='dynamic'))
 
     def to_dict(self):
         """转换为字典"""
@@ -25,6 +36,10 @@ class RuleVersion(BaseModel):
             'version': self.version,
             'description': self.description,
             'status': self.status,
+            'rule_id': self.rule_id,
+            'checksum': self.checksum,
+            'published_at': self.published_at.strftime('%Y-%m-%d %H:%M:%S') if self.published_at else None,
+            'published_by': self.published_by,
             'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None,
             'updated_at': self.updated_at.strftime('%Y-%m-%d %H:%M:%S') if self.updated_at else None
         }
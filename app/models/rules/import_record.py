@@ -20,6 +20,9 @@ class ImportRecord(BaseModel):
     created_by = db.Column(db.String(50), comment='创建人')
     created_at = db.Column(db.DateTime, default=datetime.utcnow, comment='创建时间')
     rule_id = db.Column(db.Integer, db.ForeignKey('underwriting_rules.id'), comment='关联的规则ID')
+    progress = db.Column(db.JSON, comment='导入进度：各sheet的总行数/已处理行数')
+    started_at = db.Column(db.DateTime, comment='开始处理时间')
+    finished_at = db.Column(db.DateTime, comment='处理结束时间')
     
     # 关联导入详情
     details = db.relationship('ImportDetail', backref='import_record', lazy='dynamic')
@@ -39,5 +42,8 @@ class ImportRecord(BaseModel):
             'error_details': self.error_details,
             'created_by': self.created_by,
             'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None,
-            'rule_id': self.rule_id
+            'rule_id': self.rule_id,
+            'progress': self.progress,
+            'started_at': self.started_at.strftime('%Y-%m-%d %H:%M:%S') if self.started_at else None,
+            'finished_at': self.finished_at.strftime('%Y-%m-%d %H:%M:%S') if self.finished_at else None
         } 
\ No newline at end of file
@@ -16,6 +16,7 @@ from datetime import datetime
 import pandas as pd
 from werkzeug.utils import secure_filename
 from app.utils.rule_importer import RuleImporter
+from app.utils.excel import open_workbook
 from io import BytesIO
 
 # 设置日志
@@ -549,25 +550,20 @@ def import_rule_data(rule_id):
             
             # 使用BytesIO读取文件内容
             file_content = BytesIO(file.read())
-            xls = pd.ExcelFile(file_content)
+            with open_workbook(file_content) as workbook:
+                sheet_names = set(workbook.sheet_names)
             
             # 检查必需的sheet是否存在
             required_sheets = {'疾病', '问题', '结论'}
-            if not required_sheets.issubset(set(xls.sheet_names)):
-                missing_sheets = required_sheets - set(xls.sheet_names)
+            if not required_sheets.issubset(sheet_names):
+                missing_sheets = required_sheets - sheet_names
                 flash(f'Excel文件缺少必需的sheet: {", ".join(missing_sheets)}', 'error')
                 return redirect(request.url)
             
-            # 读取所有sheet页
-            disease_df = pd.read_excel(file_content, sheet_name='疾病')
+            # 导入数据(逐行读取各sheet页)
             file_content.seek(0)  # 重置文件指针
-            question_df = pd.read_excel(file_content, sheet_name='问题')
-            file_content.seek(0)  # 重置文件指针
-            conclusion_df = pd.read_excel(file_content, sheet_name='结论')
-            
-            # 导入数据
             importer = RuleImporter(rule_id)
-            success, message = importer.import_rule_data(disease_df, question_df, conclusion_df)
+            success, message = importer.import_rule_data(file_content)
             
             if success:
                 # 更新规则状态
@@ -2,6 +2,7 @@ from typing import List, Optional
 from sqlalchemy.sql.expression import or_
 from app.extensions import db
 from app.models.business.channel import Channel
+from app.utils.pagination import COUNT_EXACT, Page, paginate
 import logging
 import traceback
 
@@ -14,8 +15,13 @@ class ChannelService:
     def get_channel_list(page: int = 1, 
                         page_size: int = 20, 
                         keyword: str = None,
-                        status: str = None) -> tuple:
-        """获取渠道列表"""
+                        status: str = None,
+                        cursor: str = None,
+                        count: str = COUNT_EXACT) -> Page:
+        """获取渠道列表
+        
+        传入cursor时按 (created_at, id) 游标分页，count指定总数的计算方式
+        """
         # 构建查询
         query = Channel.query
         
@@ -33,13 +39,15 @@ class ChannelService:
             query = query.filter(Channel.status == status)
             
         # 分页查询
-        pagination = query.paginate(
+        return paginate(
+            query,
+            Channel.created_at,
+            Channel.id,
+            page_size,
+            cursor=cursor,
             page=page,
-            per_page=page_size,
-            error_out=False
+            count=count
         )
-        
-        return pagination.items, pagination.total
     
     @staticmethod
     def get_channel_by_id(channel_id: int) -> Optional[Channel]:
@@ -1,10 +1,11 @@
-from typing import Optional, List, Dict, Any, Tuple
+from typing import Optional, Dict, Any, Tuple
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy import or_
 import logging
 from app.extensions import db
 from app.models.business.company.insurance_company import InsuranceCompany
 from app.models.base.enums import StatusEnum
+from app.utils.pagination import COUNT_EXACT, Page, paginate
 
 logger = logging.getLogger(__name__)
 
@@ -17,8 +18,10 @@ class CompanyService:
         per_page: int = 10,
         name: str = None,
         code: str = None,
-        status: str = None
-    ) -> Tuple[List[Dict[str, Any]], int]:
+        status: str = None,
+        cursor: str = None,
+        count: str = COUNT_EXACT
+    ) -> Page:
         """
         获取保险公司列表
         
@@ -28,9 +31,11 @@ class CompanyService:
             name: 公司名称(模糊查询)
             code: 公司编码(模糊查询)
             status: 状态
+            cursor: 游标，传入时按 (created_at, id) 游标分页，空字符串表示第一页
+            count: 总数的计算方式(exact/estimate/none)
             
         Returns:
-            Tuple[List[Dict[str, Any]], int]: (公司列表, 总数)
+            Page: 当前页的公司(字典)及分页信息
         """
         try:
             query = InsuranceCompany.query
@@ -43,20 +48,22 @@ class CompanyService:
             if status:
                 query = query.filter(InsuranceCompany.status == status)
             
-            # 获取总数
-            total = query.count()
-            
             # 分页
-            companies = query.order_by(InsuranceCompany.created_at.desc()) \
-                .offset((page - 1) * per_page) \
-                .limit(per_page) \
-                .all()
-            
-            return [company.to_dict() for company in companies], total
+            result = paginate(
+                query,
+                InsuranceCompany.created_at,
+                InsuranceCompany.id,
+                per_page,
+                cursor=cursor,
+                page=page,
+                count=count
+            )
+            result.items = [company.to_dict() for company in result.items]
+            return result
             
         except SQLAlchemyError as e:
             logger.error(f'获取保险公司列表失败: {str(e)}')
-            return [], 0
+            return Page(page_size=per_page, page=None if cursor is not None else page, total=0)
     
     @staticmethod
     def get_company_by_id(company_id: int) -> Optional[Dict[str, Any]]:
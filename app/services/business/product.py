@@ -1,15 +1,71 @@
 from app.services import BaseService
 from app.models.business.product.product import Product
+from app.models.business.product.product_type import ProductType
+from app.models.business.company.insurance_company import InsuranceCompany
+from app.models.business.channel import Channel
+from app.models.rules.ai.ai_parameter import AIParameter
+from app.models.rules.core.underwriting_rule import UnderwritingRule
 from app.extensions import db
+from app.utils.pagination import COUNT_EXACT, Page, paginate
+from sqlalchemy.orm import joinedload
+
+# 产品数据(含关联的类型、保司、渠道、智核参数及其规则)依赖的表，用于计算ETag
+PRODUCT_MODELS = (Product, ProductType, InsuranceCompany, Channel, AIParameter, UnderwritingRule)
 
 class ProductService(BaseService):
+    @staticmethod
+    def listing_query():
+        """产品查询，``to_dict`` 用到的类型、保司、渠道、智核参数及其规则在同一条SQL中连接加载
+
+        都是多对一关系，连接加载不会放大行数，也不影响LIMIT分页；
+        否则每个产品最多还要五次延迟加载查询。
+        """
+        return Product.query.options(
+            joinedload(Product.product_type),
+            joinedload(Product.insurance_company),
+            joinedload(Product.channel),
+            joinedload(Product.ai_parameter).joinedload(AIParameter.rule)
+        )
+
+    @staticmethod
+    def get_product_list(page: int = 1,
+                         page_size: int = 10,
+                         code: str = None,
+                         channel: str = None,
+                         status: str = None,
+                         cursor: str = None,
+                         count: str = COUNT_EXACT) -> Page:
+        """获取产品列表
+
+        传入cursor时按 (created_at, id) 游标分页，count指定总数的计算方式
+        """
+        filters = []
+        if code:
+            filters.append(Product.product_code.like(f'%{code}%'))
+        if channel:
+            filters.append(Product.channel_id == channel)
+        if status:
+            filters.append(Product.status == status)
+
+        # 总数只在产品表上按过滤条件计算
+        return paginate(
+            ProductService.listing_query().filter(*filters),
+            Product.created_at,
+            Product.id,
+            page_size,
+            cursor=cursor,
+            page=page,
+            count=count,
+            count_query=Product.query.filter(*filters)
+        )
+
     @staticmethod
     def get_all_products():
-        return Product.query.all()
+        return ProductService.listing_query().order_by(Product.id).all()
 
     @staticmethod
     def get_product_by_id(id):
-        return Product.query.get(id)
+        return ProductService.listing_query().filter(Product.id == id).first()
 
     @staticmethod
     def create_product(data):
@@ -1,6 +1,15 @@
 """Import service package."""
 
 from .base import BaseImportService
+from .pipeline import Field, ImportPipeline, ImportReport, ReferenceLookups, SheetHandler
 from .importers.underwriting_importer import UnderwritingRuleImporter
 
-__all__ = ['BaseImportService', 'UnderwritingRuleImporter'] 
\ No newline at end of file
+__all__ = [
+    'BaseImportService',
+    'Field',
+    'ImportPipeline',
+    'ImportReport',
+    'ReferenceLookups',
+    'SheetHandler',
+    'UnderwritingRuleImporter'
+]
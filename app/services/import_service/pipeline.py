@@ -0,0 +1,484 @@
+"""统一的导入流水线
+
+所有规则导入入口共用同一套分阶段流程：
+
+1. 读取: ``open_workbook`` 逐行读取sheet，只在内存中保留当前批次
+2. 校验: ``SheetHandler.parse`` 按字段定义转换并校验单行数据
+3. 解析引用: ``SheetHandler.resolve`` 通过共享的 ``ReferenceLookups`` 把编码解析为ID、检查重复
+4. 批量写入: ``BulkWriter`` 按批次写入业务数据和导入详情
+5. 报告: ``ImportReport`` 汇总各sheet的成功/失败数量
+
+各导入入口只需声明自己的sheet处理器，批量写入、引用缓存和事务策略都在这里统一处理：
+整个导入在一个事务中完成，任一阶段抛出异常时整体回滚。
+"""
+import logging
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from app.extensions import db
+from app.models.rules.import_detail import ImportDetail
+from app.services.underwriting.reference_cache import invalidate_reference_data
+from app.services.underwriting.rule_graph import invalidate_rule_graph
+from app.utils.bulk import BulkWriter
+from app.utils.excel import open_workbook, WorkbookReader
+
+logger = logging.getLogger(__name__)
+
+# 导入报告中每个sheet保留的错误明细条数
+MAX_REPORTED_ERRORS = 100
+
+
+def to_str(value) -> str:
+    """转换为字符串"""
+    return str(value).strip()
+
+
+def to_int(value) -> int:
+    """转换为整数"""
+    return int(float(value))
+
+
+def to_bool(value) -> bool:
+    """'1'/1/True 视为真"""
+    return str(value).strip() in ('1', 'True', 'true', '是')
+
+
+def json_safe(row: Dict[str, Any]) -> Dict[str, Any]:
+    """原始行数据转换为可写入JSON列的字典"""
+    result = {}
+    for key, value in row.items():
+        if isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        elif isinstance(value, Decimal):
+            value = float(value)
+        elif value is not None and not isinstance(value, (str, int, float, bool)):
+            value = str(value)
+        result[key] = value
+    return result
+
+
+@dataclass(frozen=True)
+class Field:
+    """sheet列到模型字段的映射
+
+    Args:
+        name: 模型字段名
+        column: Excel列名，可以是多个候选列名(模板版本不同列名略有差异)
+        required: 是否必填
+        convert: 值转换函数
+        default: 为空时的默认值
+        message: 必填校验失败时的错误信息
+    """
+    name: str
+    column: Union[str, Tuple[str, ...]]
+    required: bool = False
+    convert: Callable[[Any], Any] = to_str
+    default: Any = None
+    message: Optional[str] = None
+
+    @property
+    def columns(self) -> Tuple[str, ...]:
+        return self.column if isinstance(self.column, tuple) else (self.column,)
+
+    def read(self, row: Dict[str, Any]):
+        value = None
+        for column in self.columns:
+            value = row.get(column)
+            if value is not None:
+                break
+        if value is not None:
+            value = self.convert(value)
+        if value is None or value == '':
+            if self.required:
+                raise ValueError(self.message or f'{self.columns[0]}不能为空')
+            return self.default
+        return value
+
+
+class ReferenceLookups:
+    """导入过程中共享的编码 -> ID 映射
+
+    本次导入写入的记录在写入后登记；数据库中已有的记录按 ``define`` 的定义查询。
+    ``preload`` 过的类型每张表只查询一次，之后全部在内存中判断；
+    未预加载的类型逐个编码查询，结果(包括不存在)会被缓存。
+    """
+
+    def __init__(self, session=None):
+        self.session = session or db.session
+        self._maps: Dict[str, Dict[Any, Optional[int]]] = {}
+        self._missing: Dict[str, set] = {}
+        self._sources: Dict[str, Tuple[Any, Any, Dict[str, Any]]] = {}
+        self._preloaded: set = set()
+
+    def define(self, kind: str, model, key_column: str = 'code', preload: bool = False, **filters):
+        """定义某类引用在数据库中的查找方式
+
+        Args:
+            kind: 引用类型，如 disease/question
+            model: 模型类
+            key_column: 编码列
+            preload: 是否立即把已有编码一次性加载到内存
+            filters: 额外的过滤条件，如 rule_id
+        """
+        self._sources[kind] = (model, getattr(model, key_column), filters)
+        self._maps.setdefault(kind, {})
+        if preload:
+            self.preload(kind)
+
+    def _query(self, kind: str, *columns):
+        model, column, filters = self._sources[kind]
+        query = self.session.query(*columns)
+        for name, value in filters.items():
+            query = query.filter(getattr(model, name) == value)
+        return query
+
+    def preload(self, *kinds: str):
+        """一次查询加载某类引用的全部已有编码，之后的查找不再访问数据库"""
+        for kind in kinds:
+            model, column, _ = self._sources[kind]
+            values = self.map(kind)
+            count = 0
+            for key, reference_id in self._query(kind, column, model.id):
+                count += 1
+                # 本次导入已登记的编码优先
+                values.setdefault(key, reference_id)
+            self._preloaded.add(kind)
+            logger.info(f"预加载引用 {kind}: {count}条")
+
+    def map(self, kind: str) -> Dict[Any, Optional[int]]:
+        return self._maps.setdefault(kind, {})
+
+    def register(self, kind: str, key, reference_id: Optional[int] = None):
+        """登记编码；写入前登记为None占位，写入后补上ID"""
+        self.map(kind)[key] = reference_id
+
+    def _load(self, kind: str, key):
+        model, column, _ = self._sources[kind]
+        row = self._query(kind, model.id).filter(column == key).first()
+        return row[0] if row else None
+
+    def get(self, kind: str, key) -> Optional[int]:
+        """返回编码对应的ID，不存在时返回None"""
+        values = self.map(kind)
+        if key in values:
+            return values[key]
+        if kind not in self._sources or kind in self._preloaded:
+            return None
+        reference_id = self._load(kind, key)
+        if reference_id is not None:
+            values[key] = reference_id
+        else:
+            self._misses(kind).add(key)
+        return reference_id
+
+    def contains(self, kind: str, key) -> bool:
+        """编码是否已存在(本次导入已登记或数据库中已有)"""
+        values = self.map(kind)
+        if key in values:
+            return True
+        if kind in self._preloaded or key in self._misses(kind):
+            return False
+        return self.get(kind, key) is not None
+
+    def _misses(self, kind: str) -> set:
+        return self._missing.setdefault(kind, set())
+
+
+class ImportContext:
+    """一次导入共享的上下文"""
+
+    def __init__(self, rule_id=None, batch_no=None, import_record=None, progress=None, session=None):
+        self.rule_id = rule_id
+        self.batch_no = batch_no
+        self.import_record = import_record
+        self.progress = progress
+        self.session = session or db.session
+        self.lookups = ReferenceLookups(self.session)
+        self.writer = BulkWriter(self.session)
+        self.extra: Dict[str, Any] = {}
+
+
+@dataclass
+class SheetReport:
+    """单个sheet的导入结果"""
+    sheet: str
+    data_type: str
+    success: int = 0
+    error: int = 0
+    skipped: int = 0
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+
+    def add_error(self, row_number: int, message: str):
+        self.error += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'message': message})
+
+    def to_dict(self):
+        return {
+            'sheet': self.sheet,
+            'data_type': self.data_type,
+            'success': self.success,
+            'error': self.error,
+            'skipped': self.skipped,
+            'errors': self.errors
+        }
+
+
+@dataclass
+class ImportReport:
+    """导入报告"""
+    batch_no: Optional[str] = None
+    sheets: Dict[str, SheetReport] = field(default_factory=dict)
+
+    def sheet(self, handler) -> SheetReport:
+        if handler.label not in self.sheets:
+            self.sheets[handler.label] = SheetReport(handler.label, handler.data_type)
+        return self.sheets[handler.label]
+
+    @property
+    def success_count(self) -> int:
+        return sum(sheet.success for sheet in self.sheets.values())
+
+    @property
+    def error_count(self) -> int:
+        return sum(sheet.error for sheet in self.sheets.values())
+
+    @property
+    def total_count(self) -> int:
+        return self.success_count + self.error_count
+
+    def to_dict(self):
+        return {
+            'batch_no': self.batch_no,
+            'total_count': self.total_count,
+            'success_count': self.success_count,
+            'error_count': self.error_count,
+            'sheets': [sheet.to_dict() for sheet in self.sheets.values()]
+        }
+
+
+class SheetHandler:
+    """sheet处理器
+
+    子类声明sheet、模型和字段映射，按需重写 ``skip``/``resolve``/``finalize`` 等钩子。
+    """
+
+    sheet: Union[str, int] = None      # sheet名称或序号
+    label: str = None                  # 报告和进度中显示的名称，默认为sheet名称
+    data_type: str = None              # 导入详情中的数据类型，也是登记引用的类型
+    model = None                       # 写入的模型
+    fields: Sequence[Field] = ()
+    key_field: Optional[str] = 'code'  # 登记到引用映射中的字段
+    unique: bool = False               # 编码重复(已存在)时是否记为失败
+    skip_rows: int = 0                 # 表头后跳过的行数(如说明行)
+    row_number_offset: int = 1         # 导入详情行号 = 行索引 + offset
+    extra_columns: Sequence[str] = ()  # 除必填字段外也必须存在的列
+
+    def __init__(self):
+        if self.label is None:
+            self.label = str(self.sheet)
+
+    def validate_columns(self, sheet):
+        """校验表头，候选列名中任一存在即可"""
+        missing = []
+        for f in self.fields:
+            if f.required and not any(c in sheet.columns for c in f.columns):
+                missing.append(f.columns[0])
+        missing.extend(sheet.missing_columns([c for c in self.extra_columns if c not in missing]))
+        if missing:
+            raise ValueError(f'Sheet {self.label} 缺少必需的表头：{", ".join(missing)}')
+
+    def defaults(self, context: ImportContext) -> Dict[str, Any]:
+        """每行都写入的公共字段"""
+        values = {}
+        columns = self.model.__table__.columns
+        if 'rule_id' in columns and context.rule_id is not None:
+            values['rule_id'] = context.rule_id
+        if 'batch_no' in columns:
+            values['batch_no'] = context.batch_no
+        return values
+
+    def skip(self, index: int, row: Dict[str, Any]) -> bool:
+        """是否跳过该行(不计成功也不计失败)"""
+        return False
+
+    def parse(self, row: Dict[str, Any], context: ImportContext) -> Dict[str, Any]:
+        """校验阶段：把一行转换为模型字段，校验失败抛出ValueError"""
+        values = self.defaults(context)
+        for f in self.fields:
+            values[f.name] = f.read(row)
+        return values
+
+    def resolve(self, values: Dict[str, Any], context: ImportContext):
+        """解析引用阶段：把编码解析为ID、检查重复，失败抛出ValueError
+
+        返回False表示该行引用的是已存在的记录，无需写入。
+        """
+        if self.key_field and self.unique:
+            key = values.get(self.key_field)
+            if context.lookups.contains(self.data_type, key):
+                raise ValueError(f'{self.label}编码重复：{key}')
+        return True
+
+    def write(self, rows: List[Dict[str, Any]], context: ImportContext) -> List[int]:
+        """批量写入阶段"""
+        return context.writer.insert(self.model.__table__, rows, return_ids=True)
+
+    def register(self, values: Dict[str, Any], reference_id: Optional[int], context: ImportContext):
+        """登记写入(或复用)的记录，供后续sheet解析引用"""
+        if self.key_field:
+            context.lookups.register(self.data_type, values.get(self.key_field), reference_id)
+
+    def finalize(self, context: ImportContext):
+        """sheet处理完成后的收尾工作"""
+
+
+class ImportPipeline:
+    """导入流水线"""
+
+    def __init__(self, handlers: Sequence[SheetHandler], rule_id=None, batch_no=None,
+                 import_record=None, progress=None, chunk_size: int = 5000):
+        """
+        Args:
+            handlers: 按处理顺序排列的sheet处理器
+            rule_id: 规则ID
+            batch_no: 数据批次号
+            import_record: 导入记录，提供时写入每行的导入详情
+            progress: 导入进度跟踪(ImportProgress)
+            chunk_size: 每批写入的行数
+        """
+        self.handlers = list(handlers)
+        self.chunk_size = chunk_size
+        self.context = ImportContext(
+            rule_id=rule_id,
+            batch_no=batch_no,
+            import_record=import_record,
+            progress=progress
+        )
+        self.report = ImportReport(batch_no=batch_no)
+
+    @property
+    def lookups(self) -> ReferenceLookups:
+        return self.context.lookups
+
+    def run(self, source) -> ImportReport:
+        """执行导入并提交事务，失败时回滚后抛出异常
+
+        Args:
+            source: 文件路径、文件对象或已打开的 WorkbookReader
+        """
+        session = self.context.session
+        try:
+            report = self.execute(source)
+            session.commit()
+            invalidate_rule_graph(self.context.rule_id)
+            invalidate_reference_data('import')
+            logger.info(f"导入事务提交成功: {report.to_dict()}")
+            return report
+        except Exception:
+            session.rollback()
+            raise
+
+    def execute(self, source) -> ImportReport:
+        """执行导入但不提交事务，由调用方决定提交时机"""
+        if isinstance(source, WorkbookReader):
+            self._execute(source)
+        else:
+            with open_workbook(source) as workbook:
+                self._execute(workbook)
+        return self.report
+
+    def _execute(self, workbook: WorkbookReader):
+        logger.info(f"开始执行导入流水线: sheets={workbook.sheet_names}, batch_no={self.context.batch_no}")
+        # 先校验所有sheet的表头，避免写入部分数据后才发现格式错误
+        for handler in self.handlers:
+            handler.validate_columns(workbook.sheet(handler.sheet, skip_rows=handler.skip_rows))
+
+        for handler in self.handlers:
+            self.run_handler(handler, workbook.sheet(handler.sheet, skip_rows=handler.skip_rows))
+
+    def run_handler(self, handler: SheetHandler, rows: Iterable[Tuple[int, Dict[str, Any]]]):
+        """处理单个sheet"""
+        context = self.context
+        report = self.report.sheet(handler)
+        total = getattr(rows, 'row_count', None) or 0
+        if context.progress:
+            context.progress.start_sheet(handler.label, total)
+        logger.info(f"开始处理{handler.label}: 约{total}行")
+
+        chunk = []
+        processed = 0
+        for index, row in rows:
+            chunk.append((index, row))
+            if len(chunk) >= self.chunk_size:
+                self._process_chunk(handler, chunk, report)
+                processed += len(chunk)
+                chunk = []
+                if context.progress:
+                    context.progress.advance(handler.label, processed, report.success, report.error)
+        if chunk:
+            self._process_chunk(handler, chunk, report)
+
+        handler.finalize(context)
+        if context.progress:
+            context.progress.finish_sheet(handler.label, report.success, report.error)
+        logger.info(f"{handler.label}处理完成: 成功={report.success}, 失败={report.error}, 跳过={report.skipped}")
+
+    def _process_chunk(self, handler: SheetHandler, chunk, report: SheetReport):
+        context = self.context
+        accepted = []   # (row_number, row, values) 需要写入的行
+        reused = []     # (row_number, row, values) 引用已存在记录的行
+        failed = []     # (row_number, row, message)
+
+        # 校验 + 解析引用
+        for index, row in chunk:
+            if handler.skip(index, row):
+                report.skipped += 1
+                continue
+            row_number = index + handler.row_number_offset
+            try:
+                values = handler.parse(row, context)
+                if handler.resolve(values, context) is False:
+                    reused.append((row_number, row, values))
+                    continue
+                # 写入前先占位登记，同一批次内的重复编码也能被识别
+                handler.register(values, None, context)
+                accepted.append((row_number, row, values))
+            except ValueError as e:
+                failed.append((row_number, row, str(e)))
+
+        # 批量写入
+        ids = handler.write([values for _, _, values in accepted], context) if accepted else []
+        for (_, _, values), reference_id in zip(accepted, ids):
+            handler.register(values, reference_id, context)
+
+        details = []
+        for (row_number, row, values), reference_id in zip(accepted, ids):
+            report.success += 1
+            details.append(self._detail(handler, row_number, row, reference_id=reference_id))
+        for row_number, row, values in reused:
+            report.success += 1
+            details.append(self._detail(
+                handler, row_number, row,
+                reference_id=context.lookups.get(handler.data_type, values.get(handler.key_field))
+            ))
+        for row_number, row, message in failed:
+            report.add_error(row_number, message)
+            details.append(self._detail(handler, row_number, row, error=message))
+
+        if context.import_record is not None and details:
+            context.writer.insert(ImportDetail.__table__, details)
+
+    def _detail(self, handler: SheetHandler, row_number: int, row, reference_id=None, error=None):
+        return {
+            'import_id': self.context.import_record.id if self.context.import_record is not None else None,
+            'sheet_name': handler.label,
+            'row_number': row_number,
+            'status': 'error' if error else 'success',
+            'error_message': error,
+            'data_type': handler.data_type,
+            'reference_id': reference_id,
+            'raw_data': json_safe(row)
+        }
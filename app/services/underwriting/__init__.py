@@ -0,0 +1 @@
+# 空文件，用于包导入
@@ -0,0 +1,190 @@
+"""疾病评估结果缓存
+
+大量申请人对同一疾病给出相同的答案(多数人第一个问题就回答"否")，同样的行走和结论合并被反复计算。
+缓存以 (规则ID, 版本, 规则图构建时间戳, 疾病编码, 规范化的答案) 为键保存单个疾病的评估结果:
+
+- 规范化的答案只保留该疾病可达问题的答案，按问题编码排序；单选题只保留第一个答案(与行走一致)，
+  因此为其他疾病作答的问题不影响命中
+- 规则图重新编译后时间戳变化，旧的结果不再命中，随LRU淘汰
+- 按条数和估算的内存占用两个上限淘汰最久未使用的结果
+
+配置 ``EVALUATION_CACHE_MAX_ENTRIES``(0表示不缓存)和 ``EVALUATION_CACHE_MAX_BYTES``，
+命中率和内存占用由 ``/metrics`` 输出。
+"""
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from flask import current_app, has_app_context
+
+from app.utils.metrics import registry
+
+DEFAULT_MAX_ENTRIES = 100000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# 疾病可达问题的缓存 {规则图: {疾病编码: {问题编码: 是否多选}}}，规则图失效后随之释放
+_reachable: 'weakref.WeakKeyDictionary[Any, Dict[str, Mapping[str, bool]]]' = weakref.WeakKeyDictionary()
+_reachable_lock = threading.Lock()
+
+
+def reachable_questions(graph, disease_code: str) -> Mapping[str, bool]:
+    """疾病第一个问题可达的问题 {问题编码: 是否多选}，疾病不存在时为空"""
+    with _reachable_lock:
+        diseases = _reachable.get(graph)
+        if diseases is None:
+            diseases = _reachable[graph] = {}
+        questions = diseases.get(disease_code)
+    if questions is not None:
+        return questions
+
+    questions = {}
+    disease = graph.disease(disease_code)
+    stack = [disease.first_question_code] if disease and disease.first_question_code else []
+    while stack:
+        code = stack.pop()
+        if code in questions:
+            continue
+        question = graph.questions.get(code)
+        if question is None:
+            continue
+        questions[code] = question.is_multiple
+        stack.extend(edge.next_question_code for edge in question.answers if edge.next_question_code)
+
+    with _reachable_lock:
+        diseases[disease_code] = questions
+    return questions
+
+
+def canonical_answers(graph, disease_code: str,
+                      answers: Mapping[str, Tuple[str, ...]]) -> Tuple[Tuple[str, Tuple[str, ...]], ...]:
+    """只保留疾病可达问题的答案，按问题编码排序，单选题只保留第一个答案"""
+    questions = reachable_questions(graph, disease_code)
+    return tuple(sorted(
+        (code, values if questions[code] else values[:1])
+        for code, values in answers.items() if code in questions
+    ))
+
+
+def _approximate_size(key: Tuple, outcome) -> int:
+    """缓存条目的估算内存占用(字节)：键、答案和结果路径的对象大小之和，共享的字符串按独占计算"""
+    size = sys.getsizeof(key) + sys.getsizeof(outcome) + sys.getsizeof(outcome.path)
+    for code, values in key[-1]:
+        size += sys.getsizeof(code) + sys.getsizeof(values) + sum(sys.getsizeof(v) for v in values)
+    size += sum(sys.getsizeof(step) for step in outcome.path)
+    return size
+
+
+class EvaluationCache:
+    """单个疾病评估结果的LRU缓存，按条数和估算的内存占用淘汰"""
+
+    def __init__(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._items: 'OrderedDict[Hashable, Tuple[Any, int]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _limits(self) -> Tuple[int, int]:
+        config = current_app.config if has_app_context() else {}
+        max_entries = self.max_entries if self.max_entries is not None else \
+            config.get('EVALUATION_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)
+        max_bytes = self.max_bytes if self.max_bytes is not None else \
+            config.get('EVALUATION_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)
+        return max_entries, max_bytes
+
+    @staticmethod
+    def key(graph, disease_code: str, answers: Mapping[str, Tuple[str, ...]]) -> Tuple:
+        return (graph.rule_id, graph.version, graph.stamp, disease_code,
+                canonical_answers(graph, disease_code, answers))
+
+    def evaluate(self, graph, disease_codes: Sequence[Optional[str]], answers: Mapping[str, Tuple[str, ...]],
+                 resolve: Callable[[List[Optional[str]]], Iterable[Any]]) -> Tuple[Any, ...]:
+        """评估多个疾病，未命中的疾病一起交给resolve计算，结果按disease_codes的顺序返回
+
+        Args:
+            graph: 规则图
+            disease_codes: 疾病编码(已去掉首尾空白)
+            answers: 规范化后的答案，见 ``normalize_answers``
+            resolve: 计算一组疾病的结果，按传入的顺序返回
+        """
+        max_entries, max_bytes = self._limits()
+        if not max_entries:
+            return tuple(resolve(list(disease_codes)))
+
+        # 不存在的疾病不缓存
+        keys: List[Optional[Tuple]] = [
+            self.key(graph, code, answers) if code and graph.disease(code) else None
+            for code in disease_codes
+        ]
+        outcomes: List[Any] = [None] * len(disease_codes)
+        missing: List[int] = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                entry = self._items.get(key) if key is not None else None
+                if entry is None:
+                    missing.append(i)
+                    if key is not None:
+                        self.misses += 1
+                    continue
+                self._items.move_to_end(key)
+                outcomes[i] = entry[0]
+                self.hits += 1
+
+        if missing:
+            resolved = tuple(resolve([disease_codes[i] for i in missing]))
+            with self._lock:
+                for i, outcome in zip(missing, resolved):
+                    outcomes[i] = outcome
+                    if keys[i] is not None:
+                        self._put(keys[i], outcome, max_entries, max_bytes)
+        return tuple(outcomes)
+
+    def _put(self, key: Tuple, outcome, max_entries: int, max_bytes: int):
+        previous = self._items.pop(key, None)
+        if previous is not None:
+            self.bytes -= previous[1]
+        size = _approximate_size(key, outcome)
+        self._items[key] = (outcome, size)
+        self.bytes += size
+        while self._items and (len(self._items) > max_entries or self.bytes > max_bytes):
+            _, (_, evicted) = self._items.popitem(last=False)
+            self.bytes -= evicted
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        max_entries, max_bytes = self._limits()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._items),
+                'max_entries': max_entries,
+                'bytes': self.bytes,
+                'max_bytes': max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions
+            }
+
+
+evaluation_cache = EvaluationCache()
+registry.register_gauges('evaluation_cache', evaluation_cache.stats)
+
+
+def walk(graph, disease_code: str, answers: Mapping[str, Tuple[str, ...]]):
+    """带缓存的 ``CompiledRule.walk``，未命中时先查结果表"""
+    from app.services.underwriting.outcome_table import resolve_outcomes
+    return evaluation_cache.evaluate(
+        graph, [disease_code], answers,
+        lambda codes: resolve_outcomes(graph, codes, answers)
+    )[0]
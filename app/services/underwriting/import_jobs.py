@@ -0,0 +1,238 @@
+"""规则导入后台任务
+
+上传请求只保存文件并创建状态为 ``pending`` 的导入记录，随即返回批次号；
+解析和写库在本进程的线程池中执行，进度由 ``ImportProgress`` 保存在进程内存中，
+状态和最终结果写回导入记录，客户端按批次号轮询。不依赖外部消息队列。
+"""
+import os
+import socket
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from app.extensions import db
+from app.models.rules.import_record import ImportRecord
+from app.services.underwriting.import_progress import ImportProgress, active_progress, worker_id
+from app.services.underwriting.rule_import_service import RuleImportService
+from app.services.underwriting.rule_workbook_import_service import (
+    RuleWorkbookImportService,
+    SHEETS as WORKBOOK_SHEETS
+)
+from app.services.underwriting.rule_graph import invalidate_rule_graph
+from app.services.underwriting.reference_cache import invalidate_reference_data
+from app.services.underwriting.rule_validator import validate_rule
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """获取导入线程池，按 IMPORT_JOB_WORKERS 配置大小"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                max_workers = current_app.config.get('IMPORT_JOB_WORKERS', 2)
+                _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='rule-import')
+                logger.info(f"创建导入线程池: max_workers={max_workers}")
+    return _executor
+
+
+def _remove_file(file_path):
+    try:
+        if file_path and os.path.exists(file_path):
+            os.remove(file_path)
+            logger.info(f"清理临时文件：{file_path}")
+    except Exception as e:
+        logger.error(f"清理临时文件失败：{str(e)}")
+
+
+def _load_detached_record(record_id):
+    """加载导入记录并从会话中分离
+
+    导入事务不修改该行，状态和计数只由 ImportProgress 在导入事务之外写入。
+    """
+    record = db.session.get(ImportRecord, record_id)
+    if record is None:
+        raise ValueError(f'导入记录不存在: {record_id}')
+    db.session.expunge(record)
+    return record
+
+
+def _run(app, record_id, sheets, file_path, job, **kwargs):
+    """在应用上下文中执行导入任务"""
+    with app.app_context():
+        progress = ImportProgress(record_id, sheets)
+        try:
+            progress.start()
+            job(record_id, file_path, progress, **kwargs)
+        except Exception as e:
+            logger.error(f"导入任务失败: record_id={record_id}, error={str(e)}", exc_info=True)
+            db.session.rollback()
+            progress.fail(str(e))
+        finally:
+            _remove_file(file_path)
+            db.session.remove()
+
+
+def submit(record, sheets, file_path, job, **kwargs):
+    """提交导入任务，导入记录必须已提交"""
+    app = current_app._get_current_object()
+    get_executor().submit(_run, app, record.id, sheets, file_path, job, **kwargs)
+    logger.info(f"导入任务已提交: batch_no={record.batch_no}, record_id={record.id}")
+    return record
+
+
+def create_record(batch_no, import_type, file_name, rule_id=None, created_by=None):
+    """创建待处理的导入记录并提交，使后台线程和轮询请求都能看到"""
+    record = ImportRecord(
+        batch_no=batch_no,
+        import_type=import_type,
+        file_name=file_name,
+        status='pending',
+        rule_id=rule_id,
+        created_by=created_by,
+        progress={'worker': worker_id()}
+    )
+    db.session.add(record)
+    db.session.commit()
+    return record
+
+
+def _validate(rule_id, progress):
+    """导入后校验规则图，结果写入导入进度；校验问题不影响导入结果"""
+    try:
+        report = validate_rule(rule_id)
+    except Exception as e:
+        logger.error(f"导入后规则校验失败: rule_id={rule_id}, error={str(e)}", exc_info=True)
+        return
+    if report is None:
+        return
+    progress.validation = report.summary()
+    if not report.valid:
+        logger.warning(f"导入的规则图存在问题: rule_id={rule_id}, {report.counts}")
+
+
+def _underwriting_job(record_id, file_path, progress, rule_id=None):
+    importer = RuleImportService(progress=progress)
+    importer.use_import_record(_load_detached_record(record_id))
+    success, result = importer.process(file_path, rule_id=rule_id)
+    if not success:
+        raise ValueError(result)
+    if rule_id:
+        invalidate_rule_graph(rule_id)
+        _validate(rule_id, progress)
+    progress.complete(result.success_count, result.error_count)
+
+
+def start_underwriting_import(file_path, file_name, current_user=None, rule_id=None):
+    """提交核保规则模板导入任务(疾病/问题/结论三个sheet)
+
+    Returns:
+        ImportRecord: 状态为pending的导入记录
+    """
+    created_by = str(current_user.id) if current_user else None
+    record = create_record(
+        RuleImportService.generate_batch_no(), 'underwriting', file_name,
+        rule_id=rule_id, created_by=created_by
+    )
+    return submit(
+        record, RuleImportService.required_sheets, file_path, _underwriting_job,
+        rule_id=rule_id
+    )
+
+
+def _workbook_job(record_id, file_path, progress, rule_id=None, batch_no=None):
+    importer = RuleWorkbookImportService(rule_id, batch_no, progress=progress)
+    result = importer.process(file_path)
+    db.session.commit()
+    invalidate_rule_graph(rule_id)
+    invalidate_reference_data('import')
+    _validate(rule_id, progress)
+    progress.complete()
+    logger.info(f"[导入] 导入数据成功: {result}, batch_no={batch_no}")
+
+
+def start_workbook_import(rule_id, file_path, file_name, created_by=None):
+    """提交规则工作簿导入任务
+
+    导入记录的批次号需全局唯一，数据批次号沿用规则内的编号方式(首次为000001)。
+
+    Returns:
+        ImportRecord: 状态为pending的导入记录
+    """
+    data_batch_no = RuleWorkbookImportService.generate_batch_no(rule_id)
+    record = create_record(
+        RuleImportService.generate_batch_no(), 'rule_workbook', file_name,
+        rule_id=rule_id, created_by=created_by
+    )
+    return submit(
+        record, WORKBOOK_SHEETS, file_path, _workbook_job,
+        rule_id=rule_id, batch_no=data_batch_no
+    )
+
+
+def get_job_status(batch_no):
+    """按批次号查询导入任务状态，不存在时返回None
+
+    任务在本进程执行时合并内存中的实时进度，其他进程只能看到状态和最终结果。
+    """
+    record = ImportRecord.query.filter_by(batch_no=batch_no).first()
+    if record is None:
+        return None
+    data = record.to_dict()
+    progress = active_progress(record.id)
+    if progress is not None:
+        data.update(progress.snapshot())
+    return data
+
+
+def _worker_exited(worker, created_at, stale_before):
+    """导入记录所属的进程是否已经退出
+
+    本机的进程按进程号判断(容器重启后进程号可能与当前进程相同，启动时当前进程没有任务，视为已退出)；
+    其他主机的进程无法判断，创建时间早于 stale_before 时视为已退出。
+    """
+    host, _, pid = (worker or '').rpartition(':')
+    if host != socket.gethostname() or not pid.isdigit():
+        return created_at is None or created_at < stale_before
+    pid = int(pid)
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        # 进程存在但无权发送信号
+        return False
+    return False
+
+
+def fail_orphaned_records():
+    """启动时把进程退出后遗留的 pending/processing 导入记录标记为失败
+
+    导入任务只在创建它的进程内执行，进程退出后这些记录不会再有进展。
+    其他主机的记录超过 ``IMPORT_JOB_STALE_AFTER`` 秒才标记，避免误伤仍在执行的任务。
+    """
+    try:
+        stale_after = current_app.config.get('IMPORT_JOB_STALE_AFTER', 6 * 3600)
+        stale_before = datetime.utcnow() - timedelta(seconds=stale_after)
+        records = ImportRecord.query.filter(ImportRecord.status.in_(('pending', 'processing'))).all()
+        orphaned = [
+            record for record in records
+            if _worker_exited((record.progress or {}).get('worker'), record.created_at, stale_before)
+        ]
+        for record in orphaned:
+            record.status = 'failed'
+            record.error_details = '服务重启，导入任务中断，请重新导入'
+            record.finished_at = datetime.utcnow()
+        if orphaned:
+            db.session.commit()
+            logger.warning(f"遗留的导入任务已标记为失败: {[record.batch_no for record in orphaned]}")
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"检查遗留的导入任务失败: {str(e)}")
@@ -0,0 +1,185 @@
+"""导入进度跟踪
+
+后台导入任务在一个数据库事务中写入全部数据，事务提交前轮询方看不到任何变化。
+``ImportProgress`` 把各sheet的进度保存在进程内存中，执行任务的进程按批次号查询时直接读取；
+只有任务开始、完成和失败时通过请求会话更新 ``rule_import_records`` 的状态、计数和最终进度，
+这些时刻导入事务尚未开始或已经结束，不会另开连接与导入事务争用锁(SQLite同一时间只允许一个写事务)。
+
+导入记录中保存执行任务的进程标识(``worker``)，进程退出后遗留的 ``pending``/``processing`` 记录
+在启动时标记为失败，见 ``import_jobs.fail_orphaned_records``。
+"""
+import os
+import socket
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+from app.extensions import db
+from app.models.rules.import_record import ImportRecord
+
+logger = logging.getLogger(__name__)
+
+# 本进程正在执行的导入任务 {导入记录ID: 进度}
+_active: Dict[int, 'ImportProgress'] = {}
+_active_lock = threading.Lock()
+
+
+def worker_id() -> str:
+    """当前进程的标识: 主机名:进程号"""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def active_progress(record_id) -> Optional['ImportProgress']:
+    """本进程正在执行的导入任务的进度，不在本进程执行时返回None"""
+    with _active_lock:
+        return _active.get(record_id)
+
+
+class ImportProgress:
+    """导入进度"""
+
+    def __init__(self, record_id, sheets=()):
+        """
+        Args:
+            record_id: 导入记录ID
+            sheets: 预期处理的sheet名称，用于计算整体进度
+        """
+        self.record_id = record_id
+        self.worker = worker_id()
+        self.current_sheet = None
+        self.sheets = {}
+        for name in sheets:
+            self._sheet(name)
+        self.validation = None  # 导入后的规则图校验摘要
+        self._lock = threading.Lock()
+
+    def _sheet(self, name):
+        if name not in self.sheets:
+            self.sheets[name] = {
+                'status': 'pending',
+                'total': 0,
+                'processed': 0,
+                'success': 0,
+                'error': 0
+            }
+        return self.sheets[name]
+
+    @property
+    def success_count(self):
+        return sum(sheet['success'] for sheet in self.sheets.values())
+
+    @property
+    def error_count(self):
+        return sum(sheet['error'] for sheet in self.sheets.values())
+
+    @property
+    def percent(self):
+        """整体进度百分比，每个sheet权重相同"""
+        if not self.sheets:
+            return 0
+        done = 0.0
+        for sheet in self.sheets.values():
+            if sheet['status'] == 'completed':
+                done += 1
+            elif sheet['total']:
+                done += min(sheet['processed'] / sheet['total'], 1)
+        return round(done * 100 / len(self.sheets), 1)
+
+    def to_dict(self):
+        with self._lock:
+            data = {
+                'worker': self.worker,
+                'current_sheet': self.current_sheet,
+                'percent': self.percent,
+                'sheets': {name: dict(sheet) for name, sheet in self.sheets.items()}
+            }
+        if self.validation is not None:
+            data['validation'] = self.validation
+        return data
+
+    def snapshot(self):
+        """导入记录中随进度变化的字段，用于合并到 ``ImportRecord.to_dict()``"""
+        return {
+            'progress': self.to_dict(),
+            'success_count': self.success_count,
+            'error_count': self.error_count
+        }
+
+    def start(self):
+        """任务开始执行，导入事务开始前调用"""
+        with _active_lock:
+            _active[self.record_id] = self
+        self._save(status='processing', started_at=datetime.utcnow())
+
+    def start_sheet(self, name, total):
+        """开始处理sheet"""
+        with self._lock:
+            sheet = self._sheet(name)
+            sheet.update(status='processing', total=total, processed=0, success=0, error=0)
+            self.current_sheet = name
+
+    def advance(self, name, processed, success=None, error=None):
+        """更新sheet已处理行数"""
+        with self._lock:
+            sheet = self._sheet(name)
+            sheet['processed'] = processed
+            if success is not None:
+                sheet['success'] = success
+            if error is not None:
+                sheet['error'] = error
+
+    def finish_sheet(self, name, success, error):
+        """sheet处理完成"""
+        with self._lock:
+            sheet = self._sheet(name)
+            sheet.update(status='completed', processed=sheet['total'], success=success, error=error)
+
+    def complete(self, success_count=None, error_count=None):
+        """任务完成，数据事务提交后调用"""
+        success_count = self.success_count if success_count is None else success_count
+        error_count = self.error_count if error_count is None else error_count
+        self.current_sheet = None
+        self._finish(
+            status='completed',
+            success_count=success_count,
+            error_count=error_count,
+            total_count=success_count + error_count,
+            finished_at=datetime.utcnow()
+        )
+
+    def fail(self, message):
+        """任务失败，数据事务回滚后调用"""
+        with self._lock:
+            for sheet in self.sheets.values():
+                if sheet['status'] == 'processing':
+                    sheet['status'] = 'failed'
+        self._finish(
+            status='failed',
+            success_count=0,
+            error_count=0,
+            error_details=message,
+            finished_at=datetime.utcnow()
+        )
+
+    def _finish(self, **values):
+        self._save(**values)
+        with _active_lock:
+            _active.pop(self.record_id, None)
+
+    def _save(self, **values):
+        """通过请求会话写入导入记录并提交，只在导入事务之外调用"""
+        values.setdefault('success_count', self.success_count)
+        values.setdefault('error_count', self.error_count)
+        table = ImportRecord.__table__
+        try:
+            db.session.execute(
+                table.update()
+                .where(table.c.id == self.record_id)
+                .values(progress=self.to_dict(), **values)
+            )
+            db.session.commit()
+        except Exception as e:
+            # 进度写入失败不影响导入本身
+            db.session.rollback()
+            logger.error(f"更新导入进度失败: record_id={self.record_id}, error={str(e)}")
@@ -0,0 +1,294 @@
+"""多疾病合并问卷计划
+
+申请人选择多个疾病时，各疾病的问题树常常共用问题(如G-归类问题)。逐个疾病行走时，
+共享的问题会被重复下发和重复评估。合并计划把一组疾病可达的问题合并为一张去重的有向无环图:
+
+- ``questions``: 去重后的问题，按拓扑顺序排列(先问的在前)
+- ``owners``: 每个问题可由哪些疾病到达，被多个疾病到达的即为共享问题
+
+计划只取决于规则图和疾病集合，按疾病集合的签名缓存在规则图上(规则图重新编译或淘汰后随之释放)。
+
+评估时同一组答案下每个问题的子树只求值一次，多个疾病共享的子树直接复用结果；
+结果与逐个疾病调用 ``CompiledRule.walk`` 一致。问题图中存在环时退回逐个疾病行走。
+"""
+import heapq
+import threading
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from app.services.underwriting.rule_graph import (
+    STATUS_INVALID,
+    STATUS_PENDING,
+    AnswerEdge,
+    CompiledRule,
+    DiseaseOutcome,
+    conclude
+)
+
+# 每张规则图缓存的计划数
+PLAN_CACHE_SIZE = 256
+
+
+@dataclass(frozen=True)
+class MergedPlan:
+    """一组疾病的合并问卷计划"""
+    rule_id: int
+    version: Optional[str]
+    signature: Tuple[str, ...]
+    # 能够行走的疾病 {疾病编码: 第一个问题编码}
+    entries: Mapping[str, str]
+    # 去重后的问题编码，按拓扑顺序排列
+    questions: Tuple[str, ...]
+    # 问题编码 -> 可到达该问题的疾病编码
+    owners: Mapping[str, Tuple[str, ...]]
+    # 问题图中存在环
+    cyclic: bool = False
+
+    @property
+    def shared_questions(self) -> Tuple[str, ...]:
+        """被多个疾病到达的问题"""
+        return tuple(code for code in self.questions if len(self.owners.get(code, ())) > 1)
+
+    @property
+    def question_visits(self) -> int:
+        """不合并时各疾病需要经过的问题数之和"""
+        return sum(len(owners) for owners in self.owners.values())
+
+    def to_dict(self, graph: CompiledRule) -> Dict[str, Any]:
+        """下发给客户端的计划：每个问题只出现一次"""
+        questions = []
+        for code in self.questions:
+            question = graph.question(code)
+            if question is not None:
+                data = question.to_dict()
+                data['diseases'] = list(self.owners.get(code, ()))
+                questions.append(data)
+        return {
+            'rule_id': self.rule_id,
+            'version': self.version,
+            'diseases': [
+                {'code': code, 'first_question_code': first}
+                for code, first in self.entries.items()
+            ],
+            'questions': questions,
+            'shared_questions': list(self.shared_questions),
+            'stats': {
+                'questions': len(self.questions),
+                'question_visits': self.question_visits,
+                'shared': len(self.shared_questions)
+            },
+            'cyclic': self.cyclic
+        }
+
+
+def plan_signature(disease_codes: Iterable[Optional[str]]) -> Tuple[str, ...]:
+    """疾病集合的签名(与选择顺序无关)"""
+    return tuple(sorted({code for code in disease_codes if code}))
+
+
+def build_plan(graph: CompiledRule, disease_codes: Iterable[Optional[str]]) -> MergedPlan:
+    """构建合并计划"""
+    signature = plan_signature(disease_codes)
+    entries: Dict[str, str] = {}
+    owners: Dict[str, List[str]] = {}
+    successors: Dict[str, List[str]] = {}
+    visit_order: List[str] = []
+
+    for disease_code in signature:
+        disease = graph.disease(disease_code)
+        if disease is None or not disease.first_question_code or graph.question(disease.first_question_code) is None:
+            # 无法行走的疾病在评估时由 walk 给出具体原因
+            continue
+        entries[disease.code] = disease.first_question_code
+        stack = [disease.first_question_code]
+        reached = set()
+        while stack:
+            code = stack.pop()
+            if code in reached:
+                continue
+            reached.add(code)
+            owners.setdefault(code, []).append(disease.code)
+            if code not in successors:
+                visit_order.append(code)
+                question = graph.questions.get(code)
+                successors[code] = [] if question is None else list(dict.fromkeys(
+                    edge.next_question_code for edge in question.answers
+                    if edge.next_question_code and graph.questions.get(edge.next_question_code) is not None
+                ))
+            stack.extend(reversed(successors[code]))
+
+    # 拓扑排序，入度相同时保持首次访问的顺序
+    indegree = {code: 0 for code in visit_order}
+    for code in visit_order:
+        for successor in successors[code]:
+            indegree[successor] += 1
+    ready = [(index, code) for index, code in enumerate(visit_order) if indegree[code] == 0]
+    position = {code: index for index, code in enumerate(visit_order)}
+    ordered = []
+    while ready:
+        _, code = heapq.heappop(ready)
+        ordered.append(code)
+        for successor in successors[code]:
+            indegree[successor] -= 1
+            if indegree[successor] == 0:
+                heapq.heappush(ready, (position[successor], successor))
+    cyclic = len(ordered) < len(visit_order)
+    if cyclic:
+        placed = set(ordered)
+        ordered.extend(code for code in visit_order if code not in placed)
+
+    return MergedPlan(
+        rule_id=graph.rule_id,
+        version=graph.version,
+        signature=signature,
+        entries=entries,
+        questions=tuple(ordered),
+        owners={code: tuple(diseases) for code, diseases in owners.items()},
+        cyclic=cyclic
+    )
+
+
+class PlanCache:
+    """按规则图和疾病集合签名缓存合并计划
+
+    以规则图对象为弱引用键，规则图失效后对应的计划随之释放。
+    """
+
+    def __init__(self, max_size: int = PLAN_CACHE_SIZE):
+        self.max_size = max_size
+        self._plans: 'weakref.WeakKeyDictionary[CompiledRule, OrderedDict]' = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, graph: CompiledRule, disease_codes: Iterable[Optional[str]]) -> MergedPlan:
+        signature = plan_signature(disease_codes)
+        with self._lock:
+            plans = self._plans.get(graph)
+            if plans is None:
+                plans = self._plans[graph] = OrderedDict()
+            plan = plans.get(signature)
+            if plan is not None:
+                plans.move_to_end(signature)
+                self.hits += 1
+                return plan
+            self.misses += 1
+
+        plan = build_plan(graph, signature)
+        with self._lock:
+            plans[signature] = plan
+            while len(plans) > self.max_size:
+                plans.popitem(last=False)
+        return plan
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'graphs': len(self._plans),
+                'plans': sum(len(plans) for plans in self._plans.values()),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+plan_cache = PlanCache()
+
+
+def get_plan(graph: CompiledRule, disease_codes: Iterable[Optional[str]]) -> MergedPlan:
+    """获取一组疾病的合并计划"""
+    return plan_cache.get(graph, disease_codes)
+
+
+@dataclass(frozen=True)
+class _Branch:
+    """以某个问题为根的子树在一组答案下的结果"""
+    path: Tuple[Tuple[str, str], ...] = ()
+    terminals: Tuple[AnswerEdge, ...] = ()
+    pending: Optional[str] = None
+    error: Optional[str] = None
+
+
+def _resolve(graph: CompiledRule, code: str, answers: Mapping[str, Tuple[str, ...]],
+             memo: Dict[str, _Branch]) -> _Branch:
+    """求子树的结果，同一次评估中每个问题只求值一次(计划无环时调用)"""
+    branch = memo.get(code)
+    if branch is not None:
+        return branch
+
+    question = graph.questions.get(code)
+    selected = answers.get(code)
+    if question is None:
+        branch = _Branch(error=f'问题不存在: {code}')
+    elif not selected:
+        branch = _Branch(pending=code)
+    else:
+        if len(selected) > 1 and not question.is_multiple:
+            selected = selected[:1]
+        path: List[Tuple[str, str]] = []
+        terminals: List[AnswerEdge] = []
+        next_codes: List[str] = []
+        pending = None
+        error = None
+        for answer_content in selected:
+            edge = question.answer_for(answer_content)
+            if edge is None:
+                error = f'问题 {code} 不存在答案: {answer_content}'
+                break
+            path.append((code, edge.answer_content))
+            if edge.is_terminal:
+                terminals.append(edge)
+            else:
+                next_codes.append(edge.next_question_code)
+
+        # 与walk一致：分支汇合到已经过的问题时不重复计入路径
+        seen = {code}
+        for next_code in next_codes if error is None else ():
+            if next_code in seen:
+                continue
+            child = _resolve(graph, next_code, answers, memo)
+            path.extend(entry for entry in child.path if entry[0] not in seen)
+            seen.add(next_code)
+            seen.update(question_code for question_code, _ in child.path)
+            terminals.extend(child.terminals)
+            pending = pending or child.pending
+            if child.error:
+                error = child.error
+                break
+        branch = _Branch(tuple(path), tuple(terminals), pending, error)
+
+    memo[code] = branch
+    return branch
+
+
+def evaluate_merged(graph: CompiledRule, disease_codes: Sequence[Optional[str]],
+                    answers: Mapping[str, Tuple[str, ...]]) -> Tuple[DiseaseOutcome, ...]:
+    """按合并计划评估多个疾病，结果按disease_codes的顺序返回
+
+    Args:
+        graph: 规则图
+        disease_codes: 疾病编码
+        answers: 规范化后的答案，见 ``normalize_answers``
+    """
+    plan = get_plan(graph, disease_codes)
+    if plan.cyclic:
+        return tuple(graph.walk(code, answers) for code in disease_codes)
+
+    memo: Dict[str, _Branch] = {}
+    outcomes = []
+    for code in disease_codes:
+        first = plan.entries.get(code)
+        if first is None:
+            outcomes.append(graph.walk(code, answers))
+            continue
+        branch = _resolve(graph, first, answers, memo)
+        if branch.error:
+            outcomes.append(DiseaseOutcome(disease_code=code, status=STATUS_INVALID, path=branch.path,
+                                           message=branch.error))
+        elif branch.pending:
+            outcomes.append(DiseaseOutcome(disease_code=code, status=STATUS_PENDING, path=branch.path,
+                                           pending_question_code=branch.pending))
+        else:
+            outcomes.append(conclude(code, branch.path, branch.terminals))
+    return tuple(outcomes)
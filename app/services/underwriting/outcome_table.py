@@ -0,0 +1,230 @@
+"""疾病结果表：预先枚举的答案路径
+
+多数疾病的问题树很小且有限。编译时从疾病的第一个问题出发，沿答案的下一个问题枚举所有答案路径，
+把每条路径(以及路径上每个待答的前缀)的结果保存为结果表:
+
+    规范化的答案 -> 疾病结果
+
+规范化的答案与评估结果缓存相同(见 ``evaluation_cache.canonical_answers``)，只保留该疾病可达问题的答案。
+申请人恰好回答了一条路径(或路径的前缀)上的问题时，一次字典查找就得到结论；
+其他情况(多选题选中多个答案、回答了路径之外的可达问题、答案不存在)仍在规则图上行走，结果一致。
+
+路径上出现已经过的问题(环)或不存在的问题时，表中保存与行走相同的无效结果。
+条目数超过 ``OUTCOME_TABLE_MAX_ENTRIES`` 的疾病不建表，直接行走。
+
+同一张表也给出规则作者关心的路径覆盖统计，见 ``coverage``。
+"""
+import threading
+import weakref
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from flask import current_app, has_app_context
+
+from app.services.underwriting.evaluation_cache import canonical_answers
+from app.services.underwriting.rule_graph import (
+    STATUS_CONCLUDED,
+    STATUS_INVALID,
+    STATUS_PENDING,
+    CompiledRule,
+    DiseaseOutcome,
+    conclude
+)
+
+DEFAULT_MAX_ENTRIES = 4096
+
+# 不建表的原因
+REASON_DISEASE_MISSING = 'disease_missing'
+REASON_TOO_LARGE = 'too_large'
+
+CanonicalAnswers = Tuple[Tuple[str, Tuple[str, ...]], ...]
+
+
+@dataclass(frozen=True)
+class OutcomeTable:
+    """单个疾病的结果表"""
+    disease_code: str
+    outcomes: Mapping[CanonicalAnswers, DiseaseOutcome]
+    # 路径中最多经过的问题数
+    max_depth: int = 0
+
+    def lookup(self, answers: CanonicalAnswers) -> Optional[DiseaseOutcome]:
+        return self.outcomes.get(answers)
+
+    def coverage(self) -> Dict[str, Any]:
+        """路径覆盖统计：各状态的路径数、经过的问题和答案、结论分布"""
+        statuses = Counter(outcome.status for outcome in self.outcomes.values())
+        steps = {step for outcome in self.outcomes.values() for step in outcome.path}
+        conclusions = Counter(
+            outcome.medical_conclusion or '(无)' for outcome in self.outcomes.values()
+            if outcome.status == STATUS_CONCLUDED
+        )
+        return {
+            'disease_code': self.disease_code,
+            'tabled': True,
+            'entries': len(self.outcomes),
+            'concluded_paths': statuses.get(STATUS_CONCLUDED, 0),
+            'pending_states': statuses.get(STATUS_PENDING, 0),
+            'invalid_paths': statuses.get(STATUS_INVALID, 0),
+            'max_depth': self.max_depth,
+            'questions': len({question_code for question_code, _ in steps}),
+            'answers': len(steps),
+            'medical_conclusions': dict(conclusions.most_common())
+        }
+
+
+def _max_entries() -> int:
+    if has_app_context():
+        return current_app.config.get('OUTCOME_TABLE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)
+    return DEFAULT_MAX_ENTRIES
+
+
+def build_table(graph: CompiledRule, disease_code: str,
+                max_entries: Optional[int] = None) -> Tuple[Optional[OutcomeTable], Optional[str]]:
+    """枚举疾病的全部答案路径
+
+    Returns:
+        (结果表, None)，无法建表时为 (None, 原因)
+    """
+    disease = graph.disease(disease_code)
+    if disease is None or not disease.first_question_code:
+        return None, REASON_DISEASE_MISSING
+    if max_entries is None:
+        max_entries = _max_entries()
+
+    outcomes: Dict[CanonicalAnswers, DiseaseOutcome] = {}
+    max_depth = 0
+
+    def add(path: Tuple[Tuple[str, str], ...], outcome: DiseaseOutcome) -> bool:
+        key = tuple(sorted((question_code, (answer,)) for question_code, answer in path))
+        outcomes[key] = outcome
+        return len(outcomes) <= max_entries
+
+    # (问题编码, 到达该问题的路径)
+    stack = [(disease.first_question_code, ())]
+    while stack:
+        question_code, path = stack.pop()
+        max_depth = max(max_depth, len(path))
+        question = graph.questions.get(question_code)
+        if question is None:
+            outcome = DiseaseOutcome(disease_code=disease.code, status=STATUS_INVALID, path=path,
+                                     message=f'问题不存在: {question_code}')
+            if not add(path, outcome):
+                return None, REASON_TOO_LARGE
+            continue
+        outcome = DiseaseOutcome(disease_code=disease.code, status=STATUS_PENDING, path=path,
+                                 pending_question_code=question_code)
+        if not add(path, outcome):
+            return None, REASON_TOO_LARGE
+
+        visited = {code for code, _ in path}
+        visited.add(question_code)
+        # 与QuestionNode.answer_for一致，同名答案以后出现的为准
+        edges = {edge.answer_content: edge for edge in question.answers}
+        for edge in reversed(list(edges.values())):
+            step = path + ((question_code, edge.answer_content),)
+            if edge.is_terminal:
+                outcome = conclude(disease.code, step, (edge,))
+            elif edge.next_question_code in visited:
+                # 行走时跳过已经过的问题，路径到此结束且没有结论
+                outcome = conclude(disease.code, step, ())
+            else:
+                stack.append((edge.next_question_code, step))
+                continue
+            max_depth = max(max_depth, len(step))
+            if not add(step, outcome):
+                return None, REASON_TOO_LARGE
+
+    return OutcomeTable(disease_code=disease.code, outcomes=outcomes, max_depth=max_depth), None
+
+
+class OutcomeTableCache:
+    """按规则图缓存各疾病的结果表，规则图失效后随之释放"""
+
+    def __init__(self):
+        self._tables: 'weakref.WeakKeyDictionary[CompiledRule, Dict[str, Tuple[Optional[OutcomeTable], Optional[str]]]]' = \
+            weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def get(self, graph: CompiledRule, disease_code: str) -> Tuple[Optional[OutcomeTable], Optional[str]]:
+        with self._lock:
+            tables = self._tables.get(graph)
+            if tables is None:
+                tables = self._tables[graph] = {}
+            entry = tables.get(disease_code)
+        if entry is None:
+            entry = build_table(graph, disease_code)
+            with self._lock:
+                tables[disease_code] = entry
+        return entry
+
+
+outcome_tables = OutcomeTableCache()
+
+
+def compile_tables(graph: CompiledRule) -> Dict[str, Tuple[Optional[OutcomeTable], Optional[str]]]:
+    """为规则图的全部疾病建表"""
+    return {code: outcome_tables.get(graph, code) for code in graph.diseases}
+
+
+def lookup(graph: CompiledRule, disease_code: str,
+           answers: Mapping[str, Tuple[str, ...]]) -> Optional[DiseaseOutcome]:
+    """在结果表中查找疾病的结果，未建表或答案不是一条路径时返回None"""
+    table, _ = outcome_tables.get(graph, disease_code)
+    if table is None:
+        return None
+    return table.lookup(canonical_answers(graph, disease_code, answers))
+
+
+def resolve_outcomes(graph: CompiledRule, disease_codes: Sequence[Optional[str]],
+                     answers: Mapping[str, Tuple[str, ...]]) -> List[DiseaseOutcome]:
+    """评估多个疾病：先查结果表，查不到的疾病在规则图上行走(多个疾病按合并计划)，结果按disease_codes的顺序返回"""
+    outcomes: List[Optional[DiseaseOutcome]] = [
+        lookup(graph, code, answers) if code and graph.disease(code) else None
+        for code in disease_codes
+    ]
+    missing = [i for i, outcome in enumerate(outcomes) if outcome is None]
+    if len(missing) > 1:
+        # 多个疾病按合并的问卷计划评估，共享的问题只评估一次
+        from app.services.underwriting.merged_plan import evaluate_merged
+        walked: Iterable[DiseaseOutcome] = evaluate_merged(graph, [disease_codes[i] for i in missing], answers)
+    else:
+        walked = [graph.walk(disease_codes[i], answers) for i in missing]
+    for i, outcome in zip(missing, walked):
+        outcomes[i] = outcome
+    return outcomes
+
+
+def coverage(graph: CompiledRule) -> Dict[str, Any]:
+    """整条规则的路径覆盖统计
+
+    - 每个疾病：是否建表、路径数、待答状态数、无效路径数、最大深度、经过的问题和答案、结论分布
+    - 整条规则：建表的疾病数、未建表的疾病(行走)、已建表疾病的路径覆盖的答案占全部答案的比例
+    """
+    diseases = []
+    covered = set()
+    fallback = Counter()
+    for code, (table, reason) in compile_tables(graph).items():
+        if table is None:
+            fallback[reason] += 1
+            diseases.append({'disease_code': code, 'tabled': False, 'reason': reason})
+            continue
+        diseases.append(table.coverage())
+        covered.update(step for outcome in table.outcomes.values() for step in outcome.path)
+
+    edge_count = graph.edge_count
+    return {
+        'rule_id': graph.rule_id,
+        'version': graph.version,
+        'max_entries': _max_entries(),
+        'diseases': diseases,
+        'totals': {
+            'diseases': len(diseases),
+            'tabled': len(diseases) - sum(fallback.values()),
+            'fallback': dict(fallback),
+            'answers': edge_count,
+            'covered_answers': len(covered),
+            'answer_coverage': round(len(covered) / edge_count, 4) if edge_count else None
+        }
+    }
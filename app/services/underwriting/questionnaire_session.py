@@ -0,0 +1,338 @@
+"""问卷会话
+
+移动端按会话逐题作答：创建会话时选择疾病，之后每次提交一个答案，服务端在规则图上推进并只返回下一个问题，
+全部疾病得出结论后返回核保结果。与一次性下发整条规则的全部问题和结论相比，每一步只传输一个问题。
+
+- 评估是增量的：会话保存每个疾病的当前结果，提交答案后只重新行走受影响的疾病
+  (待答问题就是该问题，或答案路径经过该问题的疾病)
+- 修改已回答的问题时，受影响的疾病在该问题之后回答的问题一并作废，按新的分支重新作答
+- 会话保存在进程内的LRU中(数量上限和空闲过期时间可配置)；每一步同时返回签名的会话令牌，
+  其中包含规则、版本、疾病和已答答案，会话被淘汰或请求落到其他worker时可由令牌恢复。
+  令牌带签发时间，超过空闲过期时间的令牌不能再恢复会话
+"""
+import time
+import secrets
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from flask import current_app
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+
+from app.services.underwriting import evaluation_cache
+from app.services.underwriting.rule_graph import (
+    STATUS_CONCLUDED,
+    STATUS_INVALID,
+    STATUS_PENDING,
+    CompiledRule,
+    DiseaseOutcome,
+    get_rule_graph,
+    normalize_answers
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SESSIONS = 10000
+DEFAULT_SESSION_TTL = 1800
+
+TOKEN_SALT = 'questionnaire-session'
+
+
+class SessionError(ValueError):
+    """会话请求无效(规则、疾病、问题或答案不存在等)"""
+
+
+@dataclass
+class QuestionnaireSession:
+    """一次问卷作答的状态"""
+    id: str
+    rule_id: int
+    version: Optional[str]
+    diseases: Tuple[str, ...]
+    # 按作答顺序保存的答案 {问题编码: (答案内容, ...)}
+    answers: Dict[str, Tuple[str, ...]] = field(default_factory=dict)
+    # 各疾病的当前结果
+    outcomes: Dict[str, DiseaseOutcome] = field(default_factory=dict)
+    created_at: float = field(default_factory=time.time)
+    touched_at: float = field(default_factory=time.monotonic)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def graph(self) -> CompiledRule:
+        graph = get_rule_graph(self.rule_id, self.version)
+        if graph is None:
+            raise SessionError(f'规则不存在: {self.rule_id}' + (f', 版本: {self.version}' if self.version else ''))
+        return graph
+
+    def refresh(self, graph: CompiledRule, disease_codes: Optional[Sequence[str]] = None):
+        """重新行走指定疾病(默认全部)"""
+        for code in (self.diseases if disease_codes is None else disease_codes):
+            self.outcomes[code] = evaluation_cache.walk(graph, code, self.answers)
+
+    def next_question(self) -> Optional[Tuple[str, str]]:
+        """按疾病的选择顺序返回第一个待答问题 (疾病编码, 问题编码)"""
+        for code in self.diseases:
+            outcome = self.outcomes.get(code)
+            if outcome is not None and outcome.status == STATUS_PENDING:
+                return code, outcome.pending_question_code
+        return None
+
+
+class SessionStore:
+    """进程内的会话LRU，超过数量上限时淘汰最久未使用的会话，空闲超过TTL的会话视为过期"""
+
+    def __init__(self, max_size: Optional[int] = None, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._sessions: 'OrderedDict[str, QuestionnaireSession]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _limits(self) -> Tuple[int, float]:
+        max_size = self.max_size if self.max_size is not None else \
+            current_app.config.get('QUESTIONNAIRE_SESSION_MAX', DEFAULT_MAX_SESSIONS)
+        ttl = self.ttl if self.ttl is not None else \
+            current_app.config.get('QUESTIONNAIRE_SESSION_TTL', DEFAULT_SESSION_TTL)
+        return max_size, ttl
+
+    def get(self, session_id: str) -> Optional[QuestionnaireSession]:
+        _, ttl = self._limits()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if time.monotonic() - session.touched_at > ttl:
+                del self._sessions[session_id]
+                return None
+            session.touched_at = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def put(self, session: QuestionnaireSession):
+        max_size, _ = self._limits()
+        with self._lock:
+            session.touched_at = time.monotonic()
+            self._sessions[session.id] = session
+            self._sessions.move_to_end(session.id)
+            while len(self._sessions) > max_size:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def stats(self) -> Dict[str, Any]:
+        max_size, ttl = self._limits()
+        with self._lock:
+            return {'size': len(self._sessions), 'max_size': max_size, 'ttl': ttl, 'evictions': self.evictions}
+
+
+session_store = SessionStore()
+
+
+def _serializer() -> URLSafeTimedSerializer:
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt=TOKEN_SALT)
+
+
+def session_token(session: QuestionnaireSession) -> str:
+    """签名的会话令牌，包含恢复会话所需的全部状态"""
+    return _serializer().dumps({
+        'i': session.id,
+        'r': session.rule_id,
+        'v': session.version,
+        'd': list(session.diseases),
+        'a': [[code, list(values)] for code, values in session.answers.items()]
+    })
+
+
+def restore_session(token: str, session_id: Optional[str] = None) -> QuestionnaireSession:
+    """由令牌恢复会话并放回LRU
+
+    Raises:
+        SessionError: 令牌无效、已过期、格式不符或与会话ID不一致
+    """
+    _, ttl = session_store._limits()
+    try:
+        data = _serializer().loads(token, max_age=ttl)
+    except SignatureExpired:
+        raise SessionError('会话令牌已过期')
+    except BadSignature:
+        raise SessionError('会话令牌无效')
+
+    try:
+        session = QuestionnaireSession(
+            id=data['i'],
+            rule_id=data['r'],
+            version=data.get('v'),
+            diseases=tuple(data.get('d') or ()),
+            answers={code: tuple(values) for code, values in data.get('a') or ()}
+        )
+    except (KeyError, TypeError, ValueError, AttributeError):
+        # 旧格式或内容不完整的令牌
+        raise SessionError('会话令牌格式无效')
+    if session_id is not None and session.id != session_id:
+        raise SessionError('会话令牌与会话ID不一致')
+    session.refresh(session.graph())
+    session_store.put(session)
+    logger.info(f'问卷会话已由令牌恢复: id={session.id}, rule_id={session.rule_id}, answers={len(session.answers)}')
+    return session
+
+
+def get_session(session_id: str, token: Optional[str] = None) -> Optional[QuestionnaireSession]:
+    """获取会话，LRU中不存在且提供了令牌时由令牌恢复"""
+    session = session_store.get(session_id)
+    if session is None and token:
+        session = restore_session(token, session_id)
+    return session
+
+
+def create_session(rule_id: int, disease_codes: Sequence[str], version: Optional[str] = None,
+                   answers=None) -> QuestionnaireSession:
+    """创建会话
+
+    Args:
+        rule_id: 规则ID
+        disease_codes: 申请人选择的疾病编码
+        version: 发布的版本号或latest，为空时使用当前规则数据；latest在创建时确定为具体版本
+        answers: 可选，已知的答案，格式见 ``normalize_answers``
+
+    Raises:
+        SessionError: 规则、版本或疾病不存在
+    """
+    graph = get_rule_graph(rule_id, version)
+    if graph is None:
+        raise SessionError(f'规则不存在: {rule_id}' + (f', 版本: {version}' if version else ''))
+
+    diseases = []
+    for code in disease_codes or ():
+        disease = graph.disease(code)
+        if disease is None:
+            raise SessionError(f'疾病不存在: {code}')
+        if disease.code not in diseases:
+            diseases.append(disease.code)
+    if not diseases:
+        raise SessionError('请选择疾病')
+
+    session = QuestionnaireSession(
+        id=secrets.token_urlsafe(16),
+        rule_id=graph.rule_id,
+        version=graph.version if version else None,
+        diseases=tuple(diseases),
+        answers=normalize_answers(answers)
+    )
+    session.refresh(graph)
+    session_store.put(session)
+    logger.info(f'问卷会话创建: id={session.id}, rule_id={session.rule_id}, version={session.version}, diseases={len(diseases)}')
+    return session
+
+
+def submit_answer(session: QuestionnaireSession, question_code: str, answer) -> QuestionnaireSession:
+    """提交一个问题的答案(多选题可传列表)
+
+    只能回答当前待答的问题或修改已回答的问题；修改时，答案路径经过该问题的疾病在其后回答的问题一并作废
+    (其他疾病路径上的问题保留)。
+
+    Raises:
+        SessionError: 问题不在当前作答路径上或答案不存在
+    """
+    with session.lock:
+        graph = session.graph()
+        question = graph.question(question_code)
+        if question is None:
+            raise SessionError(f'问题不存在: {question_code}')
+        question_code = question.code
+
+        values = normalize_answers({question_code: answer}).get(question_code)
+        if not values:
+            raise SessionError('答案不能为空')
+        if len(values) > 1 and not question.is_multiple:
+            raise SessionError(f'问题 {question_code} 为单选题')
+        edges = [question.answer_for(value) for value in values]
+        if any(edge is None for edge in edges):
+            raise SessionError(f'问题 {question_code} 不存在答案: {", ".join(values)}')
+        values = tuple(edge.answer_content for edge in edges)
+
+        pending = {outcome.pending_question_code for outcome in session.outcomes.values()
+                   if outcome.status == STATUS_PENDING}
+        if question_code not in session.answers and question_code not in pending:
+            raise SessionError(f'问题 {question_code} 不是当前待答的问题')
+
+        changed = {question_code}
+        if question_code in session.answers:
+            # 修改已回答的问题：作废其后回答的、只属于受影响疾病路径的问题
+            keep = {
+                q for outcome in session.outcomes.values()
+                if all(q != question_code for q, _ in outcome.path)
+                for q, _ in outcome.path
+            }
+            codes = list(session.answers)
+            for code in codes[codes.index(question_code) + 1:]:
+                if code not in keep:
+                    changed.add(code)
+                    del session.answers[code]
+        session.answers[question_code] = values
+
+        affected = [
+            code for code, outcome in session.outcomes.items()
+            if outcome.pending_question_code in changed
+            or any(q in changed for q, _ in outcome.path)
+        ]
+        session.refresh(graph, affected)
+        session.touched_at = time.monotonic()
+        logger.debug('问卷会话作答: id=%s, question=%s, affected=%s', session.id, question_code, affected)
+        return session
+
+
+def question_payload(graph: CompiledRule, disease_code: str, question_code: str) -> Optional[Dict[str, Any]]:
+    """下一个问题：只包含问题和可选答案，不包含下一题和结论"""
+    question = graph.question(question_code)
+    if question is None:
+        return None
+    disease = graph.disease(disease_code)
+    return {
+        'disease_code': disease_code,
+        'disease_name': disease.name if disease else None,
+        'code': question.code,
+        'content': question.content,
+        'question_type': question.question_type,
+        'attribute': question.attribute,
+        'remark': question.remark,
+        'multiple': question.is_multiple,
+        'options': [
+            {'answer_content': edge.answer_content, 'display_order': edge.display_order}
+            for edge in sorted(question.answers, key=lambda edge: edge.display_order or 0)
+        ]
+    }
+
+
+def session_state(session: QuestionnaireSession) -> Dict[str, Any]:
+    """会话当前状态：下一个问题、进度，全部疾病结束后附带核保结果"""
+    graph = session.graph()
+    result = graph.summarize(session.outcomes[code] for code in session.diseases)
+    upcoming = session.next_question() if result.status == STATUS_PENDING else None
+    statuses = [session.outcomes[code].status for code in session.diseases]
+    data = {
+        'session_id': session.id,
+        'token': session_token(session),
+        'rule_id': session.rule_id,
+        'version': session.version,
+        'status': result.status,
+        'next_question': question_payload(graph, *upcoming) if upcoming else None,
+        'progress': {
+            'answered': len(session.answers),
+            'diseases': len(session.diseases),
+            'concluded': statuses.count(STATUS_CONCLUDED)
+        },
+        'answers': [{'question_code': code, 'answer_content': list(values)}
+                    for code, values in session.answers.items()]
+    }
+    if result.status == STATUS_CONCLUDED:
+        data['result'] = result.to_dict()
+    elif result.status == STATUS_INVALID:
+        data['errors'] = [
+            {'disease_code': o.disease_code, 'message': o.message}
+            for o in result.outcomes if o.status == STATUS_INVALID
+        ]
+    return data
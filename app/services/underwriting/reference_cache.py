@@ -0,0 +1,187 @@
+"""疾病、疾病大类等参考数据的进程内缓存
+
+这些目录数据只在导入、关联疾病、规则状态变化时才会改变，却被移动端和管理端频繁读取。
+缓存直接保存序列化后的完整JSON响应体，命中时不查询数据库，也不重新构建字典和序列化。
+
+- 版本: 每次失效使全局版本号加一，旧版本的条目不再使用
+- TTL: 失效只在当前进程中生效，其他worker中的条目最迟在 ``REFERENCE_CACHE_TTL`` 秒后过期
+- 同一目录同时未命中时只构建一次，其他线程等待构建结果
+- ETag: 按响应体内容计算，各worker一致，客户端缓存有效时返回304
+"""
+import time
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from flask import current_app
+
+from app.extensions import db
+from app.models.rules.disease.disease import Disease
+from app.models.rules.disease.disease_category import DiseaseCategory
+from app.utils.conditional import not_modified, set_validators
+from app.utils.serialization import dumps, json_response
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 300
+
+
+@dataclass
+class CacheEntry:
+    """缓存的响应体"""
+    body: bytes
+    etag: str
+    version: int
+    expires_at: float
+    count: int = 0
+
+
+class ReferenceDataCache:
+    """按名称缓存序列化后的参考数据"""
+
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = ttl
+        self.version = 0
+        self._entries: Dict[str, CacheEntry] = {}
+        self._lock = threading.Lock()
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _ttl(self) -> float:
+        if self.ttl is not None:
+            return self.ttl
+        return current_app.config.get('REFERENCE_CACHE_TTL', DEFAULT_TTL)
+
+    def _record(self, name: str, event: str):
+        with self._lock:
+            stats = self._stats.setdefault(name, {'hits': 0, 'misses': 0, 'builds': 0})
+            stats[event] += 1
+
+    def _valid(self, entry: Optional[CacheEntry]) -> bool:
+        return entry is not None and entry.version == self.version and entry.expires_at > time.monotonic()
+
+    def get(self, name: str, build: Callable[[], Any]) -> CacheEntry:
+        """获取缓存的响应体，未命中时调用build取得数据并序列化
+
+        Args:
+            name: 目录名称
+            build: 返回响应中data部分的函数
+        """
+        entry = self._entries.get(name)
+        if self._valid(entry):
+            self._record(name, 'hits')
+            return entry
+
+        self._record(name, 'misses')
+        with self._lock:
+            build_lock = self._build_locks.setdefault(name, threading.Lock())
+
+        with build_lock:
+            entry = self._entries.get(name)
+            if self._valid(entry):
+                return entry
+            version = self.version
+            started = time.perf_counter()
+            data = build()
+            body = dumps({
+                "code": 200,
+                "data": data,
+                "message": "success"
+            })
+            entry = CacheEntry(
+                body=body,
+                etag=hashlib.sha1(body).hexdigest(),
+                version=version,
+                expires_at=time.monotonic() + self._ttl(),
+                count=len(data) if hasattr(data, '__len__') else 0
+            )
+            # 构建期间发生失效时不写入，下次请求重新构建
+            if version == self.version:
+                self._entries[name] = entry
+            self._record(name, 'builds')
+            logger.info(
+                f"参考数据缓存构建: name={name}, count={entry.count}, bytes={len(body)}, "
+                f"elapsed={(time.perf_counter() - started) * 1000:.1f}ms"
+            )
+            return entry
+
+    def response(self, name: str, build: Callable[[], Any]):
+        """以缓存的响应体构造JSON响应，支持If-None-Match"""
+        entry = self.get(name, build)
+        response = not_modified(entry.etag)
+        if response is not None:
+            return response
+        return set_validators(json_response(body=entry.body), entry.etag)
+
+    def invalidate(self, reason: str = None):
+        """使全部条目失效"""
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+        logger.info(f"参考数据缓存失效: version={self.version}, reason={reason}")
+
+    def stats(self) -> Dict[str, Any]:
+        """命中统计"""
+        with self._lock:
+            catalogs = {}
+            for name, stats in self._stats.items():
+                lookups = stats['hits'] + stats['misses']
+                entry = self._entries.get(name)
+                catalogs[name] = {
+                    **stats,
+                    'hit_rate': round(stats['hits'] / lookups, 4) if lookups else None,
+                    'cached': self._valid(entry),
+                    'count': entry.count if entry else None,
+                    'bytes': len(entry.body) if entry else None
+                }
+            return {'version': self.version, 'catalogs': catalogs}
+
+
+reference_cache = ReferenceDataCache()
+
+# 目录名称
+CATALOG_DISEASES = 'diseases'
+CATALOG_DISEASE_CATEGORIES = 'disease_categories'
+CATALOG_ALL_DISEASES = 'all_diseases'
+CATALOG_ALL_CATEGORIES = 'all_categories'
+
+
+def load_diseases():
+    """疾病列表(列投影)"""
+    rows = db.session.query(
+        Disease.code, Disease.name, Disease.category_name, Disease.first_question_code
+    ).order_by(Disease.id)
+    return [
+        {
+            'code': row.code,
+            'name': row.name,
+            'category_name': row.category_name,
+            'first_question_code': row.first_question_code
+        }
+        for row in rows
+    ]
+
+
+def load_disease_categories():
+    """疾病大类列表(列投影)"""
+    rows = db.session.query(
+        DiseaseCategory.code, DiseaseCategory.name, DiseaseCategory.description
+    ).order_by(DiseaseCategory.id)
+    return [{'code': row.code, 'name': row.name, 'description': row.description} for row in rows]
+
+
+def load_all_diseases():
+    """全部疾病的完整字段"""
+    return [disease.to_dict() for disease in Disease.query.order_by(Disease.id)]
+
+
+def load_all_categories():
+    """全部疾病大类的完整字段"""
+    return [category.to_dict() for category in DiseaseCategory.query.order_by(DiseaseCategory.id)]
+
+
+def invalidate_reference_data(reason: str = None):
+    """疾病、疾病大类数据或规则状态变化后调用"""
+    reference_cache.invalidate(reason)
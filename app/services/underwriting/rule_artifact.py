@@ -0,0 +1,320 @@
+"""规则图二进制制品
+
+把编译后的规则图写成紧凑的二进制文件，加载时使用 mmap 映射，同一台机器上的多个
+gunicorn worker 共享同一份只读页，不需要在每个进程中构造完整的对象图。
+
+文件布局(小端)::
+
+    header      HEADER
+    strings     (string_count + 1) 个 uint32 偏移 + UTF-8 字节
+    diseases    disease_count 条 DISEASE，按编码排序
+    questions   question_count 条 QUESTION，按编码排序
+    answers     answer_count 条 ANSWER，按所属问题连续存放
+
+所有文本(编码、内容、结论等)都存放在字符串表中，记录里只保存字符串下标，
+``NONE`` 表示空值。疾病和问题按编码的UTF-8字节排序，查找时直接在映射的内存上二分。
+"""
+import os
+import mmap
+import time
+import struct
+import logging
+import tempfile
+import threading
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional
+
+from flask import current_app
+
+from app.services.underwriting.rule_graph import AnswerEdge, CompiledRule, DiseaseEntry, QuestionNode
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'UWRA'
+FORMAT_VERSION = 1
+NONE = 0xFFFFFFFF
+FILE_SUFFIX = '.uwr'
+
+# magic, 格式版本, 保留, 规则ID, 版本号(字符串下标), 字符串数, 疾病数, 问题数, 答案数,
+# 字符串偏移表位置, 字符串数据位置, 疾病段位置, 问题段位置, 答案段位置
+HEADER = struct.Struct('<4sHHqIIIIIQQQQQ')
+# code, name, category_code, category_name, first_question_code
+DISEASE = struct.Struct('<5I')
+# code, content, attribute, question_type, remark, 第一个答案下标, 答案数
+QUESTION = struct.Struct('<7I')
+# id, 问题下标, answer_content, next_question_code, medical_conclusion, critical_illness_conclusion,
+# medical_special_code, critical_illness_special_code, medical_special_desc,
+# critical_illness_special_desc, remark, display_order
+ANSWER = struct.Struct('<qI9Ii')
+OFFSET = struct.Struct('<I')
+OFFSET_PAIR = struct.Struct('<II')
+
+
+class _StringTable:
+    """写入时的字符串表，相同的字符串只保存一次"""
+
+    def __init__(self):
+        self._index: Dict[str, int] = {}
+        self._values: List[bytes] = []
+
+    def add(self, value) -> int:
+        if value is None:
+            return NONE
+        value = str(value)
+        index = self._index.get(value)
+        if index is None:
+            index = self._index[value] = len(self._values)
+            self._values.append(value.encode('utf-8'))
+        return index
+
+    def __len__(self):
+        return len(self._values)
+
+    def dump(self):
+        offsets = bytearray()
+        position = 0
+        for value in self._values:
+            offsets += OFFSET.pack(position)
+            position += len(value)
+        offsets += OFFSET.pack(position)
+        return bytes(offsets), b''.join(self._values)
+
+
+def _code_key(code) -> bytes:
+    return str(code).encode('utf-8')
+
+
+def _pad(buffer: bytearray, alignment: int = 8):
+    buffer += b'\0' * (-len(buffer) % alignment)
+
+
+def dump_artifact(graph: CompiledRule) -> bytes:
+    """把规则图序列化为二进制制品"""
+    strings = _StringTable()
+    version_index = strings.add(graph.version)
+
+    diseases = sorted(graph.diseases.values(), key=lambda d: _code_key(d.code))
+    questions = sorted(graph.questions.values(), key=lambda q: _code_key(q.code))
+
+    disease_data = bytearray()
+    for d in diseases:
+        disease_data += DISEASE.pack(
+            strings.add(d.code), strings.add(d.name), strings.add(d.category_code),
+            strings.add(d.category_name), strings.add(d.first_question_code)
+        )
+
+    question_data = bytearray()
+    answer_data = bytearray()
+    answer_count = 0
+    for index, q in enumerate(questions):
+        question_data += QUESTION.pack(
+            strings.add(q.code), strings.add(q.content), strings.add(q.attribute),
+            strings.add(q.question_type), strings.add(q.remark), answer_count, len(q.answers)
+        )
+        for e in q.answers:
+            answer_data += ANSWER.pack(
+                e.id or 0, index, strings.add(e.answer_content), strings.add(e.next_question_code),
+                strings.add(e.medical_conclusion), strings.add(e.critical_illness_conclusion),
+                strings.add(e.medical_special_code), strings.add(e.critical_illness_special_code),
+                strings.add(e.medical_special_desc), strings.add(e.critical_illness_special_desc),
+                strings.add(e.remark), e.display_order or 0
+            )
+            answer_count += 1
+
+    string_offsets, string_data = strings.dump()
+
+    body = bytearray()
+    sections = []
+    for data in (string_offsets, string_data, disease_data, question_data, answer_data):
+        _pad(body)
+        sections.append(HEADER.size + len(body))
+        body += data
+
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, 0, graph.rule_id, version_index,
+        len(strings), len(diseases), len(questions), answer_count, *sections
+    )
+    return header + bytes(body)
+
+
+def write_artifact(graph: CompiledRule, path: str) -> str:
+    """写入二进制制品
+
+    先写临时文件再原子替换，已映射旧文件的进程不受影响。
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    data = dump_artifact(graph)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    logger.info(f"规则制品写入完成: {path}, {len(data)} bytes, {graph!r}")
+    return path
+
+
+class RuleArtifact:
+    """内存映射的规则制品"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, fmt, _, self.rule_id, version_index, self.string_count, self.disease_count,
+         self.question_count, self.answer_count, self._string_offsets, self._string_data,
+         self._diseases, self._questions, self._answers) = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or fmt != FORMAT_VERSION:
+            self._mmap.close()
+            raise ValueError(f'不支持的规则制品格式: {path}')
+        self.version = self.string(version_index)
+
+    def close(self):
+        self._mmap.close()
+
+    def raw(self, index: int) -> Optional[bytes]:
+        if index == NONE:
+            return None
+        start, end = OFFSET_PAIR.unpack_from(self._mmap, self._string_offsets + index * OFFSET.size)
+        return self._mmap[self._string_data + start:self._string_data + end]
+
+    def string(self, index: int) -> Optional[str]:
+        value = self.raw(index)
+        return value.decode('utf-8') if value is not None else None
+
+    def _find(self, base: int, record: struct.Struct, count: int, code) -> int:
+        """在按编码排序的记录中二分查找，返回下标，不存在时返回-1"""
+        key = _code_key(code)
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            current = self.raw(OFFSET.unpack_from(self._mmap, base + middle * record.size)[0])
+            if current < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < count and self.raw(OFFSET.unpack_from(self._mmap, base + low * record.size)[0]) == key:
+            return low
+        return -1
+
+    def find_disease(self, code) -> int:
+        return self._find(self._diseases, DISEASE, self.disease_count, code)
+
+    def find_question(self, code) -> int:
+        return self._find(self._questions, QUESTION, self.question_count, code)
+
+    def disease_code(self, index: int) -> str:
+        return self.string(DISEASE.unpack_from(self._mmap, self._diseases + index * DISEASE.size)[0])
+
+    def question_code(self, index: int) -> str:
+        return self.string(QUESTION.unpack_from(self._mmap, self._questions + index * QUESTION.size)[0])
+
+    def disease(self, index: int) -> DiseaseEntry:
+        values = DISEASE.unpack_from(self._mmap, self._diseases + index * DISEASE.size)
+        code, name, category_code, category_name, first_question_code = map(self.string, values)
+        return DiseaseEntry(code=code, name=name, category_code=category_code,
+                            category_name=category_name, first_question_code=first_question_code)
+
+    def question(self, index: int) -> QuestionNode:
+        values = QUESTION.unpack_from(self._mmap, self._questions + index * QUESTION.size)
+        code, content, attribute, question_type, remark = map(self.string, values[:5])
+        first_answer, count = values[5], values[6]
+        answers = []
+        for i in range(first_answer, first_answer + count):
+            row = ANSWER.unpack_from(self._mmap, self._answers + i * ANSWER.size)
+            texts = [self.string(s) for s in row[2:11]]
+            answers.append(AnswerEdge(
+                id=row[0],
+                question_code=code,
+                answer_content=texts[0],
+                next_question_code=texts[1],
+                medical_conclusion=texts[2],
+                critical_illness_conclusion=texts[3],
+                medical_special_code=texts[4],
+                critical_illness_special_code=texts[5],
+                medical_special_desc=texts[6],
+                critical_illness_special_desc=texts[7],
+                remark=texts[8],
+                display_order=row[11]
+            ))
+        return QuestionNode(code=code, content=content, attribute=attribute, question_type=question_type,
+                            remark=remark, answers=tuple(answers))
+
+
+class _ArtifactView(Mapping):
+    """按编码访问制品中的记录，节点在访问时才构造"""
+
+    def __init__(self, count, find, build, code_at):
+        self._count = count
+        self._find = find
+        self._build = build
+        self._code_at = code_at
+
+    def __getitem__(self, code):
+        if code is None:
+            raise KeyError(code)
+        index = self._find(code)
+        if index < 0:
+            raise KeyError(code)
+        return self._build(index)
+
+    def __contains__(self, code):
+        return code is not None and self._find(code) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(self._count):
+            yield self._code_at(index)
+
+    def __len__(self):
+        return self._count
+
+
+class MappedRule(CompiledRule):
+    """基于内存映射制品的规则图，接口与 ``CompiledRule`` 一致"""
+
+    def __init__(self, artifact: RuleArtifact):
+        self.artifact = artifact
+        self.rule_id = artifact.rule_id
+        self.version = artifact.version
+        self.stamp = time.time_ns()
+        self.diseases = _ArtifactView(artifact.disease_count, artifact.find_disease,
+                                      artifact.disease, artifact.disease_code)
+        self.questions = _ArtifactView(artifact.question_count, artifact.find_question,
+                                       artifact.question, artifact.question_code)
+
+    @property
+    def edge_count(self) -> int:
+        return self.artifact.answer_count
+
+
+def load_artifact(path: str) -> MappedRule:
+    """映射规则制品"""
+    return MappedRule(RuleArtifact(path))
+
+
+_artifact_lock = threading.Lock()
+
+
+def artifact_path(rule_id: int, version: str) -> str:
+    """已发布版本的制品路径，目录由 RULE_ARTIFACT_DIR 配置"""
+    directory = current_app.config.get('RULE_ARTIFACT_DIR') or os.path.join(current_app.instance_path, 'rule_artifacts')
+    safe_version = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in str(version))
+    return os.path.join(directory, f'rule_{rule_id}_{safe_version}{FILE_SUFFIX}')
+
+
+def write_version_artifact(graph: CompiledRule, version: str) -> str:
+    """为已发布的版本写入制品"""
+    with _artifact_lock:
+        return write_artifact(graph, artifact_path(graph.rule_id, version))
+
+
+def load_version_artifact(rule_id: int, version: str) -> Optional[MappedRule]:
+    """加载已发布版本的制品，文件不存在时返回None"""
+    path = artifact_path(rule_id, version)
+    if not os.path.exists(path):
+        return None
+    return load_artifact(path)
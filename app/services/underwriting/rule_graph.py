@@ -0,0 +1,817 @@
+"""核保规则问卷图
+
+把一条核保规则下的疾病、问题和答案(结论表)编译成只读的内存图:
+
+    疾病 --first_question_code--> 问题 --答案--> 下一个问题 / 结论
+
+图按规则编译一次后常驻进程内存，问卷流转和核保评估直接在图上完成，不再访问数据库。
+规则数据发生变化(导入、增删改疾病和问题等)时调用 ``invalidate_rule_graph`` 使缓存失效；
+其他进程的修改由规则数据的水位核对发现，见 ``RuleGraphCache``。
+"""
+import time
+import threading
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from flask import current_app, has_app_context
+from sqlalchemy import func, select
+
+from app.extensions import db
+from app.models.rules.core.underwriting_rule import UnderwritingRule
+from app.models.rules.core.rule_version import RuleVersion
+from app.models.rules.disease.disease import Disease
+from app.models.rules.question.question import Question
+from app.models.rules.conclusion.conclusion import Conclusion
+
+logger = logging.getLogger(__name__)
+
+# 结论严重程度(关键字匹配)，用于多个疾病/多选分支的结论合并，数值越大越严重
+CONCLUSION_SEVERITY = (
+    ('拒保', 50),
+    ('延期', 40),
+    ('人工', 35),
+    ('除外', 30),
+    ('加费', 20),
+    ('标准', 0),
+)
+UNKNOWN_CONCLUSION_SEVERITY = 25
+
+# 评估状态
+STATUS_CONCLUDED = 'concluded'  # 已得出结论
+STATUS_PENDING = 'pending'      # 还有问题未回答
+STATUS_INVALID = 'invalid'      # 规则数据或答案无效
+
+# 规则图缓存核对规则数据水位的默认间隔(秒)
+DEFAULT_CHECK_INTERVAL = 2
+
+
+@lru_cache(maxsize=4096)
+def conclusion_severity(conclusion: Optional[str]) -> int:
+    """获取结论的严重程度，空结论视为最轻"""
+    if not conclusion:
+        return -1
+    for keyword, severity in CONCLUSION_SEVERITY:
+        if keyword in conclusion:
+            return severity
+    return UNKNOWN_CONCLUSION_SEVERITY
+
+
+def most_severe(conclusions: Iterable[Optional[str]]) -> Optional[str]:
+    """返回最严重的结论"""
+    result = None
+    for conclusion in conclusions:
+        if conclusion and conclusion_severity(conclusion) > conclusion_severity(result):
+            result = conclusion
+    return result
+
+
+def _clean(value) -> Optional[str]:
+    """统一编码/文本的格式"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+@dataclass(frozen=True)
+class AnswerEdge:
+    """答案边: 问题 --答案--> 下一个问题 / 结论"""
+    id: int
+    question_code: str
+    answer_content: str
+    next_question_code: Optional[str] = None
+    medical_conclusion: Optional[str] = None
+    critical_illness_conclusion: Optional[str] = None
+    medical_special_code: Optional[str] = None
+    critical_illness_special_code: Optional[str] = None
+    medical_special_desc: Optional[str] = None
+    critical_illness_special_desc: Optional[str] = None
+    display_order: int = 0
+    remark: Optional[str] = None
+
+    @property
+    def is_terminal(self) -> bool:
+        """是否为终止答案(没有下一个问题)"""
+        return not self.next_question_code
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'question_code': self.question_code,
+            'answer_content': self.answer_content,
+            'next_question_code': self.next_question_code,
+            'medical_conclusion': self.medical_conclusion,
+            'critical_illness_conclusion': self.critical_illness_conclusion,
+            'medical_special_code': self.medical_special_code,
+            'critical_illness_special_code': self.critical_illness_special_code,
+            'medical_special_desc': self.medical_special_desc,
+            'critical_illness_special_desc': self.critical_illness_special_desc,
+            'display_order': self.display_order,
+            'remark': self.remark
+        }
+
+
+@dataclass(frozen=True)
+class QuestionNode:
+    """问题节点"""
+    code: str
+    content: Optional[str] = None
+    attribute: Optional[str] = None
+    question_type: Optional[str] = None
+    remark: Optional[str] = None
+    answers: Tuple[AnswerEdge, ...] = ()
+    # 问题表中没有该问题，只有引用它的答案(编译时保留，供规则校验发现；二进制制品不保存)
+    answers_only: bool = False
+    _answer_index: Mapping[str, AnswerEdge] = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, '_answer_index', MappingProxyType(
+            {edge.answer_content: edge for edge in self.answers}
+        ))
+
+    @property
+    def is_multiple(self) -> bool:
+        """是否为多选题(问题类型 0-多选)"""
+        return self.question_type is not None and str(self.question_type).strip() == '0'
+
+    def answer_for(self, answer_content) -> Optional[AnswerEdge]:
+        """根据答案内容查找答案边"""
+        return self._answer_index.get(_clean(answer_content))
+
+    def to_dict(self, with_answers: bool = True) -> Dict[str, Any]:
+        data = {
+            'code': self.code,
+            'content': self.content,
+            'question_type': self.question_type,
+            'attribute': self.attribute,
+            'remark': self.remark
+        }
+        if with_answers:
+            data['answers'] = [edge.to_dict() for edge in self.answers]
+        return data
+
+
+@dataclass(frozen=True)
+class DiseaseEntry:
+    """疾病入口"""
+    code: str
+    name: Optional[str] = None
+    category_code: Optional[str] = None
+    category_name: Optional[str] = None
+    first_question_code: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'code': self.code,
+            'name': self.name,
+            'category_code': self.category_code,
+            'category_name': self.category_name,
+            'first_question_code': self.first_question_code
+        }
+
+
+@dataclass(frozen=True)
+class DiseaseOutcome:
+    """单个疾病的评估结果"""
+    disease_code: str
+    status: str
+    path: Tuple[Tuple[str, str], ...] = ()
+    medical_conclusion: Optional[str] = None
+    critical_illness_conclusion: Optional[str] = None
+    medical_special_codes: Tuple[str, ...] = ()
+    critical_illness_special_codes: Tuple[str, ...] = ()
+    pending_question_code: Optional[str] = None
+    message: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'disease_code': self.disease_code,
+            'status': self.status,
+            'path': [{'question_code': q, 'answer_content': a} for q, a in self.path],
+            'medical_conclusion': self.medical_conclusion,
+            'critical_illness_conclusion': self.critical_illness_conclusion,
+            'medical_special_codes': list(self.medical_special_codes),
+            'critical_illness_special_codes': list(self.critical_illness_special_codes),
+            'pending_question_code': self.pending_question_code,
+            'message': self.message
+        }
+
+
+@dataclass(frozen=True)
+class EvaluationResult:
+    """一组答案在一条规则上的评估结果"""
+    rule_id: int
+    version: Optional[str]
+    status: str
+    outcomes: Tuple[DiseaseOutcome, ...] = ()
+    medical_conclusion: Optional[str] = None
+    critical_illness_conclusion: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'rule_id': self.rule_id,
+            'version': self.version,
+            'status': self.status,
+            'medical_conclusion': self.medical_conclusion,
+            'critical_illness_conclusion': self.critical_illness_conclusion,
+            'diseases': [outcome.to_dict() for outcome in self.outcomes]
+        }
+
+    def to_summary(self) -> Dict[str, Any]:
+        """精简结果(不含答案路径)，用于批量评估"""
+        return {
+            'status': self.status,
+            'medical_conclusion': self.medical_conclusion,
+            'critical_illness_conclusion': self.critical_illness_conclusion,
+            'diseases': [{
+                'disease_code': o.disease_code,
+                'status': o.status,
+                'medical_conclusion': o.medical_conclusion,
+                'critical_illness_conclusion': o.critical_illness_conclusion,
+                'pending_question_code': o.pending_question_code,
+                'message': o.message
+            } for o in self.outcomes]
+        }
+
+
+def normalize_answers(answers) -> Dict[str, Tuple[str, ...]]:
+    """把各种格式的答案统一为 {问题编码: (答案内容, ...)}
+
+    支持:
+        {'Q1': '是', 'Q2': ['选项A', '选项B']}
+        [{'question_code': 'Q1', 'answer_content': '是'}, ...]
+    """
+    if not answers:
+        return {}
+
+    if isinstance(answers, Mapping):
+        items = answers.items()
+    else:
+        items = []
+        for item in answers:
+            question_code = item.get('question_code') or item.get('questionCode')
+            answer = item.get('answer_content', item.get('answer'))
+            items.append((question_code, answer))
+
+    result = {}
+    for question_code, answer in items:
+        question_code = _clean(question_code)
+        if not question_code:
+            continue
+        values = answer if isinstance(answer, (list, tuple, set)) else [answer]
+        cleaned = tuple(v for v in (_clean(v) for v in values) if v)
+        if cleaned:
+            result[question_code] = result.get(question_code, ()) + cleaned
+    return result
+
+
+def conclude(disease_code: str, path: Iterable[Tuple[str, str]], terminals: Iterable[AnswerEdge]) -> DiseaseOutcome:
+    """由到达的终止答案得到疾病的结论，多个分支取最严重的结论"""
+    terminals = tuple(terminals)
+    if not terminals:
+        return DiseaseOutcome(disease_code=disease_code, status=STATUS_INVALID, path=tuple(path),
+                              message='答案路径未到达结论，规则中可能存在环')
+    return DiseaseOutcome(
+        disease_code=disease_code,
+        status=STATUS_CONCLUDED,
+        path=tuple(path),
+        medical_conclusion=most_severe(e.medical_conclusion for e in terminals),
+        critical_illness_conclusion=most_severe(e.critical_illness_conclusion for e in terminals),
+        medical_special_codes=tuple(sorted({e.medical_special_code for e in terminals if e.medical_special_code})),
+        critical_illness_special_codes=tuple(sorted({e.critical_illness_special_code for e in terminals if e.critical_illness_special_code}))
+    )
+
+
+class CompiledRule:
+    """编译后的规则图(只读)"""
+
+    def __init__(self, rule_id: int, version: Optional[str],
+                 diseases: Iterable[DiseaseEntry], questions: Iterable[QuestionNode]):
+        self.rule_id = rule_id
+        self.version = version
+        self.diseases = MappingProxyType({d.code: d for d in diseases})
+        self.questions = MappingProxyType({q.code: q for q in questions})
+        # 构建时间戳，未发布的规则图重新编译后随之变化，用于生成ETag
+        self.stamp = time.time_ns()
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Mapping[str, Any]) -> 'CompiledRule':
+        """从发布的规则快照构建规则图，快照格式见 ``rule_publish_service.build_snapshot``"""
+        rule = snapshot['rule']
+        return build_compiled_rule(
+            rule['id'], snapshot.get('version') or rule.get('version'),
+            snapshot.get('diseases', ()), snapshot.get('questions', ()), snapshot.get('answers', ())
+        )
+
+    def __repr__(self):
+        return f'<CompiledRule {self.rule_id} version={self.version} diseases={len(self.diseases)} questions={len(self.questions)}>'
+
+    @property
+    def edge_count(self) -> int:
+        return sum(len(q.answers) for q in self.questions.values())
+
+    def question(self, code) -> Optional[QuestionNode]:
+        return self.questions.get(_clean(code))
+
+    def disease(self, code) -> Optional[DiseaseEntry]:
+        return self.diseases.get(_clean(code))
+
+    def first_question(self, disease_code) -> Optional[QuestionNode]:
+        """获取疾病的第一个问题"""
+        disease = self.disease(disease_code)
+        if not disease:
+            return None
+        return self.question(disease.first_question_code)
+
+    def iter_edges(self):
+        """按问题遍历所有答案边"""
+        for question in self.questions.values():
+            yield from question.answers
+
+    def walk(self, disease_code, answers: Mapping[str, Tuple[str, ...]]) -> DiseaseOutcome:
+        """沿着答案在图上行走，得到单个疾病的结果
+
+        多选题的每个选中答案都会展开一条分支，结论取所有分支中最严重的一个。
+        """
+        disease = self.disease(disease_code)
+        if not disease:
+            return DiseaseOutcome(disease_code=disease_code, status=STATUS_INVALID,
+                                  message='疾病不存在')
+        if not disease.first_question_code:
+            return DiseaseOutcome(disease_code=disease.code, status=STATUS_INVALID,
+                                  message='疾病未配置第一个问题')
+
+        path = []
+        terminals: List[AnswerEdge] = []
+        pending = None
+        visited = set()
+        stack = [disease.first_question_code]
+
+        while stack:
+            question_code = stack.pop()
+            if question_code in visited:
+                # 多选分支汇合到同一个问题时只评估一次，同时避免规则中的环导致死循环
+                continue
+            visited.add(question_code)
+
+            question = self.questions.get(question_code)
+            if question is None:
+                return DiseaseOutcome(disease_code=disease.code, status=STATUS_INVALID, path=tuple(path),
+                                      message=f'问题不存在: {question_code}')
+
+            selected = answers.get(question_code)
+            if not selected:
+                pending = pending or question_code
+                continue
+            if len(selected) > 1 and not question.is_multiple:
+                selected = selected[:1]
+
+            next_codes = []
+            for answer_content in selected:
+                edge = question.answer_for(answer_content)
+                if edge is None:
+                    return DiseaseOutcome(disease_code=disease.code, status=STATUS_INVALID, path=tuple(path),
+                                          message=f'问题 {question_code} 不存在答案: {answer_content}')
+                path.append((question_code, edge.answer_content))
+                if edge.is_terminal:
+                    terminals.append(edge)
+                else:
+                    next_codes.append(edge.next_question_code)
+            # 倒序入栈，保证按答案顺序展开
+            stack.extend(reversed(next_codes))
+
+        if pending:
+            return DiseaseOutcome(disease_code=disease.code, status=STATUS_PENDING, path=tuple(path),
+                                  pending_question_code=pending)
+        return conclude(disease.code, path, terminals)
+
+    def evaluate(self, answers, disease_codes: Optional[Iterable[str]] = None) -> EvaluationResult:
+        """评估一组答案
+
+        Args:
+            answers: 答案，格式见 ``normalize_answers``
+            disease_codes: 申请人选择的疾病编码；为空时评估第一个问题已作答的所有疾病
+        """
+        normalized = normalize_answers(answers)
+        if disease_codes is None:
+            disease_codes = [code for code, d in self.diseases.items()
+                             if d.first_question_code in normalized]
+        disease_codes = [_clean(code) for code in disease_codes]
+
+        from app.services.underwriting.evaluation_cache import evaluation_cache
+        from app.services.underwriting.outcome_table import resolve_outcomes
+
+        # 相同答案的疾病结果直接取缓存，未命中的疾病先查结果表，再在规则图上行走
+        return self.summarize(evaluation_cache.evaluate(
+            self, disease_codes, normalized,
+            lambda codes: resolve_outcomes(self, codes, normalized)
+        ))
+
+    def summarize(self, outcomes: Iterable[DiseaseOutcome]) -> EvaluationResult:
+        """由各疾病的结果得到整体结果：任一疾病无效则无效，任一疾病待答则待答，否则取最严重的结论"""
+        outcomes = tuple(outcomes)
+        if any(o.status == STATUS_INVALID for o in outcomes):
+            status = STATUS_INVALID
+        elif any(o.status == STATUS_PENDING for o in outcomes):
+            status = STATUS_PENDING
+        else:
+            status = STATUS_CONCLUDED
+
+        concluded = [o for o in outcomes if o.status == STATUS_CONCLUDED]
+        return EvaluationResult(
+            rule_id=self.rule_id,
+            version=self.version,
+            status=status,
+            outcomes=outcomes,
+            medical_conclusion=most_severe(o.medical_conclusion for o in concluded) if status == STATUS_CONCLUDED else None,
+            critical_illness_conclusion=most_severe(o.critical_illness_conclusion for o in concluded) if status == STATUS_CONCLUDED else None
+        )
+
+
+# 编译规则图所需的列，快照按同样的字段保存
+DISEASE_COLUMNS = ('code', 'name', 'category_code', 'category_name', 'first_question_code')
+QUESTION_COLUMNS = ('code', 'content', 'attribute', 'question_type', 'remark')
+ANSWER_COLUMNS = (
+    'id', 'question_code', 'answer_content', 'next_question_code', 'medical_conclusion',
+    'critical_illness_conclusion', 'medical_special_code', 'critical_illness_special_code',
+    'medical_special_desc', 'critical_illness_special_desc', 'display_order', 'remark'
+)
+
+
+def load_rule_rows(rule_id: int):
+    """读取编译规则图所需的数据
+
+    只做四次列投影查询(规则、疾病、问题、答案)，不构造ORM对象。
+
+    Returns:
+        (规则行, 疾病行, 问题行, 答案行)，规则不存在时返回None
+    """
+    rule = db.session.query(UnderwritingRule.id, UnderwritingRule.name, UnderwritingRule.version) \
+        .filter(UnderwritingRule.id == rule_id).first()
+    if not rule:
+        return None
+
+    disease_rows = db.session.query(*(getattr(Disease, c) for c in DISEASE_COLUMNS)) \
+        .filter(Disease.rule_id == rule_id).order_by(Disease.id).all()
+
+    question_rows = db.session.query(*(getattr(Question, c) for c in QUESTION_COLUMNS)) \
+        .filter(Question.rule_id == rule_id).order_by(Question.id).all()
+
+    answer_rows = db.session.query(*(getattr(Conclusion, c) for c in ANSWER_COLUMNS)) \
+        .filter(Conclusion.rule_id == rule_id) \
+        .order_by(Conclusion.question_code, Conclusion.display_order, Conclusion.id).all()
+
+    return rule, disease_rows, question_rows, answer_rows
+
+
+def compile_rule(rule_id: int) -> Optional[CompiledRule]:
+    """从数据库编译规则图"""
+    rows = load_rule_rows(rule_id)
+    if rows is None:
+        return None
+    rule, disease_rows, question_rows, answer_rows = rows
+    return build_compiled_rule(rule.id, rule.version, disease_rows, question_rows, answer_rows)
+
+
+def build_compiled_rule(rule_id: int, version: Optional[str], disease_rows, question_rows, answer_rows) -> CompiledRule:
+    """根据疾病/问题/答案行构建规则图
+
+    行可以是查询结果(Row)或字典，字段名与模型列名一致。
+    """
+    def get(row, name):
+        return row.get(name) if isinstance(row, Mapping) else getattr(row, name)
+
+    edges_by_question: Dict[str, List[AnswerEdge]] = {}
+    for row in answer_rows:
+        question_code = _clean(get(row, 'question_code'))
+        answer_content = _clean(get(row, 'answer_content'))
+        if not question_code or not answer_content:
+            continue
+        edges_by_question.setdefault(question_code, []).append(AnswerEdge(
+            id=get(row, 'id'),
+            question_code=question_code,
+            answer_content=answer_content,
+            next_question_code=_clean(get(row, 'next_question_code')),
+            medical_conclusion=_clean(get(row, 'medical_conclusion')),
+            critical_illness_conclusion=_clean(get(row, 'critical_illness_conclusion')),
+            medical_special_code=_clean(get(row, 'medical_special_code')),
+            critical_illness_special_code=_clean(get(row, 'critical_illness_special_code')),
+            medical_special_desc=get(row, 'medical_special_desc'),
+            critical_illness_special_desc=get(row, 'critical_illness_special_desc'),
+            display_order=get(row, 'display_order') or 0,
+            remark=get(row, 'remark')
+        ))
+
+    questions = []
+    for row in question_rows:
+        code = _clean(get(row, 'code'))
+        if not code:
+            continue
+        edges = sorted(edges_by_question.pop(code, []), key=lambda e: (e.display_order, e.id or 0))
+        questions.append(QuestionNode(
+            code=code,
+            content=get(row, 'content'),
+            attribute=get(row, 'attribute'),
+            question_type=_clean(get(row, 'question_type')),
+            remark=get(row, 'remark'),
+            answers=tuple(edges)
+        ))
+
+    # 答案引用了问题表中不存在的问题时，仍然保留为只有答案的节点，便于规则校验发现问题
+    for code, edges in edges_by_question.items():
+        questions.append(QuestionNode(
+            code=code,
+            answers=tuple(sorted(edges, key=lambda e: (e.display_order, e.id or 0))),
+            answers_only=True
+        ))
+
+    diseases = [
+        DiseaseEntry(
+            code=_clean(get(row, 'code')),
+            name=get(row, 'name'),
+            category_code=_clean(get(row, 'category_code')),
+            category_name=get(row, 'category_name'),
+            first_question_code=_clean(get(row, 'first_question_code'))
+        )
+        for row in disease_rows if _clean(get(row, 'code'))
+    ]
+
+    return CompiledRule(rule_id, version, diseases, questions)
+
+
+def rule_watermark(rule_id: int) -> Tuple[Any, ...]:
+    """规则数据的水位：规则的更新时间，疾病、问题、答案各表该规则的最近更新时间、行数和最大ID，一次查询取得
+
+    行数用于发现删除，最大ID用于发现删除后重新插入(如重新导入)的数据。
+    """
+    columns = [select(UnderwritingRule.updated_at).where(UnderwritingRule.id == rule_id).scalar_subquery()]
+    for model in (Disease, Question, Conclusion):
+        columns.append(select(func.max(model.updated_at)).where(model.rule_id == rule_id).scalar_subquery())
+        columns.append(select(func.count(model.id)).where(model.rule_id == rule_id).scalar_subquery())
+        columns.append(select(func.max(model.id)).where(model.rule_id == rule_id).scalar_subquery())
+    return tuple(db.session.execute(select(*columns)).one())
+
+
+def _check_interval() -> float:
+    if has_app_context():
+        return current_app.config.get('RULE_GRAPH_CHECK_INTERVAL', DEFAULT_CHECK_INTERVAL)
+    return DEFAULT_CHECK_INTERVAL
+
+
+class RuleGraphCache:
+    """进程内的规则图缓存
+
+    本进程内的修改通过 ``invalidate_rule_graph`` 立即失效；其他进程(其他worker、脚本)的修改
+    由水位核对发现：距上次核对超过 ``RULE_GRAPH_CHECK_INTERVAL`` 秒时比较规则数据的水位，
+    与编译时不同则重新编译。
+    """
+
+    def __init__(self):
+        self._graphs: Dict[int, CompiledRule] = {}
+        # {规则ID: (编译时的水位, 最近一次核对的时间)}
+        self._watermarks: Dict[int, Tuple[Tuple[Any, ...], float]] = {}
+        self._lock = threading.Lock()
+        self._compile_locks: Dict[int, threading.Lock] = {}
+
+    def _fresh(self, rule_id: int) -> bool:
+        """规则图是否仍与数据库一致，核对间隔内直接视为一致"""
+        entry = self._watermarks.get(rule_id)
+        if entry is None:
+            return False
+        mark, checked_at = entry
+        now = time.monotonic()
+        if now - checked_at < _check_interval():
+            return True
+        try:
+            current = rule_watermark(rule_id)
+        except Exception as e:
+            logger.warning(f'核对规则数据水位失败，继续使用缓存的规则图: rule_id={rule_id}, error={str(e)}')
+            return True
+        if current != mark:
+            logger.info(f'规则数据已变化，重新编译规则图: rule_id={rule_id}')
+            return False
+        self._watermarks[rule_id] = (mark, now)
+        return True
+
+    def get(self, rule_id: int) -> Optional[CompiledRule]:
+        """获取规则图，未命中或规则数据已变化时编译"""
+        graph = self._graphs.get(rule_id)
+        if graph is not None:
+            if self._fresh(rule_id):
+                return graph
+            self.invalidate(rule_id)
+
+        with self._lock:
+            compile_lock = self._compile_locks.setdefault(rule_id, threading.Lock())
+
+        # 同一规则只编译一次，其他线程等待编译结果
+        with compile_lock:
+            graph = self._graphs.get(rule_id)
+            if graph is None:
+                # 先取水位再读数据，编译期间发生的修改在下次核对时发现
+                mark = rule_watermark(rule_id)
+                graph = compile_rule(rule_id)
+                if graph is not None:
+                    with self._lock:
+                        self._graphs[rule_id] = graph
+                        self._watermarks[rule_id] = (mark, time.monotonic())
+                    logger.info(f'规则图编译完成: {graph!r}')
+        return graph
+
+    def put(self, graph: CompiledRule):
+        """放入规则图(不核对水位，直到失效)"""
+        self._graphs[graph.rule_id] = graph
+        self._watermarks[graph.rule_id] = ((), float('inf'))
+
+    def invalidate(self, rule_id: Optional[int] = None):
+        """使规则图失效，rule_id为空时清空全部"""
+        with self._lock:
+            if rule_id is None:
+                self._graphs.clear()
+                self._watermarks.clear()
+            else:
+                self._graphs.pop(rule_id, None)
+                self._watermarks.pop(rule_id, None)
+        logger.info(f'规则图缓存失效: rule_id={rule_id if rule_id is not None else "ALL"}')
+
+
+rule_graph_cache = RuleGraphCache()
+
+
+def get_compiled_rule(rule_id: int) -> Optional[CompiledRule]:
+    """获取编译后的规则图"""
+    return rule_graph_cache.get(rule_id)
+
+
+def invalidate_rule_graph(rule_id: Optional[int] = None):
+    """规则数据变化后调用，使规则图失效"""
+    rule_graph_cache.invalidate(rule_id)
+
+
+class SnapshotGraphCache:
+    """已发布版本的规则图缓存
+
+    快照发布后不再修改，按 (规则ID, 版本号) 缓存的规则图永远不需要失效，只按LRU淘汰。
+    """
+
+    def __init__(self, max_size: int = 32):
+        self.max_size = max_size
+        self._graphs: 'OrderedDict[Tuple[int, str], CompiledRule]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, rule_id: int, version: str) -> Optional[CompiledRule]:
+        key = (rule_id, version)
+        with self._lock:
+            graph = self._graphs.get(key)
+            if graph is not None:
+                self._graphs.move_to_end(key)
+                return graph
+
+        # 优先映射发布时写入的二进制制品，多个worker共享同一份内存页
+        from app.services.underwriting.rule_artifact import load_version_artifact
+        try:
+            graph = load_version_artifact(rule_id, version)
+        except Exception as e:
+            logger.error(f'加载规则制品失败，改为读取快照: rule_id={rule_id}, version={version}, error={str(e)}')
+            graph = None
+
+        if graph is None:
+            row = db.session.query(RuleVersion.snapshot) \
+                .filter(RuleVersion.rule_id == rule_id, RuleVersion.version == version).first()
+            if row is None or not row.snapshot:
+                return None
+            graph = CompiledRule.from_snapshot(row.snapshot)
+        self.put(graph, version)
+        logger.info(f'规则快照加载完成: {graph!r}')
+        return graph
+
+    def put(self, graph: CompiledRule, version: str):
+        with self._lock:
+            self._graphs[(graph.rule_id, version)] = graph
+            self._graphs.move_to_end((graph.rule_id, version))
+            while len(self._graphs) > self.max_size:
+                self._graphs.popitem(last=False)
+
+
+snapshot_graph_cache = SnapshotGraphCache()
+
+
+def latest_version(rule_id: int) -> Optional[str]:
+    """规则最新发布的版本号"""
+    return db.session.query(RuleVersion.version) \
+        .filter(RuleVersion.rule_id == rule_id, RuleVersion.snapshot.isnot(None)) \
+        .order_by(RuleVersion.published_at.desc(), RuleVersion.id.desc()) \
+        .limit(1).scalar()
+
+
+def get_published_rule(rule_id: int, version: Optional[str] = None) -> Optional[CompiledRule]:
+    """按版本加载已发布的规则图
+
+    Args:
+        rule_id: 规则ID
+        version: 版本号，为空或为 'latest' 时使用最新发布的版本
+    """
+    if not version or version == 'latest':
+        version = latest_version(rule_id)
+        if version is None:
+            return None
+    return snapshot_graph_cache.get(rule_id, version)
+
+
+def get_rule_graph(rule_id: int, version: Optional[str] = None) -> Optional[CompiledRule]:
+    """获取规则图：指定版本时加载发布的快照，否则使用当前规则数据编译的规则图"""
+    if version:
+        return get_published_rule(rule_id, version)
+    return get_compiled_rule(rule_id)
+
+
+def evaluate(rule_id: int, answers, disease_codes: Optional[Iterable[str]] = None,
+             version: Optional[str] = None) -> EvaluationResult:
+    """在内存中的规则图上评估答案
+
+    Args:
+        rule_id: 规则ID
+        answers: 答案，格式见 ``normalize_answers``
+        disease_codes: 申请人选择的疾病编码
+        version: 发布的版本号，为空时使用当前规则数据
+
+    Raises:
+        ValueError: 规则或版本不存在
+    """
+    graph = get_rule_graph(rule_id, version)
+    if graph is None:
+        raise ValueError(f'规则不存在: {rule_id}' + (f', 版本: {version}' if version else ''))
+    return graph.evaluate(answers, disease_codes)
+
+
+# 申请人数达到该值且安装了NumPy时，批量评估使用向量化内核
+VECTOR_MIN_BATCH = 256
+
+
+def applicant_error(applicant) -> Optional[str]:
+    """检查批量评估中单个申请人的格式，格式有误时返回原因"""
+    if not isinstance(applicant, Mapping):
+        return '申请人必须是对象'
+    diseases = applicant.get('diseases')
+    if diseases is not None and not isinstance(diseases, (list, tuple)):
+        return 'diseases必须是疾病编码列表'
+    answers = applicant.get('answers')
+    if answers is None or isinstance(answers, Mapping):
+        return None
+    if not isinstance(answers, (list, tuple)) or not all(isinstance(item, Mapping) for item in answers):
+        return 'answers必须是 {问题编码: 答案} 或答案对象列表'
+    return None
+
+
+def without_paths(outcome: DiseaseOutcome) -> DiseaseOutcome:
+    """去掉疾病结果中的答案路径"""
+    return replace(outcome, path=()) if outcome.path else outcome
+
+
+def evaluate_batch(rule_id: int, applicants: Iterable[Mapping[str, Any]],
+                   version: Optional[str] = None, vector_min_batch: Optional[int] = None,
+                   with_paths: bool = True) -> Tuple[CompiledRule, List[Tuple[Any, EvaluationResult]]]:
+    """批量评估多个申请人的答案
+
+    规则图只获取一次，所有申请人在同一张内存图上评估。申请人较多时使用向量化内核，
+    见 ``vector_kernel``，结果与逐个评估一致。
+
+    Args:
+        rule_id: 规则ID
+        applicants: [{'id': 申请人标识, 'diseases': [...], 'answers': {...}}, ...]
+        version: 发布的版本号，为空时使用当前规则数据
+        vector_min_batch: 使用向量化内核的最少申请人数，默认 ``VECTOR_MIN_BATCH``，0表示不使用
+        with_paths: 为False时结果不包含答案路径(只需要结论时使用)
+
+    Returns:
+        (规则图, [(申请人标识, 评估结果), ...])
+
+    Raises:
+        ValueError: 规则或版本不存在
+
+    申请人的格式由调用方事先用 ``applicant_error`` 检查。
+    """
+    graph = get_rule_graph(rule_id, version)
+    if graph is None:
+        raise ValueError(f'规则不存在: {rule_id}' + (f', 版本: {version}' if version else ''))
+
+    applicants = list(applicants)
+    if vector_min_batch is None:
+        vector_min_batch = VECTOR_MIN_BATCH
+    if vector_min_batch and len(applicants) >= vector_min_batch:
+        from app.services.underwriting import vector_kernel
+        if vector_kernel.available():
+            return graph, vector_kernel.evaluate_batch(graph, applicants, with_paths=with_paths)
+
+    results = []
+    for index, applicant in enumerate(applicants):
+        applicant_id = applicant.get('id', index)
+        result = graph.evaluate(applicant.get('answers'), applicant.get('diseases'))
+        if not with_paths:
+            result = replace(result, outcomes=tuple(without_paths(o) for o in result.outcomes))
+        results.append((applicant_id, result))
+    return graph, results
@@ -0,0 +1,137 @@
+"""规则发布
+
+发布时把核保规则及其疾病、问题、答案冻结为一份不可变的快照，按版本号保存在 ``rule_versions``。
+评估和移动端按版本加载快照，发布后的规则数据再被修改也不会影响已发布的版本，
+因此快照构建的规则图可以在各进程中长期缓存。
+
+快照格式::
+
+    {
+        "format": 1,
+        "version": "20261018140352",
+        "rule": {"id": 1, "name": "...", "version": "..."},
+        "diseases": [{"code": ..., "name": ..., ...}],
+        "questions": [{"code": ..., "content": ..., ...}],
+        "answers": [{"id": ..., "question_code": ..., ...}]
+    }
+"""
+import json
+import hashlib
+import logging
+from datetime import datetime
+from sqlalchemy.orm import defer
+
+from app.extensions import db
+from app.models.base.enums import StatusEnum
+from app.models.rules.core.rule_version import RuleVersion
+from app.services.underwriting.rule_graph import (
+    ANSWER_COLUMNS,
+    DISEASE_COLUMNS,
+    QUESTION_COLUMNS,
+    CompiledRule,
+    load_rule_rows,
+    snapshot_graph_cache
+)
+from app.services.underwriting.rule_validator import validate_graph
+from app.services.underwriting.rule_artifact import write_version_artifact
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 1
+
+
+def _rows(rows, columns):
+    return [{column: getattr(row, column) for column in columns} for row in rows]
+
+
+def snapshot_checksum(snapshot):
+    """快照内容的SHA-256，按键排序序列化后计算"""
+    payload = json.dumps(snapshot, ensure_ascii=False, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class RulePublishService:
+    """规则发布服务"""
+
+    @staticmethod
+    def generate_version():
+        """生成版本号"""
+        return datetime.now().strftime('%Y%m%d%H%M%S')
+
+    @staticmethod
+    def build_snapshot(rule_id, version):
+        """读取规则当前数据并生成快照，规则不存在时返回None"""
+        rows = load_rule_rows(rule_id)
+        if rows is None:
+            return None
+        rule, disease_rows, question_rows, answer_rows = rows
+        return {
+            'format': SNAPSHOT_FORMAT,
+            'version': version,
+            'rule': {'id': rule.id, 'name': rule.name, 'version': rule.version},
+            'diseases': _rows(disease_rows, DISEASE_COLUMNS),
+            'questions': _rows(question_rows, QUESTION_COLUMNS),
+            'answers': _rows(answer_rows, ANSWER_COLUMNS)
+        }
+
+    @staticmethod
+    def publish(rule_id, version=None, published_by=None, force=False):
+        """发布规则
+
+        Args:
+            rule_id: 规则ID
+            version: 版本号，为空时按时间生成
+            published_by: 发布人
+            force: 规则图校验存在错误时是否仍然发布
+
+        Returns:
+            (RuleVersion, 校验报告)
+
+        Raises:
+            ValueError: 规则不存在、版本已存在或规则图校验不通过
+        """
+        version = str(version).strip() if version else RulePublishService.generate_version()
+        if RuleVersion.query.filter_by(rule_id=rule_id, version=version).first():
+            raise ValueError(f'版本已存在: {version}')
+
+        snapshot = RulePublishService.build_snapshot(rule_id, version)
+        if snapshot is None:
+            raise ValueError(f'规则不存在: {rule_id}')
+
+        graph = CompiledRule.from_snapshot(snapshot)
+        report = validate_graph(graph)
+        if not report.valid and not force:
+            raise ValueError(f'规则校验未通过，不能发布: {report.counts}')
+
+        record = RuleVersion(
+            rule_id=rule_id,
+            name=snapshot['rule']['name'],
+            code=f"R{rule_id}-{version}",
+            version=version,
+            description=f"疾病{len(graph.diseases)}个，问题{len(graph.questions)}个，答案{graph.edge_count}个",
+            status=StatusEnum.ENABLED.value,
+            snapshot=snapshot,
+            checksum=snapshot_checksum(snapshot),
+            published_at=datetime.utcnow(),
+            published_by=published_by
+        )
+        db.session.add(record)
+        db.session.commit()
+
+        # 快照不可变，发布后直接放入缓存，并写入供各worker映射的二进制制品
+        snapshot_graph_cache.put(graph, version)
+        try:
+            write_version_artifact(graph, version)
+        except Exception as e:
+            # 制品缺失时从快照加载，不影响发布
+            logger.error(f"写入规则制品失败: rule_id={rule_id}, version={version}, error={str(e)}")
+        logger.info(f"规则发布成功: rule_id={rule_id}, version={version}, checksum={record.checksum}")
+        return record, report
+
+    @staticmethod
+    def list_versions(rule_id):
+        """规则已发布的版本，最新的在前(不包含快照内容)"""
+        return RuleVersion.query.options(defer(RuleVersion.snapshot)).filter(
+            RuleVersion.rule_id == rule_id,
+            RuleVersion.snapshot.isnot(None)
+        ).order_by(RuleVersion.published_at.desc(), RuleVersion.id.desc()).all()
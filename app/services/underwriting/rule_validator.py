@@ -0,0 +1,256 @@
+"""核保规则图校验
+
+在编译后的规则图(``CompiledRule``)上一次性检查整条规则的问卷结构：
+
+- 疾病的第一个问题不存在
+- 答案的下一个问题不存在(悬空引用)
+- 答案所属的问题在问题表中不存在(孤立答案)，以及疾病入口或下一个问题指向这样的问题
+- 从任何疾病入口都走不到的问题
+- 没有答案的问题(问卷会停在这里)
+- 问题之间的循环引用
+- 没有下一个问题、也没有任何结论的终止答案
+
+问题编码先映射为连续的整数下标，邻接关系存成整数列表，可达性(BFS)和环检测(迭代Tarjan)
+都只在整数数组上进行，数万条边的规则也能在一次遍历中完成，不访问数据库。
+"""
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from app.services.underwriting.rule_graph import CompiledRule, compile_rule
+
+logger = logging.getLogger(__name__)
+
+# 问题类型
+ISSUE_MISSING_FIRST_QUESTION = 'missing_first_question'
+ISSUE_DANGLING_NEXT_QUESTION = 'dangling_next_question'
+ISSUE_ORPHAN_ANSWER = 'orphan_answer'
+ISSUE_MISSING_QUESTION = 'missing_question'
+ISSUE_UNREACHABLE_QUESTION = 'unreachable_question'
+ISSUE_QUESTION_WITHOUT_ANSWERS = 'question_without_answers'
+ISSUE_CYCLE = 'cycle'
+ISSUE_TERMINAL_WITHOUT_CONCLUSION = 'terminal_without_conclusion'
+
+# 错误会导致问卷无法走完；警告不影响评估，但通常是配置遗漏
+ERROR_ISSUES = (
+    ISSUE_MISSING_FIRST_QUESTION,
+    ISSUE_DANGLING_NEXT_QUESTION,
+    ISSUE_ORPHAN_ANSWER,
+    ISSUE_MISSING_QUESTION,
+    ISSUE_QUESTION_WITHOUT_ANSWERS,
+    ISSUE_CYCLE,
+    ISSUE_TERMINAL_WITHOUT_CONCLUSION,
+)
+
+# 每类问题在报告中保留的明细条数
+MAX_ISSUES_PER_TYPE = 200
+
+
+@dataclass
+class ValidationReport:
+    """规则图校验结果"""
+    rule_id: int
+    version: Optional[str] = None
+    disease_count: int = 0
+    question_count: int = 0
+    edge_count: int = 0
+    counts: Dict[str, int] = field(default_factory=dict)
+    issues: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+
+    def add(self, issue_type: str, **details):
+        self.counts[issue_type] = self.counts.get(issue_type, 0) + 1
+        items = self.issues.setdefault(issue_type, [])
+        if len(items) < MAX_ISSUES_PER_TYPE:
+            items.append(details)
+
+    @property
+    def error_count(self) -> int:
+        return sum(count for issue_type, count in self.counts.items() if issue_type in ERROR_ISSUES)
+
+    @property
+    def warning_count(self) -> int:
+        return sum(self.counts.values()) - self.error_count
+
+    @property
+    def valid(self) -> bool:
+        return self.error_count == 0
+
+    def summary(self) -> Dict[str, Any]:
+        """不含明细的摘要，用于导入记录"""
+        return {
+            'valid': self.valid,
+            'error_count': self.error_count,
+            'warning_count': self.warning_count,
+            'counts': dict(self.counts)
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'rule_id': self.rule_id,
+            'version': self.version,
+            'valid': self.valid,
+            'disease_count': self.disease_count,
+            'question_count': self.question_count,
+            'edge_count': self.edge_count,
+            'error_count': self.error_count,
+            'warning_count': self.warning_count,
+            'counts': dict(self.counts),
+            'issues': self.issues
+        }
+
+
+def _strongly_connected(successors: List[List[int]]) -> List[List[int]]:
+    """迭代版Tarjan算法，返回包含环的强连通分量(节点数大于1或有自环)"""
+    count = len(successors)
+    index_of = [-1] * count
+    lowlink = [0] * count
+    on_stack = [False] * count
+    stack: List[int] = []
+    components = []
+    next_index = 0
+
+    for root in range(count):
+        if index_of[root] != -1:
+            continue
+        # 调用栈元素: (节点, 下一个待访问的后继位置)
+        work = [(root, 0)]
+        index_of[root] = lowlink[root] = next_index
+        next_index += 1
+        stack.append(root)
+        on_stack[root] = True
+
+        while work:
+            node, position = work[-1]
+            targets = successors[node]
+            if position < len(targets):
+                work[-1] = (node, position + 1)
+                target = targets[position]
+                if index_of[target] == -1:
+                    index_of[target] = lowlink[target] = next_index
+                    next_index += 1
+                    stack.append(target)
+                    on_stack[target] = True
+                    work.append((target, 0))
+                elif on_stack[target] and index_of[target] < lowlink[node]:
+                    lowlink[node] = index_of[target]
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                if lowlink[node] < lowlink[parent]:
+                    lowlink[parent] = lowlink[node]
+            if lowlink[node] == index_of[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component.append(member)
+                    if member == node:
+                        break
+                if len(component) > 1 or node in successors[node]:
+                    components.append(component)
+    return components
+
+
+def validate_graph(graph: CompiledRule) -> ValidationReport:
+    """校验规则图"""
+    report = ValidationReport(
+        rule_id=graph.rule_id,
+        version=graph.version,
+        disease_count=len(graph.diseases),
+        question_count=len(graph.questions),
+        edge_count=graph.edge_count
+    )
+
+    codes = list(graph.questions)
+    position = {code: i for i, code in enumerate(codes)}
+    successors: List[List[int]] = [[] for _ in codes]
+
+    # 只有答案、问题表中没有的问题(编译时保留的节点)
+    answers_only = [graph.questions[code].answers_only for code in codes]
+
+    # 答案边
+    for i, code in enumerate(codes):
+        question = graph.questions[code]
+        if answers_only[i]:
+            for edge in question.answers:
+                report.add(ISSUE_ORPHAN_ANSWER, question_code=code, answer_content=edge.answer_content)
+        elif not question.answers:
+            report.add(ISSUE_QUESTION_WITHOUT_ANSWERS, question_code=code)
+        targets = set()
+        for edge in question.answers:
+            if edge.next_question_code:
+                target = position.get(edge.next_question_code)
+                if target is None:
+                    report.add(
+                        ISSUE_DANGLING_NEXT_QUESTION, question_code=code,
+                        answer_content=edge.answer_content, next_question_code=edge.next_question_code
+                    )
+                else:
+                    if answers_only[target]:
+                        report.add(
+                            ISSUE_MISSING_QUESTION, question_code=code,
+                            answer_content=edge.answer_content, next_question_code=edge.next_question_code
+                        )
+                    targets.add(target)
+            elif not (edge.medical_conclusion or edge.critical_illness_conclusion):
+                report.add(
+                    ISSUE_TERMINAL_WITHOUT_CONCLUSION, question_code=code,
+                    answer_content=edge.answer_content
+                )
+        successors[i] = sorted(targets)
+
+    # 疾病入口
+    reached = [False] * len(codes)
+    queue = deque()
+    for disease in graph.diseases.values():
+        start = position.get(disease.first_question_code)
+        if start is None:
+            report.add(
+                ISSUE_MISSING_FIRST_QUESTION, disease_code=disease.code,
+                first_question_code=disease.first_question_code
+            )
+        else:
+            if answers_only[start]:
+                report.add(
+                    ISSUE_MISSING_QUESTION, disease_code=disease.code,
+                    first_question_code=disease.first_question_code
+                )
+            if not reached[start]:
+                reached[start] = True
+                queue.append(start)
+
+    # 可达性
+    while queue:
+        node = queue.popleft()
+        for target in successors[node]:
+            if not reached[target]:
+                reached[target] = True
+                queue.append(target)
+    for i, code in enumerate(codes):
+        # 孤立答案已单独报告
+        if not reached[i] and not answers_only[i]:
+            report.add(ISSUE_UNREACHABLE_QUESTION, question_code=code)
+
+    # 循环引用
+    for component in _strongly_connected(successors):
+        report.add(ISSUE_CYCLE, question_codes=sorted(codes[i] for i in component))
+
+    logger.info(
+        f"[规则校验] rule_id={graph.rule_id}, questions={report.question_count}, "
+        f"edges={report.edge_count}, errors={report.error_count}, warnings={report.warning_count}"
+    )
+    return report
+
+
+def validate_rule(rule_id: int) -> Optional[ValidationReport]:
+    """从数据库编译并校验规则，规则不存在时返回None
+
+    直接编译而不使用规则图缓存，保证校验的是当前事务中的数据。
+    """
+    graph = compile_rule(rule_id)
+    if graph is None:
+        return None
+    return validate_graph(graph)
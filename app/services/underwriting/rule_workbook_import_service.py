@@ -0,0 +1,158 @@
+"""规则工作簿导入服务
+
+导入 ``/api/v1/underwriting/rules/<rule_id>/import`` 上传的工作簿：
+第一个sheet为疾病，第二个为问题，第三个为答案(结论)，第二行为说明行。
+"""
+import logging
+from datetime import datetime
+from app.models.rules import Disease, DiseaseCategory, Question, Conclusion as Answer
+from app.services.import_service.pipeline import Field, ImportPipeline, SheetHandler, to_bool, to_int
+
+logger = logging.getLogger(__name__)
+
+SHEET_DISEASES = '疾病'
+SHEET_QUESTIONS = '问题'
+SHEET_ANSWERS = '答案'
+SHEETS = (SHEET_DISEASES, SHEET_QUESTIONS, SHEET_ANSWERS)
+
+
+class WorkbookSheet(SheetHandler):
+    """按序号读取的sheet，第一行为列名，第二行为说明，必需列为空的行按空行跳过"""
+    skip_rows = 1
+    row_number_offset = 2
+    key_columns = ()
+
+    def skip(self, index, row):
+        if any(row.get(column) is None for column in self.key_columns):
+            logger.debug(f"[跳过] 跳过空行 [{index + 1}]")
+            return True
+        return False
+
+
+class DiseaseSheet(WorkbookSheet):
+    sheet = 0
+    label = SHEET_DISEASES
+    data_type = 'disease'
+    model = Disease
+    key_columns = ('疾病编码', '疾病')
+    fields = (
+        Field('category_code', '疾病大类编码'),
+        Field('category_name', '疾病大类'),
+        Field('code', '疾病编码', required=True),
+        Field('name', '疾病', required=True),
+        Field('first_question_code', '疾病第一个问题编码'),
+        Field('is_common', '是否为常见疾病', convert=to_bool, default=False),
+        Field('description', '备注'),
+    )
+    extra_columns = ('疾病大类编码', '疾病大类', '疾病第一个问题编码')
+
+    def __init__(self):
+        super().__init__()
+        self.categories = {}  # 疾病大类编码 -> 名称
+
+    def skip(self, index, row):
+        # 记录疾病大类，取每个大类的第一条疾病记录(空行中的大类同样记录)
+        if row.get('疾病大类编码') is not None:
+            self.categories.setdefault(str(row['疾病大类编码']), str(row['疾病大类']))
+        return super().skip(index, row)
+
+    def finalize(self, context):
+        """根据疾病数据生成疾病大类，大类编码全局唯一，已存在的跳过"""
+        rows = [
+            {'rule_id': context.rule_id, 'code': code, 'name': name}
+            for code, name in self.categories.items()
+            if not context.lookups.contains('category', code)
+        ]
+        if rows:
+            context.writer.insert(DiseaseCategory.__table__, rows)
+        context.extra['categories'] = len(rows)
+
+
+class QuestionSheet(WorkbookSheet):
+    sheet = 1
+    label = SHEET_QUESTIONS
+    data_type = 'question'
+    model = Question
+    key_columns = ('问题编码', '问题内容')
+    fields = (
+        Field('code', '问题编码', required=True),
+        Field('content', '问题内容', required=True),
+        Field('attribute', '问题属性'),
+        Field('question_type', '问题类型'),
+    )
+    extra_columns = ('问题属性', '问题类型')
+
+
+class AnswerSheet(WorkbookSheet):
+    sheet = 2
+    label = SHEET_ANSWERS
+    data_type = 'answer'
+    model = Answer
+    key_field = None
+    key_columns = ('问题编码', '答案内容')
+    fields = (
+        Field('question_code', '问题编码', required=True),
+        Field('answer_content', '答案内容', required=True),
+        Field('critical_illness_conclusion', '重疾结论'),
+        Field('medical_conclusion', '医疗险结论'),
+        Field('medical_special_code', '医疗特殊编码'),
+        Field('critical_illness_special_code', '重疾特殊编码'),
+        Field('medical_special_desc', '医疗特殊描述'),
+        Field('critical_illness_special_desc', '重疾特殊描述'),
+        Field('next_question_code', '对应下一个问题编码'),
+        Field('display_order', '答案展示顺序', convert=to_int, default=0),
+        Field('remark', '备注（答案解释）'),
+    )
+    extra_columns = ('重疾结论', '医疗险结论')
+
+
+class RuleWorkbookImportService:
+    """规则工作簿导入服务"""
+
+    def __init__(self, rule_id, batch_no, progress=None):
+        """
+        Args:
+            rule_id: 规则ID(数字)
+            batch_no: 导入批次号
+            progress: 导入进度跟踪(ImportProgress)，后台任务使用
+        """
+        self.rule_id = rule_id
+        self.batch_no = batch_no
+        self.progress = progress
+
+    @staticmethod
+    def generate_batch_no(rule_id):
+        """首次导入使用初始批次号，已有数据时使用时间戳批次号"""
+        if Question.query.filter_by(rule_id=rule_id).first():
+            return datetime.now().strftime('%Y%m%d%H%M%S')
+        return '000001'
+
+    def build_pipeline(self):
+        pipeline = ImportPipeline(
+            [DiseaseSheet(), QuestionSheet(), AnswerSheet()],
+            rule_id=self.rule_id,
+            batch_no=self.batch_no,
+            progress=self.progress
+        )
+        pipeline.lookups.define('category', DiseaseCategory, preload=True)
+        return pipeline
+
+    def process(self, file_path):
+        """导入工作簿，调用方负责提交或回滚事务
+
+        Returns:
+            dict: 各类数据的导入数量
+        """
+        pipeline = self.build_pipeline()
+        report = pipeline.execute(file_path)
+        if report.error_count:
+            errors = [error for sheet in report.sheets.values() for error in sheet.errors]
+            raise ValueError(f"工作簿数据校验失败: {errors[:10]}")
+        result = {
+            'diseases': report.sheets[SHEET_DISEASES].success,
+            'questions': report.sheets[SHEET_QUESTIONS].success,
+            'answers': report.sheets[SHEET_ANSWERS].success,
+            'categories': pipeline.context.extra.get('categories', 0),
+        }
+        logger.info(f"[导入] 数据写入完成: {result}, batch_no={self.batch_no}")
+        return result
@@ -0,0 +1,365 @@
+"""批量核保评估的向量化内核
+
+组合重新核保时一次评估成千上万个申请人，逐个申请人、逐个问题地在对象图上行走太慢。
+内核把规则图编码为整数转移表，所有 (申请人, 疾病) 的行走一起推进，每一步是一组NumPy数组运算:
+
+- ``next_table[问题, 答案]``: 下一个问题的序号，终止答案为 ``TERMINAL``
+- ``edge_table[问题, 答案]``: 答案边的序号，用于取得终止答案的结论
+- 申请人的答案编码为有序的键数组 ``申请人序号 * 问题数 + 问题序号`` 和对应的答案序号，
+  每一步用 ``searchsorted`` 查出所有行走的当前答案
+
+内核只处理单条路径的行走。多选题选中多个答案(需要展开分支)、答案不存在、下一个问题不存在或路径成环的行走
+交给 ``CompiledRule.walk``，因此结果与逐个疾病行走完全一致。
+
+NumPy为可选依赖，未安装时 ``available()`` 返回False，批量评估使用逐个申请人的评估。
+"""
+import threading
+import weakref
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from app.services.underwriting.rule_graph import (
+    STATUS_CONCLUDED,
+    STATUS_PENDING,
+    AnswerEdge,
+    CompiledRule,
+    DiseaseOutcome,
+    EvaluationResult,
+    conclude,
+    normalize_answers,
+    without_paths
+)
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy为可选依赖
+    np = None
+
+# next_table中的特殊值
+TERMINAL = -1   # 终止答案
+DANGLING = -2   # 下一个问题不存在
+
+# 编码后的答案中的特殊值
+UNANSWERED = -1  # 未回答
+UNKNOWN = -2     # 答案不存在
+BRANCH = -3      # 多选题选中多个答案
+
+# 行走状态
+_RUNNING = 0
+_CONCLUDED = 1
+_PENDING = 2
+_FALLBACK = 3
+
+
+def available() -> bool:
+    """是否可以使用向量化内核"""
+    return np is not None
+
+
+@dataclass(frozen=True)
+class RuleTables:
+    """规则图的整数编码"""
+    codes: Tuple[str, ...]
+    index: Mapping[str, int]
+    next_table: Any
+    edge_table: Any
+    multiple: Tuple[bool, ...]
+    # 问题序号 -> {答案内容: 答案序号}
+    answer_index: Tuple[Mapping[str, int], ...]
+    # 问题编码 -> {答案内容: (问题序号, 答案序号)}，用于直接编码规范格式的答案
+    answer_lookup: Mapping[str, Mapping[str, Tuple[int, int]]]
+    edges: Tuple[AnswerEdge, ...]
+    # 答案边序号 -> 只经过该终止答案时的结论(非终止答案为None)
+    conclusions: Tuple[Optional[DiseaseOutcome], ...]
+    # 疾病编码 -> 第一个问题的序号(-1表示无法行走)
+    entries: Mapping[str, int]
+    # 按规则图顺序的 (疾病编码, 第一个问题编码)，用于未指定疾病时的默认选择
+    disease_order: Tuple[Tuple[str, Optional[str]], ...]
+
+    @property
+    def question_count(self) -> int:
+        return len(self.codes)
+
+
+def build_tables(graph: CompiledRule) -> RuleTables:
+    """把规则图编码为转移表"""
+    questions = [graph.questions[code] for code in graph.questions]
+    codes = tuple(question.code for question in questions)
+    index = {code: i for i, code in enumerate(codes)}
+    width = max((len(question.answers) for question in questions), default=0) or 1
+
+    next_table = np.full((len(codes), width), DANGLING, dtype=np.int32)
+    edge_table = np.full((len(codes), width), -1, dtype=np.int32)
+    edges: List[AnswerEdge] = []
+    answer_index = []
+    for i, question in enumerate(questions):
+        positions = {}
+        for a, edge in enumerate(question.answers):
+            # 与QuestionNode.answer_for一致，同名答案以后出现的为准
+            positions[edge.answer_content] = a
+            edge_table[i, a] = len(edges)
+            edges.append(edge)
+            if edge.is_terminal:
+                next_table[i, a] = TERMINAL
+            else:
+                next_table[i, a] = index.get(edge.next_question_code, DANGLING)
+        answer_index.append(positions)
+
+    entries = {}
+    disease_order = []
+    for code in graph.diseases:
+        disease = graph.diseases[code]
+        disease_order.append((disease.code, disease.first_question_code))
+        entries[disease.code] = index.get(disease.first_question_code, -1)
+
+    return RuleTables(
+        codes=codes,
+        index=index,
+        next_table=next_table,
+        edge_table=edge_table,
+        multiple=tuple(question.is_multiple for question in questions),
+        answer_index=tuple(answer_index),
+        answer_lookup={
+            code: {content: (i, a) for content, a in answer_index[i].items()}
+            for i, code in enumerate(codes)
+        },
+        edges=tuple(edges),
+        conclusions=tuple(conclude(None, (), (edge,)) if edge.is_terminal else None for edge in edges),
+        entries=entries,
+        disease_order=tuple(disease_order)
+    )
+
+
+class TableCache:
+    """按规则图缓存转移表，规则图失效后随之释放"""
+
+    def __init__(self):
+        self._tables: 'weakref.WeakKeyDictionary[CompiledRule, RuleTables]' = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def get(self, graph: CompiledRule) -> RuleTables:
+        with self._lock:
+            tables = self._tables.get(graph)
+        if tables is None:
+            tables = build_tables(graph)
+            with self._lock:
+                tables = self._tables.setdefault(graph, tables)
+        return tables
+
+
+table_cache = TableCache()
+
+
+def _encode_plain(tables: RuleTables, answers) -> Optional[List[Tuple[int, int]]]:
+    """答案为 {问题编码: 答案内容} 且编码和内容都与规则一致时直接编码为 [(问题序号, 答案序号), ...]，
+    省去 ``normalize_answers``；其他情况返回None"""
+    if not answers:
+        return []
+    if not isinstance(answers, Mapping):
+        return None
+    encoded = []
+    lookup = tables.answer_lookup
+    for question_code, answer in answers.items():
+        positions = lookup.get(question_code)
+        if positions is None:
+            # 与规则中的问题无关的答案不影响行走，去掉空白后才能对应到问题的按规范化处理
+            if not isinstance(question_code, str) or question_code.strip() != question_code:
+                return None
+            continue
+        pair = positions.get(answer) if isinstance(answer, str) else None
+        if pair is None:
+            return None
+        encoded.append(pair)
+    return encoded
+
+
+def _encode_normalized(tables: RuleTables, answers: Mapping[str, Tuple[str, ...]]) -> List[Tuple[int, int]]:
+    """编码规范化后的答案"""
+    encoded = []
+    for question_code, selected in answers.items():
+        i = tables.index.get(question_code)
+        if i is None:
+            continue
+        if len(selected) > 1 and tables.multiple[i]:
+            encoded.append((i, BRANCH))
+        else:
+            encoded.append((i, tables.answer_index[i].get(selected[0], UNKNOWN)))
+    return encoded
+
+
+def run_kernel(tables: RuleTables, keys, values, rows, starts):
+    """同时推进所有行走
+
+    Args:
+        tables: 规则图的转移表
+        keys, values: 有序的答案键(申请人序号 * 问题数 + 问题序号)和对应的答案序号
+        rows: 每条行走所属的申请人序号
+        starts: 每条行走的第一个问题序号
+
+    Returns:
+        (状态, 终止答案边序号, 待答问题序号, 路径)，路径为按行走分组的 (行走序号, 问题序号, 答案序号) 数组
+    """
+    lanes = len(starts)
+    status = np.full(lanes, _RUNNING, dtype=np.int8)
+    terminal = np.full(lanes, -1, dtype=np.int32)
+    pending = np.full(lanes, -1, dtype=np.int32)
+    current = np.asarray(starts, dtype=np.int64)
+    base = np.asarray(rows, dtype=np.int64) * tables.question_count
+    trail_lanes, trail_questions, trail_answers = [], [], []
+
+    active = np.arange(lanes)
+    # 单条路径不重复经过同一个问题时最多经过全部问题，超过时路径成环
+    for _ in range(tables.question_count):
+        if active.size == 0:
+            break
+        question = current[active]
+        wanted = base[active] + question
+        if keys.size:
+            position = np.minimum(np.searchsorted(keys, wanted), keys.size - 1)
+            answer = np.where(keys[position] == wanted, values[position], UNANSWERED)
+        else:
+            answer = np.full(active.size, UNANSWERED, dtype=np.int32)
+
+        waiting = answer == UNANSWERED
+        status[active[waiting]] = _PENDING
+        pending[active[waiting]] = question[waiting]
+        status[active[answer < UNANSWERED]] = _FALLBACK
+
+        answered = answer >= 0
+        active, question, answer = active[answered], question[answered], answer[answered]
+        trail_lanes.append(active)
+        trail_questions.append(question)
+        trail_answers.append(answer)
+
+        following = tables.next_table[question, answer]
+        done = following == TERMINAL
+        status[active[done]] = _CONCLUDED
+        terminal[active[done]] = tables.edge_table[question[done], answer[done]]
+        status[active[following == DANGLING]] = _FALLBACK
+
+        moving = following >= 0
+        active = active[moving]
+        current[active] = following[moving]
+
+    status[active] = _FALLBACK
+
+    if trail_lanes:
+        trail = (np.concatenate(trail_lanes), np.concatenate(trail_questions), np.concatenate(trail_answers))
+        order = np.argsort(trail[0], kind='stable')
+        trail = tuple(column[order] for column in trail)
+    else:
+        empty = np.zeros(0, dtype=np.int64)
+        trail = (empty, empty, empty)
+    return status, terminal, pending, trail
+
+
+def evaluate_many(graph: CompiledRule, answer_sets: Sequence[Any],
+                  disease_sets: Sequence[Optional[Sequence[str]]],
+                  with_paths: bool = True) -> List[EvaluationResult]:
+    """向量化评估多组答案，结果与 ``CompiledRule.evaluate`` 一致
+
+    Args:
+        graph: 规则图
+        answer_sets: 每个申请人的答案，格式见 ``normalize_answers``
+        disease_sets: 每个申请人选择的疾病编码，为空时评估第一个问题已作答的所有疾病
+        with_paths: 为False时结果不包含答案路径(只需要结论时省去构造路径)
+    """
+    tables = table_cache.get(graph)
+    count = tables.question_count
+    # 规范化后的答案，只在需要时计算(答案格式不规范、未指定疾病或交给walk)
+    normalized: List[Optional[Dict[str, Tuple[str, ...]]]] = [None] * len(answer_sets)
+
+    def normalized_answers(row: int) -> Dict[str, Tuple[str, ...]]:
+        if normalized[row] is None:
+            normalized[row] = normalize_answers(answer_sets[row])
+        return normalized[row]
+
+    # 每个申请人的 (疾病编码, 行走序号)，行走序号为None时交给walk
+    selections: List[List[Tuple[str, Optional[int]]]] = []
+    rows, starts, pairs, lengths = [], [], [], []
+    for row, (answers, disease_codes) in enumerate(zip(answer_sets, disease_sets)):
+        encoded = _encode_plain(tables, answers)
+        if encoded is None:
+            encoded = _encode_normalized(tables, normalized_answers(row))
+        pairs.extend(encoded)
+        lengths.append(len(encoded))
+
+        if disease_codes is None:
+            answered = normalized_answers(row)
+            disease_codes = [code for code, first in tables.disease_order if first in answered]
+        selection = []
+        for code in disease_codes:
+            # 与CompiledRule.evaluate一致，疾病编码去掉首尾空白
+            code = (str(code).strip() or None) if code is not None else None
+            disease = graph.disease(code)
+            start = tables.entries.get(disease.code, -1) if disease else -1
+            if start < 0:
+                selection.append((code, None))
+                continue
+            selection.append((disease.code, len(starts)))
+            rows.append(row)
+            starts.append(start)
+        selections.append(selection)
+
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+    keys = np.repeat(np.arange(len(answer_sets), dtype=np.int64) * count, lengths) + pairs[:, 0]
+    values = pairs[:, 1].astype(np.int32)
+    order = np.argsort(keys, kind='stable')
+    status, terminal, pending, (trail_lanes, trail_questions, trail_answers) = \
+        run_kernel(tables, keys[order], values[order], rows, starts)
+    bounds = np.searchsorted(trail_lanes, np.arange(len(starts) + 1)).tolist() if with_paths else None
+    edge_rows = tables.edge_table.tolist() if with_paths else None
+    status, terminal, pending = status.tolist(), terminal.tolist(), pending.tolist()
+    trail_questions, trail_answers = trail_questions.tolist(), trail_answers.tolist()
+
+    # 不含路径时，同一疾病同一结论的结果相同，直接复用
+    shared: Dict[Tuple[str, int, int], DiseaseOutcome] = {}
+
+    def outcome(row: int, code: str, lane: Optional[int]) -> DiseaseOutcome:
+        if lane is None or status[lane] == _FALLBACK:
+            walked = graph.walk(code, normalized_answers(row))
+            return walked if with_paths else without_paths(walked)
+        key = (code, status[lane], terminal[lane] if status[lane] != _PENDING else pending[lane])
+        if not with_paths and key in shared:
+            return shared[key]
+        path = ()
+        if with_paths:
+            start, end = bounds[lane], bounds[lane + 1]
+            path = tuple(
+                (tables.codes[q], tables.edges[edge_rows[q][a]].answer_content)
+                for q, a in zip(trail_questions[start:end], trail_answers[start:end])
+            )
+        if status[lane] == _PENDING:
+            result = DiseaseOutcome(disease_code=code, status=STATUS_PENDING, path=path,
+                                    pending_question_code=tables.codes[pending[lane]])
+        else:
+            single = tables.conclusions[terminal[lane]]
+            result = DiseaseOutcome(
+                disease_code=code,
+                status=STATUS_CONCLUDED,
+                path=path,
+                medical_conclusion=single.medical_conclusion,
+                critical_illness_conclusion=single.critical_illness_conclusion,
+                medical_special_codes=single.medical_special_codes,
+                critical_illness_special_codes=single.critical_illness_special_codes
+            )
+        if not with_paths:
+            shared[key] = result
+        return result
+
+    return [
+        graph.summarize(outcome(row, code, lane) for code, lane in selection)
+        for row, selection in enumerate(selections)
+    ]
+
+
+def evaluate_batch(graph: CompiledRule, applicants: Sequence[Mapping[str, Any]],
+                   with_paths: bool = True) -> List[Tuple[Any, EvaluationResult]]:
+    """向量化的批量评估，参数和返回值见 ``rule_graph.evaluate_batch``"""
+    results = evaluate_many(
+        graph,
+        [applicant.get('answers') for applicant in applicants],
+        [applicant.get('diseases') for applicant in applicants],
+        with_paths=with_paths
+    )
+    return [(applicant.get('id', index), result) for index, (applicant, result) in enumerate(zip(applicants, results))]
@@ -1,7 +1,11 @@
 from typing import Optional, List, Dict, Any
+from sqlalchemy import func
 from sqlalchemy.exc import SQLAlchemyError
 from app import db
-from app.models import UnderwritingRule, Disease, RuleVersion
+from app.models import UnderwritingRule, Disease, RuleVersion, Question, Conclusion
+from app.utils.pagination import COUNT_EXACT, paginate
+from app.services.underwriting.reference_cache import invalidate_reference_data
+from app.services.underwriting.rule_graph import invalidate_rule_graph
 from app.models.base.enums import StatusEnum
 import logging
 import traceback
@@ -108,6 +112,7 @@ class UnderwritingRuleService:
                     setattr(rule, key, value)
             
             db.session.commit()
+            invalidate_rule_graph(rule_id)
             logger.info(f'服务层 - 规则更新成功: id={rule_id}')
             return rule, ''
             
@@ -138,6 +143,7 @@ class UnderwritingRuleService:
             
             db.session.delete(rule)
             db.session.commit()
+            invalidate_rule_graph(rule_id)
             logger.info(f'服务层 - 规则删除成功: id={rule_id}')
             return True, ''
             
@@ -226,6 +232,7 @@ class UnderwritingRuleService:
             
             rule.status = status
             db.session.commit()
+            invalidate_reference_data('rule_status')
             logger.info(f'服务层 - 更新规则状态成功: id={rule_id}, status={status}')
             return rule, ''
             
@@ -258,12 +265,104 @@ class UnderwritingRuleService:
             
             rule.diseases = diseases
             db.session.commit()
+            invalidate_rule_graph(rule_id)
             return True, ''
             
         except SQLAlchemyError as e:
             db.session.rollback()
             return False, str(e)
     
+    @staticmethod
+    def _count_subquery(model, label):
+        """按规则分组计数的子查询"""
+        return db.session.query(
+            model.rule_id.label('rule_id'),
+            func.count(model.id).label(label)
+        ).group_by(model.rule_id).subquery()
+
+    @staticmethod
+    def list_rule_summaries(name: str = None, status: str = None, page_size: int = 10,
+                            cursor: str = None, page: int = None, count: str = COUNT_EXACT,
+                            detail: bool = False) -> Dict[str, Any]:
+        """
+        规则列表(列投影 + 分组计数)
+        
+        规则字段和疾病/问题/结论数量在一条查询中取得，不加载ORM对象；
+        传入cursor时按 (created_at, id) 游标分页，否则按页码分页。
+        
+        Args:
+            name: 规则名称(模糊匹配)
+            status: 规则状态
+            page_size: 每页条数
+            cursor: 游标，空字符串表示第一页
+            page: 页码(未传cursor时使用)
+            count: 总数的计算方式(exact/estimate/none)
+            detail: 是否附带疾病和结论明细(每页各一次IN查询)
+            
+        Returns:
+            dict: {'list', 'pageSize', 'nextCursor' 或 'page', 'total'}
+            
+        Raises:
+            ValueError: 游标格式错误
+        """
+        diseases = UnderwritingRuleService._count_subquery(Disease, 'disease_count')
+        questions = UnderwritingRuleService._count_subquery(Question, 'question_count')
+        conclusions = UnderwritingRuleService._count_subquery(Conclusion, 'conclusion_count')
+        
+        query = db.session.query(
+            UnderwritingRule.id,
+            UnderwritingRule.name,
+            UnderwritingRule.version,
+            UnderwritingRule.description,
+            UnderwritingRule.status,
+            UnderwritingRule.created_at,
+            UnderwritingRule.updated_at,
+            func.coalesce(diseases.c.disease_count, 0).label('disease_count'),
+            func.coalesce(questions.c.question_count, 0).label('question_count'),
+            func.coalesce(conclusions.c.conclusion_count, 0).label('conclusion_count')
+        ).outerjoin(diseases, diseases.c.rule_id == UnderwritingRule.id) \
+            .outerjoin(questions, questions.c.rule_id == UnderwritingRule.id) \
+            .outerjoin(conclusions, conclusions.c.rule_id == UnderwritingRule.id)
+        
+        filtered = db.session.query(UnderwritingRule.id)
+        if name:
+            query = query.filter(UnderwritingRule.name.like(f'%{name}%'))
+            filtered = filtered.filter(UnderwritingRule.name.like(f'%{name}%'))
+        if status:
+            query = query.filter(UnderwritingRule.status == status)
+            filtered = filtered.filter(UnderwritingRule.status == status)
+        
+        pagination = paginate(query, UnderwritingRule.created_at, UnderwritingRule.id, page_size,
+                              cursor=cursor, page=page, count=count, count_query=filtered)
+        
+        items = []
+        for row in pagination.items:
+            items.append({
+                'id': row.id,
+                'name': row.name,
+                'version': row.version,
+                'description': row.description,
+                'status': row.status,
+                'disease_count': row.disease_count,
+                'question_count': row.question_count,
+                'conclusion_count': row.conclusion_count,
+                'has_data': row.disease_count > 0,
+                'created_at': row.created_at.strftime('%Y-%m-%d %H:%M:%S') if row.created_at else None,
+                'updated_at': row.updated_at.strftime('%Y-%m-%d %H:%M:%S') if row.updated_at else None
+            })
+        
+        if detail and items:
+            rule_ids = [item['id'] for item in items]
+            related = {rule_id: {'diseases': [], 'conclusions': []} for rule_id in rule_ids}
+            for disease in Disease.query.filter(Disease.rule_id.in_(rule_ids)).order_by(Disease.id):
+                related[disease.rule_id]['diseases'].append(disease.to_dict())
+            for conclusion in Conclusion.query.filter(Conclusion.rule_id.in_(rule_ids)).order_by(Conclusion.id):
+                related[conclusion.rule_id]['conclusions'].append(conclusion.to_dict())
+            for item in items:
+                item.update(related[item['id']])
+        
+        return pagination.to_dict(items)
+    
     @staticmethod
     def export_rule(rule_id: int) -> tuple[Optional[Dict[str, Any]], str]:
         """
@@ -303,6 +402,30 @@ class UnderwritingRuleService:
         except SQLAlchemyError as e:
             return None, str(e)
     
+    @staticmethod
+    def export_rule_artifact(rule_id: int, version: Optional[str] = None) -> tuple[Optional[bytes], str]:
+        """
+        导出编译后的规则图为二进制制品
+        
+        Args:
+            rule_id: 规则ID
+            version: 发布的版本号，为空时使用当前规则数据
+            
+        Returns:
+            tuple: (制品内容, 错误信息)
+        """
+        from app.services.underwriting.rule_graph import get_rule_graph
+        from app.services.underwriting.rule_artifact import dump_artifact
+        
+        try:
+            graph = get_rule_graph(rule_id, version)
+            if graph is None:
+                return None, '规则或版本不存在'
+            return dump_artifact(graph), ''
+            
+        except SQLAlchemyError as e:
+            return None, str(e)
+    
     @staticmethod
     def import_rule(data: Dict[str, Any]) -> tuple[Optional[UnderwritingRule], str]:
         """
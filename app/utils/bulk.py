@@ -0,0 +1,158 @@
+"""批量写入工具
+
+导入大文件时逐行 ``session.add`` + ``flush`` 会产生与行数相同的数据库往返。
+``BulkWriter`` 按列组装好的行字典一次性写入:
+
+- PostgreSQL: 先从序列中批量预留ID，再用 ``COPY ... FROM STDIN`` 写入
+- 其他数据库: 使用多行 ``INSERT ... RETURNING`` (SQLAlchemy insertmanyvalues)，按参数顺序返回ID
+"""
+import io
+import json
+import logging
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import insert, text
+
+logger = logging.getLogger(__name__)
+
+
+def _copy_value(value) -> str:
+    """把值转换为 COPY 文本格式"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (datetime, date)):
+        value = value.isoformat()
+    elif isinstance(value, (dict, list)):
+        value = json.dumps(value, ensure_ascii=False, default=str)
+    else:
+        value = str(value)
+    return (value.replace('\\', '\\\\')
+                 .replace('\t', '\\t')
+                 .replace('\n', '\\n')
+                 .replace('\r', '\\r'))
+
+
+class BulkWriter:
+    """批量写入器"""
+
+    def __init__(self, session, use_copy: Optional[bool] = None, batch_size: int = 1000):
+        """
+        Args:
+            session: 数据库会话
+            use_copy: 是否使用 COPY，默认在 PostgreSQL 上自动启用
+            batch_size: 多行 INSERT 每批的行数
+        """
+        self.session = session
+        self.batch_size = batch_size
+        dialect = session.get_bind().dialect
+        self.is_postgresql = dialect.name == 'postgresql'
+        self.use_copy = self.is_postgresql if use_copy is None else (use_copy and self.is_postgresql)
+        self.supports_returning = bool(getattr(dialect, 'insert_executemany_returning', False))
+
+    @staticmethod
+    def apply_defaults(table, rows: Sequence[Dict[str, Any]]):
+        """补齐列的Python端默认值(COPY不会触发SQLAlchemy的默认值)"""
+        defaults = []
+        for column in table.columns:
+            default = column.default
+            if default is None or column.primary_key:
+                continue
+            if default.is_callable:
+                defaults.append((column.name, default.arg, True))
+            elif default.is_scalar:
+                defaults.append((column.name, default.arg, False))
+
+        for row in rows:
+            for name, arg, is_callable in defaults:
+                if row.get(name) is None:
+                    row[name] = arg(None) if is_callable else arg
+
+    def reserve_ids(self, table, count: int) -> List[int]:
+        """从PostgreSQL序列中一次性预留count个ID"""
+        if count <= 0:
+            return []
+        result = self.session.execute(
+            text("SELECT nextval(pg_get_serial_sequence(:table_name, 'id')) FROM generate_series(1, :count)"),
+            {'table_name': table.name, 'count': count}
+        )
+        return [row[0] for row in result]
+
+    def copy(self, table, rows: Sequence[Dict[str, Any]], columns: Optional[Sequence[str]] = None) -> bool:
+        """使用 COPY 写入，驱动不支持时返回False"""
+        if not rows:
+            return True
+        dbapi_connection = self.session.connection().connection.dbapi_connection
+        cursor = dbapi_connection.cursor()
+        if not hasattr(cursor, 'copy_expert'):
+            cursor.close()
+            return False
+
+        columns = list(columns or rows[0].keys())
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write('\t'.join(_copy_value(row.get(c)) for c in columns))
+            buffer.write('\n')
+        buffer.seek(0)
+
+        column_sql = ', '.join(f'"{c}"' for c in columns)
+        try:
+            cursor.copy_expert(f'COPY "{table.name}" ({column_sql}) FROM STDIN', buffer)
+        finally:
+            cursor.close()
+        logger.info(f'COPY写入完成: table={table.name}, rows={len(rows)}')
+        return True
+
+    def insert(self, table, rows: List[Dict[str, Any]], return_ids: bool = False) -> Optional[List[int]]:
+        """批量插入
+
+        Args:
+            table: 目标表(``Model.__table__``)
+            rows: 行字典列表，所有行的键应一致
+            return_ids: 是否返回与rows顺序一致的ID列表
+
+        Returns:
+            return_ids为True时返回ID列表，否则返回None
+        """
+        if not rows:
+            return [] if return_ids else None
+
+        self.apply_defaults(table, rows)
+
+        if self.use_copy:
+            ids = None
+            if return_ids:
+                ids = self.reserve_ids(table, len(rows))
+                for row, row_id in zip(rows, ids):
+                    row['id'] = row_id
+            if self.copy(table, rows):
+                return ids
+            # 驱动不支持COPY，预留的ID直接随INSERT写入
+            self._insert_batches(table, rows)
+            return ids
+
+        if not return_ids:
+            self._insert_batches(table, rows)
+            return None
+
+        if self.supports_returning:
+            ids = []
+            stmt = insert(table).returning(table.c.id, sort_by_parameter_order=True)
+            for start in range(0, len(rows), self.batch_size):
+                result = self.session.execute(stmt, rows[start:start + self.batch_size])
+                ids.extend(result.scalars().all())
+            return ids
+
+        # 不支持批量RETURNING的数据库退化为逐行插入
+        ids = []
+        for row in rows:
+            result = self.session.execute(insert(table), row)
+            ids.append(result.inserted_primary_key[0])
+        return ids
+
+    def _insert_batches(self, table, rows: List[Dict[str, Any]]):
+        for start in range(0, len(rows), self.batch_size):
+            self.session.execute(insert(table), rows[start:start + self.batch_size])
+        logger.info(f'批量INSERT完成: table={table.name}, rows={len(rows)}')
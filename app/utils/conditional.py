@@ -0,0 +1,127 @@
+"""条件请求(ETag / If-None-Match / Last-Modified)
+
+- ``conditional``: 视图装饰器，先用数据表的水位(最近的更新/创建时间、行数和最大ID)计算ETag，
+  与客户端的 ``If-None-Match`` / ``If-Modified-Since`` 一致时直接返回304，不执行视图、不加载ORM对象
+- ``not_modified``: 已知ETag时(如缓存的响应体、已发布的规则版本)直接判断
+- ``add_etag``: 蓝图的 ``after_request``，为其余GET请求的JSON响应按内容生成ETag，
+  不能省去查询，但客户端缓存有效时只返回304，不重复传输响应体
+"""
+import hashlib
+import logging
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Any, Callable, Optional, Tuple
+
+from flask import request, make_response, current_app
+from sqlalchemy import func, select
+
+from app.extensions import db
+
+logger = logging.getLogger(__name__)
+
+
+def compute_etag(*parts: Any) -> str:
+    """由若干部分生成ETag(不含引号)"""
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(repr(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def watermark(*models) -> Tuple[Optional[datetime], Tuple[int, ...]]:
+    """数据表的水位：最近的更新时间，以及各表的行数和最大ID，一次查询取得
+
+    新插入的行(如导入)没有 ``updated_at``，取 ``created_at``；行数用于发现删除，
+    最大ID用于发现删除后重新插入、行数不变的情况。
+    """
+    columns = []
+    for model in models:
+        columns.append(select(func.max(func.coalesce(model.updated_at, model.created_at))).scalar_subquery())
+        columns.append(select(func.count(model.id)).scalar_subquery())
+        columns.append(select(func.max(model.id)).scalar_subquery())
+    row = db.session.execute(select(*columns)).one()
+    last_modified = max((value for value in row[0::3] if value is not None), default=None)
+    return last_modified, tuple(value for i, value in enumerate(row) if i % 3)
+
+
+def _utc(value: datetime) -> datetime:
+    """数据库中的时间为UTC(naive)，HTTP日期精确到秒"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.replace(microsecond=0)
+
+
+def not_modified(etag: str, last_modified: Optional[datetime] = None):
+    """客户端缓存仍然有效时返回304响应，否则返回None
+
+    有 ``If-None-Match`` 时只比较ETag，否则比较 ``If-Modified-Since``。
+    """
+    if request.if_none_match:
+        matched = request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since and last_modified is not None:
+        matched = _utc(last_modified) <= request.if_modified_since
+    else:
+        matched = False
+    if not matched:
+        return None
+    response = current_app.response_class(status=304)
+    set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag: str, last_modified: Optional[datetime] = None):
+    """设置ETag和Last-Modified，客户端每次使用缓存前都需要重新验证"""
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = _utc(last_modified)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def conditional(*models, key: Callable[..., Any] = None):
+    """按数据表水位支持条件请求的视图装饰器
+
+    Args:
+        models: 响应所依赖的模型，任一表有更新或删除时ETag都会变化
+        key: 可选，根据视图参数返回参与ETag计算的额外内容(如规则图版本)
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+            try:
+                last_modified, sizes = watermark(*models) if models else (None, ())
+                extra = key(*args, **kwargs) if key else None
+            except Exception as e:
+                logger.warning(f"计算ETag失败，按普通请求处理: {request.path}, error={str(e)}")
+                return view(*args, **kwargs)
+
+            etag = compute_etag(request.full_path, last_modified, sizes, extra)
+            response = not_modified(etag, last_modified)
+            if response is not None:
+                return response
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                set_validators(response, etag, last_modified)
+            return response
+        return wrapper
+    return decorator
+
+
+def add_etag(response):
+    """为GET请求的JSON响应按内容补充ETag，并处理条件请求"""
+    if (
+        request.method != 'GET'
+        or response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or 'ETag' in response.headers
+        or not response.is_json
+    ):
+        return response
+    response.add_etag()
+    response.headers.setdefault('Cache-Control', 'no-cache')
+    return response.make_conditional(request)
@@ -1,7 +1,190 @@
+import os
 import pandas as pd
-from typing import List, Dict, Any, Tuple
+from itertools import islice
+from typing import List, Dict, Any, Tuple, Iterator, Optional, Union
 from dataclasses import dataclass
-from utils.logger import get_logger
+from app.utils.logging import get_logger
+
+try:
+    import openpyxl
+except ImportError:  # pragma: no cover
+    openpyxl = None
+
+logger = get_logger(__name__)
+
+
+def clean_cell(value):
+    """单元格值类型整理：字符串去除首尾空格(空串视为None)，整数值的浮点数转为int"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    if isinstance(value, float):
+        if value != value:  # NaN
+            return None
+        if value.is_integer():
+            return int(value)
+    return value
+
+
+class SheetReader:
+    """流式读取单个sheet
+
+    表头取自第一行，只读取表头即可完成校验；数据行按需逐行生成，内存占用与sheet大小无关。
+    迭代产生 ``(index, row)``，index 与 ``pd.read_excel(skiprows=...)`` 的行索引一致
+    (跳过的行之后第一行为0)，row 为 ``列名 -> 值`` 的字典。
+    """
+
+    def __init__(self, name: str, rows: Iterator[tuple], row_count: Optional[int] = None,
+                 skip_rows: int = 0):
+        """
+        Args:
+            name: sheet名称
+            rows: 原始行迭代器(第一行为表头)
+            row_count: 数据行数估计(不含表头)，来自sheet的尺寸信息，可能为None
+            skip_rows: 表头之后需要跳过的行数(如说明行)
+        """
+        self.name = name
+        self._rows = rows
+        self._skip_rows = skip_rows
+        self._consumed = False
+        header = next(self._rows, None) or ()
+        self.columns = [
+            str(value).strip() if value is not None else f'Unnamed: {i}'
+            for i, value in enumerate(header)
+        ]
+        # 去掉末尾没有表头的空列
+        while self.columns and self.columns[-1].startswith('Unnamed: '):
+            self.columns.pop()
+        self.row_count = max(row_count - skip_rows, 0) if row_count is not None else None
+
+    def missing_columns(self, required: List[str]) -> List[str]:
+        """返回缺少的必需列"""
+        return [col for col in required if col not in self.columns]
+
+    def __iter__(self) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        if self._consumed:
+            raise RuntimeError(f'Sheet {self.name} 只能遍历一次')
+        self._consumed = True
+
+        columns = self.columns
+        width = len(columns)
+        for index, values in enumerate(self._rows, -self._skip_rows):
+            if index < 0:
+                continue
+            values = [clean_cell(v) for v in values[:width]]
+            if not any(v is not None for v in values):
+                continue  # 跳过空行
+            values.extend([None] * (width - len(values)))
+            yield index, dict(zip(columns, values))
+
+    def chunks(self, size: int = 5000) -> Iterator[pd.DataFrame]:
+        """按块生成DataFrame，块内索引与行索引一致，供批量处理使用"""
+        index, records = [], []
+        for row_index, row in self:
+            index.append(row_index)
+            records.append(row)
+            if len(records) >= size:
+                yield pd.DataFrame.from_records(records, index=index, columns=self.columns)
+                index, records = [], []
+        if records:
+            yield pd.DataFrame.from_records(records, index=index, columns=self.columns)
+
+
+# 文件头：.xls 为OLE2复合文档，.xlsx 为ZIP包
+XLS_MAGIC = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+XLSX_MAGIC = b'PK\x03\x04'
+
+
+def detect_format(source) -> str:
+    """根据文件头判断工作簿格式，返回 'xls' 或 'xlsx'
+
+    source 可以是文件路径或文件对象(读取后恢复原位置)；文件头无法识别时按扩展名判断，默认为xlsx。
+    """
+    head = b''
+    try:
+        if hasattr(source, 'read'):
+            position = source.tell()
+            source.seek(0)
+            head = source.read(len(XLS_MAGIC))
+            source.seek(position)
+        else:
+            with open(source, 'rb') as f:
+                head = f.read(len(XLS_MAGIC))
+    except (OSError, ValueError, TypeError) as e:
+        logger.warning(f"读取工作簿文件头失败，按扩展名判断格式: {str(e)}")
+
+    if head.startswith(XLS_MAGIC):
+        return 'xls'
+    if head.startswith(XLSX_MAGIC):
+        return 'xlsx'
+    name = getattr(source, 'filename', None) or getattr(source, 'name', None) or source
+    return 'xls' if os.path.splitext(str(name))[1].lower() == '.xls' else 'xlsx'
+
+
+class WorkbookReader:
+    """流式读取Excel工作簿
+
+    .xlsx 使用 openpyxl 只读模式逐行读取；.xls 只能由 pandas(xlrd) 整表读取，接口保持一致。
+    格式按文件头判断，文件对象(如上传的文件)没有扩展名也能正确识别。
+    """
+
+    def __init__(self, file_path, file_format: Optional[str] = None):
+        """
+        Args:
+            file_path: 文件路径或文件对象
+            file_format: 'xls' 或 'xlsx'，为空时根据文件头判断
+        """
+        self.file_path = file_path
+        self._workbook = None
+        self._excel_file = None
+        self.file_format = file_format or detect_format(file_path)
+        if self.file_format == 'xls' or openpyxl is None:
+            self._excel_file = pd.ExcelFile(file_path)
+            self.sheet_names = list(self._excel_file.sheet_names)
+        else:
+            self._workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+            self.sheet_names = list(self._workbook.sheetnames)
+
+    def sheet(self, sheet: Union[str, int], skip_rows: int = 0) -> SheetReader:
+        """打开sheet
+
+        Args:
+            sheet: sheet名称或序号
+            skip_rows: 表头之后需要跳过的行数
+        """
+        name = self.sheet_names[sheet] if isinstance(sheet, int) else sheet
+        if name not in self.sheet_names:
+            raise ValueError(f'缺少必需的sheet：{name}')
+
+        if self._workbook is not None:
+            worksheet = self._workbook[name]
+            max_row = worksheet.max_row
+            row_count = max_row - 1 if max_row else None
+            return SheetReader(name, worksheet.iter_rows(values_only=True), row_count, skip_rows)
+
+        df = pd.read_excel(self._excel_file, sheet_name=name, header=None, dtype=object)
+        df = df.astype(object).where(df.notna(), None)
+        rows = (tuple(values) for values in df.itertuples(index=False, name=None))
+        return SheetReader(name, rows, max(len(df) - 1, 0), skip_rows)
+
+    def close(self):
+        if self._workbook is not None:
+            self._workbook.close()
+        if self._excel_file is not None:
+            self._excel_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def open_workbook(file_path, file_format: Optional[str] = None) -> WorkbookReader:
+    """打开Excel工作簿用于流式读取，file_format为空时根据文件头判断格式"""
+    return WorkbookReader(file_path, file_format)
 
 @dataclass
 class ExcelSheet:
@@ -13,31 +196,35 @@ class ExcelTemplate:
         self.sheets = sheets
         
     def validate_structure(self, excel_file) -> Tuple[bool, List[str]]:
-        """验证Excel文件结构"""
+        """验证Excel文件结构，只读取各sheet的表头"""
         errors = []
         try:
-            df_dict = pd.read_excel(excel_file, sheet_name=None)
-            
-            # 验证sheet页
-            for sheet in self.sheets:
-                if sheet.name not in df_dict:
-                    errors.append(f"缺少必需的sheet页: {sheet.name}")
-                    continue
-                    
-                df = df_dict[sheet.name]
-                missing_columns = [col for col in sheet.required_columns if col not in df.columns]
-                if missing_columns:
-                    errors.append(f"sheet页 {sheet.name} 缺少必需的列: {', '.join(missing_columns)}")
+            with open_workbook(excel_file) as workbook:
+                for sheet in self.sheets:
+                    if sheet.name not in workbook.sheet_names:
+                        errors.append(f"缺少必需的sheet页: {sheet.name}")
+                        continue
+
+                    missing_columns = workbook.sheet(sheet.name).missing_columns(sheet.required_columns)
+                    if missing_columns:
+                        errors.append(f"sheet页 {sheet.name} 缺少必需的列: {', '.join(missing_columns)}")
                     
             return len(errors) == 0, errors
             
         except Exception as e:
             errors.append(f"Excel文件验证失败: {str(e)}")
             return False, errors
+
+    @staticmethod
+    def iter_rows(excel_file, sheet_name: str) -> Iterator[Dict[str, Any]]:
+        """逐行读取sheet数据，遍历结束后关闭文件"""
+        with open_workbook(excel_file) as workbook:
+            for _, row in workbook.sheet(sheet_name):
+                yield row
             
-    def read_data(self, excel_file) -> Dict[str, pd.DataFrame]:
-        """读取Excel数据"""
-        return pd.read_excel(excel_file, sheet_name=[sheet.name for sheet in self.sheets])
+    def read_data(self, excel_file) -> Dict[str, Iterator[Dict[str, Any]]]:
+        """读取Excel数据，每个sheet返回惰性的行迭代器"""
+        return {sheet.name: self.iter_rows(excel_file, sheet.name) for sheet in self.sheets}
 
 class RuleExcelTemplate(ExcelTemplate):
     """核保规则Excel模板"""
@@ -85,33 +272,33 @@ class RuleExcelTemplate(ExcelTemplate):
         ])
         
     def validate_structure(self, excel_file) -> Tuple[bool, List[str]]:
-        """验证Excel文件结构"""
+        """验证Excel文件结构，只读取各sheet的表头"""
         self.logger.info("开始验证Excel文件结构")
         errors = []
         try:
-            df_dict = pd.read_excel(excel_file, sheet_name=None)
-            self.logger.info(f"Excel文件包含以下sheet页: {list(df_dict.keys())}")
-            
-            # 验证sheet页
-            for sheet in self.sheets:
-                if sheet.name not in df_dict:
-                    error_msg = f"缺少必需的sheet页: {sheet.name}"
-                    self.logger.error(error_msg)
-                    errors.append(error_msg)
-                    continue
-                    
-                df = df_dict[sheet.name]
-                self.logger.info(f"正在验证{sheet.name}页:")
-                self.logger.info(f"- 总行数: {len(df)}")
-                self.logger.info(f"- 总列数: {len(df.columns)}")
-                self.logger.info(f"- 实际列名: {', '.join(df.columns.tolist())}")
-                self.logger.info(f"- 要求列名: {', '.join(sheet.required_columns)}")
+            with open_workbook(excel_file) as workbook:
+                self.logger.info(f"Excel文件包含以下sheet页: {workbook.sheet_names}")
                 
-                missing_columns = [col for col in sheet.required_columns if col not in df.columns]
-                if missing_columns:
-                    error_msg = f"sheet页 {sheet.name} 缺少必需的列: {', '.join(missing_columns)}"
-                    self.logger.error(error_msg)
-                    errors.append(error_msg)
+                # 验证sheet页
+                for sheet in self.sheets:
+                    if sheet.name not in workbook.sheet_names:
+                        error_msg = f"缺少必需的sheet页: {sheet.name}"
+                        self.logger.error(error_msg)
+                        errors.append(error_msg)
+                        continue
+                        
+                    reader = workbook.sheet(sheet.name)
+                    self.logger.info(f"正在验证{sheet.name}页:")
+                    self.logger.info(f"- 总行数: {reader.row_count}")
+                    self.logger.info(f"- 总列数: {len(reader.columns)}")
+                    self.logger.info(f"- 实际列名: {', '.join(reader.columns)}")
+                    self.logger.info(f"- 要求列名: {', '.join(sheet.required_columns)}")
+                    
+                    missing_columns = reader.missing_columns(sheet.required_columns)
+                    if missing_columns:
+                        error_msg = f"sheet页 {sheet.name} 缺少必需的列: {', '.join(missing_columns)}"
+                        self.logger.error(error_msg)
+                        errors.append(error_msg)
                     
             if not errors:
                 self.logger.info("Excel文件结构验证通过")
@@ -123,66 +310,25 @@ class RuleExcelTemplate(ExcelTemplate):
             errors.append(error_msg)
             return False, errors
             
-    def read_data(self, excel_file) -> Dict[str, pd.DataFrame]:
-        """读取Excel数据"""
-        self.logger.info("开始读取Excel数据")
-        try:
-            data = pd.read_excel(excel_file, sheet_name=[sheet.name for sheet in self.sheets])
-            
-            # 记录每个sheet的数据概况
-            for sheet_name, df in data.items():
-                self.logger.info(f"\n{sheet_name}页数据概况:")
-                self.logger.info(f"- 数据行数: {len(df)}")
-                self.logger.info(f"- 数据列数: {len(df.columns)}")
-                self.logger.info(f"- 列名: {', '.join(df.columns.tolist())}")
-                
-                # 跳过前两行(表头和规则说明)，记录实际数据
-                if len(df) > 2:
-                    df_data = df.iloc[2:]
-                    self.logger.info(f"- 实际数据行数: {len(df_data)}")
-                    self.logger.info("- 数据预览:")
-                    for idx, row in df_data.head().iterrows():
-                        self.logger.info(f"  第{idx+1}行: {dict(row)}")
-                        
-            self.logger.info("Excel数据读取完成")
-            return data
-            
-        except Exception as e:
-            self.logger.error(f"读取Excel数据失败: {str(e)}", exc_info=True)
-            raise
-            
-    def process_data(self, data: Dict[str, pd.DataFrame]) -> Dict[str, List[Dict]]:
-        """处理Excel数据为业务对象"""
+    def process_data(self, data: Dict[str, Iterator[Dict[str, Any]]]) -> Dict[str, List[Dict]]:
+        """处理Excel数据为业务对象，逐行消费 read_data 返回的迭代器"""
         self.logger.info("开始处理Excel数据")
         result = {}
         
         try:
-            # 处理疾病数据
-            if "疾病配置" in data:
-                self.logger.info("处理疾病配置数据:")
-                diseases_df = data["疾病配置"].iloc[2:]  # 跳过前两行
-                result["diseases"] = diseases_df.to_dict("records")
-                self.logger.info(f"- 处理了{len(result['diseases'])}条疾病记录")
-                for disease in result["diseases"][:3]:  # 记录前3条数据
-                    self.logger.info(f"- 疾病示例: {disease}")
-                    
-            # 处理问题数据
-            if "问题配置" in data:
-                self.logger.info("处理问题配置数据:")
-                questions_df = data["问题配置"].iloc[2:]
-                result["questions"] = questions_df.to_dict("records")
-                self.logger.info(f"- 处理了{len(result['questions'])}条问题记录")
-                for question in result["questions"][:3]:
-                    self.logger.info(f"- 问题示例: {question}")
-                    
-            # 处理答案数据
-            if "答案配置" in data:
-                self.logger.info("处理答案配置数据:")
-                answers_df = data["答案配置"].iloc[2:]
-                result["answers"] = answers_df.to_dict("records")
-                self.logger.info(f"- 处理了{len(result['answers'])}条答案记录")
-                for answer in result["answers"][:3]:
-                    self.logger.info(f"- 答案示例: {answer}")
+            for sheet_name, key, label in (
+                ("疾病配置", "diseases", "疾病"),
+                ("问题配置", "questions", "问题"),
+                ("答案配置", "answers", "答案"),
+            ):
+                if sheet_name not in data:
+                    continue
+                self.logger.info(f"处理{sheet_name}数据:")
+                # 跳过前两行(规则说明)
+                result[key] = list(islice(data[sheet_name], 2, None))
+                self.logger.info(f"- 处理了{len(result[key])}条{label}记录")
+                for record in result[key][:3]:  # 记录前3条数据
+                    self.logger.info(f"- {label}示例: {record}")
                     
             # 验证数据关联关系
             self._validate_relationships(result)
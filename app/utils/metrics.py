@@ -0,0 +1,305 @@
+"""请求性能指标
+
+每个请求记录总耗时、数据库查询次数和耗时(SQLAlchemy引擎事件)、JSON序列化耗时和响应大小:
+
+- 通过 ``Server-Timing`` 响应头返回，浏览器开发者工具中可以直接查看
+- 按端点汇总为直方图，由 ``/metrics`` 输出(JSON，``?format=prometheus`` 时为Prometheus文本格式)
+- ``/metrics`` 和 ``/metrics/reset`` 是内部端点，只在 ``METRICS_ENDPOINT_ENABLED`` 时注册：
+  ``/metrics`` 需要登录或携带 ``METRICS_TOKEN``(供Prometheus等采集程序使用)，``/metrics/reset`` 需要登录
+- 其他模块可以用 ``registry.register_gauges`` 注册当前值(如缓存的命中率和内存占用)，一并输出
+
+查询次数的直方图和最大值可以发现N+1查询：列表接口的查询次数应与页大小无关。
+流式响应在 ``after_request`` 之后才输出，输出期间的查询和响应大小不计入。
+"""
+import hmac
+import time
+import bisect
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from flask import g, request, jsonify, has_request_context, current_app
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# 直方图的桶上界
+DURATION_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS_BYTES = (1024, 10 * 1024, 100 * 1024, 1024 * 1024, 10 * 1024 * 1024)
+
+# 不计入统计的端点
+EXCLUDED_ENDPOINTS = {'static', 'metrics', 'reset_metrics', 'health_check'}
+
+
+class Histogram:
+    """固定桶的直方图"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 3),
+            'mean': round(self.sum / self.count, 3) if self.count else None,
+            'max': round(self.max, 3),
+            'buckets': {
+                **{str(bound): count for bound, count in zip(self.buckets, self.counts)},
+                '+Inf': self.counts[-1]
+            }
+        }
+
+
+class RequestStats:
+    """单个请求的统计，保存在 ``g`` 中"""
+    __slots__ = ('started', 'db_queries', 'db_time', 'serialize_time')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+
+
+class MetricsRegistry:
+    """按端点汇总的请求指标"""
+
+    METRICS = {
+        'duration_ms': DURATION_BUCKETS_MS,
+        'db_time_ms': DURATION_BUCKETS_MS,
+        'db_queries': QUERY_COUNT_BUCKETS,
+        'serialize_ms': DURATION_BUCKETS_MS,
+        'response_bytes': SIZE_BUCKETS_BYTES,
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, Dict[str, Any]] = {}
+        self._gauges: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        self.started_at = time.time()
+
+    def register_gauges(self, name: str, collect: Callable[[], Dict[str, Any]]):
+        """注册一组当前值，collect在输出指标时调用，返回 {名称: 数值}"""
+        with self._lock:
+            self._gauges[name] = collect
+
+    def gauges(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            collectors = dict(self._gauges)
+        values = {}
+        for name, collect in collectors.items():
+            try:
+                values[name] = collect()
+            except Exception as e:
+                logger.warning(f"读取指标失败: {name}, error={str(e)}")
+        return values
+
+    def observe(self, endpoint: str, status: int, values: Dict[str, Optional[float]]):
+        with self._lock:
+            entry = self._endpoints.get(endpoint)
+            if entry is None:
+                entry = self._endpoints[endpoint] = {
+                    'status': {},
+                    **{name: Histogram(buckets) for name, buckets in self.METRICS.items()}
+                }
+            entry['status'][status] = entry['status'].get(status, 0) + 1
+            for name, value in values.items():
+                if value is not None:
+                    entry[name].observe(value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            endpoints = {
+                endpoint: {
+                    'status': dict(entry['status']),
+                    **{name: entry[name].to_dict() for name in self.METRICS}
+                }
+                for endpoint, entry in self._endpoints.items()
+            }
+        return {'since': self.started_at, 'endpoints': endpoints, 'gauges': self.gauges()}
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self.started_at = time.time()
+
+    def prometheus(self) -> str:
+        """Prometheus文本格式"""
+        lines: List[str] = []
+        with self._lock:
+            for name in self.METRICS:
+                metric = f'app_request_{name}'
+                lines.append(f'# TYPE {metric} histogram')
+                for endpoint, entry in sorted(self._endpoints.items()):
+                    histogram = entry[name]
+                    label = endpoint.replace('\\', '\\\\').replace('"', '\\"')
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f'{metric}_bucket{{endpoint="{label}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{metric}_bucket{{endpoint="{label}",le="+Inf"}} {histogram.count}')
+                    lines.append(f'{metric}_sum{{endpoint="{label}"}} {histogram.sum}')
+                    lines.append(f'{metric}_count{{endpoint="{label}"}} {histogram.count}')
+        for name, values in sorted(self.gauges().items()):
+            for key, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f'# TYPE app_{name}_{key} gauge')
+                    lines.append(f'app_{name}_{key} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def current_stats() -> Optional[RequestStats]:
+    """当前请求的统计，不在请求中或未启用时返回None"""
+    if not has_request_context():
+        return None
+    return g.get('_request_stats')
+
+
+def record_serialization(seconds: float):
+    """记录JSON序列化耗时"""
+    stats = current_stats()
+    if stats is not None:
+        stats.serialize_time += seconds
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_stats() is not None:
+        conn.info.setdefault('_query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('_query_started')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    stats = current_stats()
+    if stats is not None:
+        stats.db_queries += 1
+        stats.db_time += elapsed
+
+
+def _handle_error(context):
+    # 执行失败时不会触发after_cursor_execute，丢弃对应的开始时间
+    connection = context.connection
+    started = connection.info.get('_query_started') if connection is not None else None
+    if started:
+        started.pop()
+
+
+_engine_events_registered = False
+
+
+def _register_engine_events():
+    global _engine_events_registered
+    if not _engine_events_registered:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+        _engine_events_registered = True
+
+
+def _endpoint_name() -> str:
+    return f'{request.method} {request.url_rule.rule if request.url_rule else "<unmatched>"}'
+
+
+def _before_request():
+    if request.endpoint not in EXCLUDED_ENDPOINTS:
+        g._request_stats = RequestStats()
+
+
+def _after_request(response):
+    stats = g.pop('_request_stats', None)
+    if stats is None:
+        return response
+    try:
+        duration = (time.perf_counter() - stats.started) * 1000
+        db_time = stats.db_time * 1000
+        serialize_time = stats.serialize_time * 1000
+        size = None if response.is_streamed else response.calculate_content_length()
+
+        response.headers.add(
+            'Server-Timing',
+            f'app;dur={duration:.2f}, db;dur={db_time:.2f};desc="{stats.db_queries} queries", '
+            f'serialize;dur={serialize_time:.2f}'
+        )
+        registry.observe(_endpoint_name(), response.status_code, {
+            'duration_ms': duration,
+            'db_time_ms': db_time,
+            'db_queries': stats.db_queries,
+            'serialize_ms': serialize_time,
+            'response_bytes': size,
+        })
+    except Exception as e:
+        logger.warning(f"记录请求指标失败: {request.path}, error={str(e)}")
+    return response
+
+
+def _scraper_token_valid() -> bool:
+    """请求是否携带了配置的采集令牌: ``Authorization: Bearer <METRICS_TOKEN>``"""
+    token = current_app.config.get('METRICS_TOKEN')
+    if not token:
+        return False
+    expected = f'Bearer {token}'.encode('utf-8')
+    return hmac.compare_digest(request.headers.get('Authorization', '').encode('utf-8'), expected)
+
+
+def init_metrics(app):
+    """注册请求指标中间件，``METRICS_ENDPOINT_ENABLED`` 时注册 ``/metrics`` 端点"""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    _register_engine_events()
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+
+    if not app.config.get('METRICS_ENDPOINT_ENABLED', False):
+        return
+
+    # app.decorators经由app.utils.response间接导入本模块，不能在模块顶部导入
+    from app.decorators import login_required
+
+    def snapshot():
+        if request.args.get('format') == 'prometheus':
+            return app.response_class(registry.prometheus(), mimetype='text/plain; version=0.0.4')
+        return jsonify({
+            "code": 200,
+            "data": registry.snapshot(),
+            "message": "success"
+        })
+
+    logged_in_snapshot = login_required(snapshot)
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        """按端点汇总的请求指标，采集程序使用METRICS_TOKEN，其他调用方需要登录"""
+        if _scraper_token_valid():
+            return snapshot()
+        return logged_in_snapshot()
+
+    @app.route('/metrics/reset', methods=['POST'])
+    @login_required
+    def reset_metrics():
+        """清空已汇总的请求指标"""
+        user = request.current_user
+        registry.reset()
+        logger.info(f"请求指标已清空: user={user.get('username')}")
+        return jsonify({
+            "code": 200,
+            "data": None,
+            "message": "success"
+        })
@@ -0,0 +1,189 @@
+"""N+1查询检测(开发和测试环境使用)
+
+在一个请求(或 ``detect_nplusone`` 代码块)中按SQL的形状统计查询次数，
+同一形状的查询达到阈值时，多半是在循环中逐行加载关联对象(如 ``to_dict`` 中访问的关系)。
+
+SQL的形状：参数已经是占位符，再把 ``IN (?, ?, ...)`` 折叠为一个占位符并合并空白。
+达到阈值时记录发起查询的代码位置(调用栈中属于本项目的帧)。
+
+配置 ``NPLUSONE_DETECT``:
+
+- ``off``(默认，开发环境也不检测，需要时通过环境变量开启): 不检测
+- ``log``: 请求结束时输出警告日志
+- ``raise``: 请求结束时抛出 ``NPlusOneError``，测试中请求直接失败
+
+``NPLUSONE_THRESHOLD`` 为同一形状查询的次数阈值，默认5。
+"""
+import os
+import re
+import sys
+import logging
+import contextvars
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+MODE_OFF = 'off'
+MODE_LOG = 'log'
+MODE_RAISE = 'raise'
+DEFAULT_THRESHOLD = 5
+
+# 调用栈中记录的本项目帧数
+STACK_DEPTH = 3
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_THIS_FILE = os.path.abspath(__file__)
+
+_IN_LIST = re.compile(r'\(\s*(?:\?|%\(\w+\)s|%s|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|%s|:\w+))+\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+_POSTCOMPILE = re.compile(r'__\[POSTCOMPILE_\w+\]')
+
+
+class NPlusOneError(Exception):
+    """同一形状的查询次数超过阈值"""
+
+
+def query_shape(statement: str) -> str:
+    """SQL的形状，参数个数不同的IN列表视为同一形状"""
+    shape = _POSTCOMPILE.sub('?', statement)
+    shape = _IN_LIST.sub('(?)', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+
+def caller_location(depth: int = STACK_DEPTH) -> List[str]:
+    """调用栈中属于本项目的帧(由内向外)，形如 ``app/models/product.py:42 in to_dict``"""
+    locations = []
+    frame = sys._getframe(1)
+    while frame is not None and len(locations) < depth:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(_APP_DIR) and filename != _THIS_FILE:
+            relative = os.path.relpath(filename, os.path.dirname(_APP_DIR))
+            locations.append(f'{relative}:{frame.f_lineno} in {frame.f_code.co_name}')
+        frame = frame.f_back
+    return locations
+
+
+@dataclass
+class RepeatedQuery:
+    """重复执行的同一形状查询"""
+    statement: str
+    count: int = 0
+    locations: List[str] = field(default_factory=list)
+
+    def to_dict(self):
+        return {'statement': self.statement, 'count': self.count, 'locations': self.locations}
+
+
+class QueryTracker:
+    """统计一个作用域内各形状查询的次数"""
+
+    def __init__(self, threshold: int = DEFAULT_THRESHOLD):
+        self.threshold = max(int(threshold), 2)
+        self.queries: Dict[str, RepeatedQuery] = {}
+
+    def record(self, statement: str):
+        shape = query_shape(statement)
+        entry = self.queries.get(shape)
+        if entry is None:
+            entry = self.queries[shape] = RepeatedQuery(statement=shape)
+        entry.count += 1
+        # 达到阈值时记录位置，之后的重复查询只计数
+        if entry.count == self.threshold:
+            entry.locations = caller_location()
+
+    def violations(self) -> List[RepeatedQuery]:
+        return sorted(
+            (entry for entry in self.queries.values() if entry.count >= self.threshold),
+            key=lambda entry: entry.count,
+            reverse=True
+        )
+
+    @staticmethod
+    def describe(violations: List[RepeatedQuery]) -> str:
+        lines = []
+        for entry in violations:
+            lines.append(f'{entry.count}次: {entry.statement}')
+            lines.extend(f'    at {location}' for location in entry.locations)
+        return '\n'.join(lines)
+
+
+_tracker: contextvars.ContextVar[Optional[QueryTracker]] = contextvars.ContextVar('nplusone_tracker', default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    tracker = _tracker.get()
+    if tracker is not None:
+        tracker.record(statement)
+
+
+_engine_events_registered = False
+
+
+def _register_engine_events():
+    global _engine_events_registered
+    if not _engine_events_registered:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        _engine_events_registered = True
+
+
+@contextmanager
+def detect_nplusone(threshold: int = DEFAULT_THRESHOLD, mode: str = MODE_RAISE):
+    """在代码块中检测N+1查询，用于测试和脚本::
+
+        with detect_nplusone(threshold=3):
+            ProductService.get_product_list(page=1, page_size=50)
+
+    Raises:
+        NPlusOneError: mode为raise且同一形状的查询达到阈值
+    """
+    _register_engine_events()
+    tracker = QueryTracker(threshold)
+    token = _tracker.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _tracker.reset(token)
+    _report(tracker, mode, '代码块')
+
+
+def _report(tracker: QueryTracker, mode: str, scope: str):
+    violations = tracker.violations()
+    if not violations:
+        return
+    message = f'检测到N+1查询: {scope}\n{tracker.describe(violations)}'
+    if mode == MODE_RAISE:
+        raise NPlusOneError(message)
+    logger.warning(message)
+
+
+def init_nplusone(app):
+    """按配置为每个请求启用N+1查询检测"""
+    mode = str(app.config.get('NPLUSONE_DETECT', MODE_OFF)).lower()
+    if mode not in (MODE_LOG, MODE_RAISE):
+        return
+    threshold = int(app.config.get('NPLUSONE_THRESHOLD', DEFAULT_THRESHOLD))
+    _register_engine_events()
+
+    @app.before_request
+    def _start_nplusone_tracking():
+        _tracker.set(QueryTracker(threshold))
+
+    @app.after_request
+    def _check_nplusone(response):
+        tracker = _tracker.get()
+        _tracker.set(None)
+        if tracker is not None:
+            _report(tracker, mode, f'{request.method} {request.path}')
+        return response
+
+    @app.teardown_request
+    def _stop_nplusone_tracking(exc):
+        _tracker.set(None)
+
+    logger.info(f'N+1查询检测已启用: mode={mode}, threshold={threshold}')
@@ -0,0 +1,215 @@
+"""游标(keyset)分页
+
+按 ``(created_at, id)`` 倒序分页，游标是上一页最后一条记录的排序键，经 base64 编码后对客户端不透明。
+翻页只需要 ``WHERE (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC LIMIT n``，
+与页码无关，不需要 OFFSET 扫描前面的行。
+
+总数的计算方式(``count``)：
+
+- ``exact``: ``COUNT(*)``，与原先的分页接口一致
+- ``estimate``: 取PostgreSQL执行计划中的估算行数，大表上不需要扫描
+- ``none``: 不计算总数，客户端只根据 ``nextCursor`` 判断是否还有下一页
+"""
+import json
+import base64
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+
+logger = logging.getLogger(__name__)
+
+COUNT_EXACT = 'exact'
+COUNT_ESTIMATE = 'estimate'
+COUNT_NONE = 'none'
+COUNT_MODES = (COUNT_EXACT, COUNT_ESTIMATE, COUNT_NONE)
+
+
+def encode_cursor(created_at: Optional[datetime], id: int) -> str:
+    """生成游标"""
+    payload = json.dumps([created_at.isoformat() if created_at else None, id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[Optional[datetime], int]]:
+    """解析游标，空游标返回None
+
+    Raises:
+        ValueError: 游标格式错误
+    """
+    if not cursor:
+        return None
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, id = json.loads(payload)
+        return (datetime.fromisoformat(created_at) if created_at else None), int(id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f'无效的分页游标: {cursor}') from e
+
+
+def keyset_filter(created_at_column, id_column, cursor: Tuple[Optional[datetime], int]):
+    """``ORDER BY created_at DESC, id DESC`` 时位于游标之后的条件
+
+    created_at 为空的记录排在最后(与PostgreSQL倒序时NULLS FIRST相反，排序需显式指定nulls_last)。
+    """
+    created_at, id = cursor
+    if created_at is None:
+        return and_(created_at_column.is_(None), id_column < id)
+    return or_(
+        created_at_column < created_at,
+        and_(created_at_column == created_at, id_column < id),
+        created_at_column.is_(None)
+    )
+
+
+def keyset_order(created_at_column, id_column):
+    """与 ``keyset_filter`` 对应的排序"""
+    return created_at_column.desc().nulls_last(), id_column.desc()
+
+
+def keyset_page(query, created_at_column, id_column, cursor: Optional[str], limit: int,
+                key=lambda row: (row.created_at, row.id)) -> Tuple[list, Optional[str]]:
+    """执行一页游标分页查询
+
+    多取一条判断是否还有下一页。
+
+    Returns:
+        (当前页的行, 下一页游标；没有下一页时为None)
+    """
+    position = decode_cursor(cursor)
+    if position is not None:
+        query = query.filter(keyset_filter(created_at_column, id_column, position))
+    rows = query.order_by(*keyset_order(created_at_column, id_column)).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(*key(rows[-1]))
+    return rows, next_cursor
+
+
+def parse_count_mode(value: Optional[str], default: str = COUNT_EXACT) -> str:
+    """解析请求中的count参数
+
+    Raises:
+        ValueError: 不支持的计数方式
+    """
+    if not value:
+        return default
+    value = value.strip().lower()
+    if value not in COUNT_MODES:
+        raise ValueError(f'无效的count参数: {value}，可选值: {", ".join(COUNT_MODES)}')
+    return value
+
+
+def estimate_count(query) -> Optional[int]:
+    """根据执行计划估算查询的行数，非PostgreSQL或估算失败时返回None"""
+    session = query.session
+    bind = session.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return None
+    compiled = query.order_by(None).statement.compile(dialect=bind.dialect)
+    try:
+        plan = session.connection().exec_driver_sql(
+            f'EXPLAIN (FORMAT JSON) {compiled}', compiled.params
+        ).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    except Exception as e:
+        logger.warning(f'估算行数失败，改为精确计数: {str(e)}')
+        return None
+
+
+def count_rows(query, mode: str = COUNT_EXACT) -> Optional[int]:
+    """按计数方式计算总数"""
+    if mode == COUNT_NONE:
+        return None
+    if mode == COUNT_ESTIMATE:
+        total = estimate_count(query)
+        if total is not None:
+            return total
+    return query.order_by(None).count()
+
+
+@dataclass
+class Page:
+    """一页查询结果"""
+    items: List[Any] = field(default_factory=list)
+    page_size: int = 0
+    page: Optional[int] = None
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+    count_mode: str = COUNT_EXACT
+
+    def pagination(self) -> Dict[str, Any]:
+        """响应中的分页信息"""
+        result = {'pageSize': self.page_size, 'total': self.total}
+        if self.page is not None:
+            result['current'] = self.page
+        else:
+            result['nextCursor'] = self.next_cursor
+        if self.count_mode != COUNT_EXACT:
+            result['countMode'] = self.count_mode
+        return result
+
+    def to_dict(self, items: Optional[List[Any]] = None) -> Dict[str, Any]:
+        """``{list, total, page/nextCursor, pageSize}`` 形式的列表数据
+
+        Args:
+            items: 已转换的列表数据，默认使用当前页的行
+        """
+        result = {'list': self.items if items is None else items, 'total': self.total, 'pageSize': self.page_size}
+        if self.page is not None:
+            result['page'] = self.page
+        else:
+            result['nextCursor'] = self.next_cursor
+        if self.count_mode != COUNT_EXACT:
+            result['countMode'] = self.count_mode
+        return result
+
+
+def paginate(query, created_at_column, id_column, page_size: int, cursor: Optional[str] = None,
+             page: Optional[int] = None, count: str = COUNT_EXACT, count_query=None,
+             key=lambda row: (row.created_at, row.id)) -> Page:
+    """列表分页
+
+    传入cursor(空字符串表示第一页)时使用游标分页，否则按页码分页，两种方式的排序一致。
+
+    Args:
+        query: 已应用过滤条件的查询
+        created_at_column, id_column: 排序列
+        page_size: 每页条数
+        cursor: 游标
+        page: 页码(未传cursor时使用)
+        count: 总数的计算方式
+        count_query: 计算总数使用的查询，默认使用query；query中包含连接或聚合时传入只含过滤条件的查询
+        key: 从行中取得 (created_at, id)
+
+    Raises:
+        ValueError: 游标格式错误
+    """
+    page_size = max(page_size or 1, 1)
+    result = Page(page_size=page_size, count_mode=count)
+    if cursor is not None:
+        result.items, result.next_cursor = keyset_page(
+            query, created_at_column, id_column, cursor, page_size, key=key
+        )
+    else:
+        result.page = max(page or 1, 1)
+        result.items = query.order_by(*keyset_order(created_at_column, id_column)) \
+            .offset((result.page - 1) * page_size).limit(page_size).all()
+    if result.page is not None:
+        # 不满一页说明已经到末尾，总数可以直接算出
+        complete = len(result.items) < page_size and (result.items or result.page == 1)
+        offset = (result.page - 1) * page_size
+    else:
+        complete = not cursor and result.next_cursor is None
+        offset = 0
+    if count != COUNT_NONE and complete:
+        result.total = offset + len(result.items)
+        result.count_mode = COUNT_EXACT
+    else:
+        result.total = count_rows(count_query if count_query is not None else query, count)
+    return result
@@ -1,9 +1,9 @@
-from flask import jsonify
 from datetime import datetime
+from app.utils.serialization import json_response
 
 def success_response(data=None, message='success'):
     """成功响应"""
-    return jsonify({
+    return json_response({
         'code': 200,
         'message': message,
         'data': data,
@@ -12,9 +12,9 @@ def success_response(data=None, message='success'):
 
 def error_response(code, message, data=None):
     """错误响应"""
-    return jsonify({
+    return json_response({
         'code': code,
         'message': message,
         'data': data,
         'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    }), code 
\ No newline at end of file
+    }, status=code)
\ No newline at end of file
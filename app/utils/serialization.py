@@ -0,0 +1,185 @@
+"""JSON序列化与响应
+
+- ``dumps``: 安装了 orjson 时使用 orjson，否则使用标准库，输出均为UTF-8字节；
+  日期、Decimal 等类型与 Flask 默认的 JSON 处理保持一致
+- ``FastJSONProvider``: 替换 Flask 的 JSON provider，``jsonify`` 也使用同一个编码器
+- ``json_response``: 由数据或已序列化的字节构造响应
+- ``SerializedCache``: 按 (资源, 版本) 缓存序列化后的字节，版本不变时直接复用
+- ``splice``: 把缓存的片段拼入响应，不重新序列化
+- ``stream_json``: 分块输出大数组，不在内存中构造整个文档
+"""
+import json
+import time
+import uuid
+import decimal
+import dataclasses
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional
+
+from flask import Response, current_app, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+from app.utils.metrics import record_serialization
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson为可选依赖
+    orjson = None
+
+JSON_MIMETYPE = 'application/json'
+
+# 数组分块输出时每块包含的元素数
+STREAM_CHUNK_SIZE = 500
+
+
+def _default(value: Any) -> Any:
+    """与 Flask DefaultJSONProvider 一致的类型转换"""
+    if isinstance(value, date):
+        return http_date(value)
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    if hasattr(value, '__html__'):
+        return str(value.__html__())
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+    def dumps(value: Any) -> bytes:
+        """序列化为UTF-8字节"""
+        return orjson.dumps(value, default=_default, option=_ORJSON_OPTIONS)
+else:
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=_default)
+
+    def dumps(value: Any) -> bytes:
+        """序列化为UTF-8字节"""
+        return _encoder.encode(value).encode('utf-8')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """使用 ``dumps`` 的 Flask JSON provider"""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return dumps(obj).decode('utf-8')
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        return json_response(self._prepare_response_obj(args, kwargs))
+
+
+def json_response(payload: Any = None, status: int = 200, body: Optional[bytes] = None) -> Response:
+    """构造JSON响应
+
+    Args:
+        payload: 响应数据
+        status: HTTP状态码
+        body: 已序列化的响应体，传入时不再序列化payload
+    """
+    if body is None:
+        started = time.perf_counter()
+        body = dumps(payload)
+        record_serialization(time.perf_counter() - started)
+    return current_app.response_class(body, status=status, mimetype=JSON_MIMETYPE)
+
+
+class SerializedCache:
+    """按 (资源, 版本) 缓存序列化后的字节，LRU淘汰
+
+    版本号由调用方提供(如已发布规则的版本号)，资源变化后版本号随之变化，旧条目自然不再命中。
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._items: 'OrderedDict[Hashable, bytes]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, resource: Hashable, version: Hashable, build: Callable[[], Any]) -> bytes:
+        """获取序列化后的字节，未命中时调用build取得数据并序列化"""
+        key = (resource, version)
+        with self._lock:
+            body = self._items.get(key)
+            if body is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return body
+            self.misses += 1
+
+        data = build()
+        started = time.perf_counter()
+        body = dumps(data)
+        record_serialization(time.perf_counter() - started)
+        with self._lock:
+            self._items[key] = body
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+        return body
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'size': len(self._items), 'hits': self.hits, 'misses': self.misses}
+
+
+def splice(document: Dict[str, Any], fragments: Dict[str, bytes]) -> bytes:
+    """序列化document，并把其中的占位字符串替换为已序列化的片段(如缓存的大数组)"""
+    body = dumps(document)
+    for placeholder, fragment in fragments.items():
+        marker = dumps(placeholder)
+        start = body.index(marker)
+        body = body[:start] + fragment + body[start + len(marker):]
+    return body
+
+
+def _array_chunks(items: Iterable[Any], chunk_size: int):
+    """按块序列化数组内容(含方括号)"""
+    yield b'['
+    first = True
+    chunk = []
+    for item in items:
+        chunk.append(dumps(item))
+        if len(chunk) >= chunk_size:
+            yield (b'' if first else b',') + b','.join(chunk)
+            first = False
+            chunk = []
+    if chunk:
+        yield (b'' if first else b',') + b','.join(chunk)
+    yield b']'
+
+
+def stream_json(document: Dict[str, Any], arrays: Dict[str, Iterable[Any]],
+                chunk_size: int = STREAM_CHUNK_SIZE, status: int = 200) -> Response:
+    """流式输出包含大数组的JSON文档
+
+    document 中数组的位置用占位字符串表示，arrays 按占位字符串给出对应的可迭代对象，
+    数组元素在迭代时才序列化输出，例如::
+
+        stream_json(
+            {'code': 200, 'data': {'questions': '@questions'}, 'message': 'success'},
+            {'@questions': (row._asdict() for row in query.yield_per(1000))}
+        )
+
+    可迭代对象在响应输出期间执行，可以使用数据库会话。
+    """
+    skeleton = dumps(document)
+    positions = sorted((skeleton.index(dumps(placeholder)), placeholder) for placeholder in arrays)
+
+    def generate():
+        offset = 0
+        for start, placeholder in positions:
+            yield skeleton[offset:start]
+            yield from _array_chunks(arrays[placeholder], chunk_size)
+            offset = start + len(dumps(placeholder))
+        yield skeleton[offset:]
+
+    return current_app.response_class(stream_with_context(generate()), status=status, mimetype=JSON_MIMETYPE)
@@ -1,5 +1,8 @@
 from flask import Blueprint, request, jsonify
 from app.models.business.channel import Channel
+from app.services.business.channel import ChannelService
+from app.utils.pagination import parse_count_mode
+from app.utils.conditional import add_etag, conditional
 from app import db
 from app.utils.logging import get_logger
 from app.decorators import login_required
@@ -8,25 +11,31 @@ import logging
 logger = get_logger(__name__)
 
 bp = Blueprint('channel', __name__, url_prefix='/api/v1/business/channels')
+bp.after_request(add_etag)
 
 @bp.route('/', methods=['GET'])
 @login_required
+@conditional(Channel)
 def list_channels():
     """获取渠道列表"""
     page = request.args.get('page', 1, type=int)
     page_size = request.args.get('pageSize', 10, type=int)
+    cursor = request.args.get('cursor')
     
-    # 计算分页
-    pagination = Channel.query.paginate(page=page, per_page=page_size, error_out=False)
+    # 计算分页，传入cursor时按 (created_at, id) 游标分页
+    try:
+        pagination = ChannelService.get_channel_list(
+            page=page,
+            page_size=page_size,
+            cursor=cursor,
+            count=parse_count_mode(request.args.get('count'))
+        )
+    except ValueError as e:
+        return jsonify({"code": 400, "message": str(e)}), 400
     
     return jsonify({
         "code": 200,
-        "data": {
-            "list": [channel.to_dict() for channel in pagination.items],
-            "total": pagination.total,
-            "page": page,
-            "pageSize": page_size
-        },
+        "data": pagination.to_dict([channel.to_dict() for channel in pagination.items]),
         "message": "success"
     })
 
@@ -54,6 +63,7 @@ def create_channel():
 
 @bp.route('/<int:id>', methods=['GET'])
 @login_required
+@conditional(Channel)
 def get_channel(id):
     """获取特定渠道"""
     channel = Channel.query.get_or_404(id)
@@ -3,15 +3,19 @@ from app.models import InsuranceCompany
 from app import db
 from app.utils.logging import get_logger
 from app.decorators import login_required
+from app.utils.pagination import paginate, parse_count_mode
+from app.utils.conditional import add_etag, conditional
 import logging
 import traceback
 
 logger = get_logger(__name__)
 
 bp = Blueprint('company', __name__, url_prefix='/api/v1/business/companies')
+bp.after_request(add_etag)
 
 @bp.route('', methods=['GET'])
 @login_required
+@conditional(InsuranceCompany)
 def list_companies():
     """获取保司列表"""
     try:
@@ -19,26 +23,28 @@ def list_companies():
         page_size = request.args.get('pageSize', 10, type=int)
         name = request.args.get('name', '')
         code = request.args.get('code', '')
+        cursor = request.args.get('cursor')
+        try:
+            count = parse_count_mode(request.args.get('count'))
+        except ValueError as e:
+            return jsonify({"code": 400, "message": str(e)}), 400
         
-        # 构建查询
+        # 计算分页，传入cursor时按 (created_at, id) 游标分页
         query = InsuranceCompany.query
         if name:
             query = query.filter(InsuranceCompany.name.like(f'%{name}%'))
         if code:
             query = query.filter(InsuranceCompany.code.like(f'%{code}%'))
-            
-        # 计算分页
-        pagination = query.paginate(page=page, per_page=page_size, error_out=False)
+        try:
+            pagination = paginate(query, InsuranceCompany.created_at, InsuranceCompany.id, page_size,
+                                  cursor=cursor, page=page, count=count)
+        except ValueError as e:
+            return jsonify({"code": 400, "message": str(e)}), 400
         
-        logger.info(f'获取保司列表成功: 页码={page}, 每页条数={page_size}, 总条数={pagination.total}')
+        logger.info(f'获取保司列表成功: 页码={page}, 每页条数={page_size}, 总条数={pagination.total}, nextCursor={pagination.next_cursor}')
         return jsonify({
             "code": 200,
-            "data": {
-                "list": [company.to_dict() for company in pagination.items],
-                "total": pagination.total,
-                "page": page,
-                "pageSize": page_size
-            },
+            "data": pagination.to_dict([company.to_dict() for company in pagination.items]),
             "message": "success"
         })
     except Exception as e:
@@ -95,6 +101,7 @@ def create_company():
 
 @bp.route('/<int:id>', methods=['GET'])
 @login_required
+@conditional(InsuranceCompany)
 def get_company(id):
     """获取特定保司"""
     try:
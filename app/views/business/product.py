@@ -4,13 +4,18 @@ from app.models.business.product.product import Product
 from sqlalchemy import or_
 from app import db
 from app.utils.logging import get_logger
+from app.utils.pagination import parse_count_mode
+from app.utils.conditional import add_etag, conditional
+from app.services.business.product import PRODUCT_MODELS, ProductService
 
 logger = get_logger(__name__)
 
 bp = Blueprint('product', __name__, url_prefix='/api/v1/business/products')
+bp.after_request(add_etag)
 
 @bp.route('/', methods=['GET'])
 @login_required
+@conditional(*PRODUCT_MODELS)
 def get_products():
     """获取产品列表
     
@@ -20,6 +25,8 @@ def get_products():
     - code: 产品编码，模糊匹配
     - channel: 渠道筛选
     - status: 状态筛选
+    - cursor: 游标分页，第一页传空字符串，之后传返回的nextCursor
+    - count: 总数计算方式 exact/estimate/none，默认exact
     """
     try:
         # 获取查询参数
@@ -28,73 +35,32 @@ def get_products():
         code = request.args.get('code', '')
         channel = request.args.get('channel', '')
         status = request.args.get('status', '')
+        cursor = request.args.get('cursor')
+        try:
+            count = parse_count_mode(request.args.get('count'))
+        except ValueError as e:
+            return jsonify({'code': 400, 'message': str(e)}), 400
         
-        logger.info(f'获取产品列表, 参数: page={page}, pageSize={page_size}, code={code}, channel={channel}, status={status}')
+        logger.info(f'获取产品列表, 参数: page={page}, pageSize={page_size}, code={code}, channel={channel}, status={status}, cursor={cursor}, count={count}')
         
-        # 构建查询
-        query = Product.query\
-            .outerjoin(Product.channel)\
-            .outerjoin(Product.product_type)\
-            .outerjoin(Product.insurance_company)\
-            .outerjoin(Product.ai_parameter)
-        if code:
-            query = query.filter(Product.product_code.like(f'%{code}%'))
-        if channel:
-            query = query.filter(Product.channel_id == channel)
-        if status:
-            query = query.filter(Product.status == status)
-            
-        # 执行分页查询
-        pagination = query.paginate(
-            page=page,
-            per_page=page_size,
-            error_out=False
-        )
+        # 执行分页查询，关联数据连接加载
+        try:
+            pagination = ProductService.get_product_list(
+                page=page, page_size=page_size, code=code, channel=channel,
+                status=status, cursor=cursor, count=count
+            )
+        except ValueError as e:
+            return jsonify({'code': 400, 'message': str(e)}), 400
         
         # 转换数据
-        products = [{
-            'id': p.id,
-            'name': p.name,
-            'code': p.product_code,
-            'productType': {
-                'id': p.product_type.id,
-                'name': p.product_type.name,
-                'code': p.product_type.code
-            } if p.product_type else None,
-            'insuranceCompany': {
-                'id': p.insurance_company.id,
-                'name': p.insurance_company.name,
-                'code': p.insurance_company.code
-            } if p.insurance_company else None,
-            'channel': {
-                'id': p.channel.id,
-                'name': p.channel.name,
-                'code': p.channel.code
-            } if p.channel else None,
-            'aiParameter': {
-                'id': p.ai_parameter.id,
-                'name': p.ai_parameter.name,
-                'rule': {
-                    'id': p.ai_parameter.rule.id,
-                    'name': p.ai_parameter.rule.name
-                } if hasattr(p.ai_parameter, 'rule') and p.ai_parameter.rule else None
-            } if p.ai_parameter else None,
-            'status': p.status,
-            'createdAt': p.created_at_str,
-            'updatedAt': p.updated_at_str
-        } for p in pagination.items]
+        products = [p.to_dict() for p in pagination.items]
         
         logger.info(f'获取产品列表成功, 总数: {pagination.total}')
         
         return jsonify({
             'code': 200,
             'message': 'success',
-            'data': {
-                'list': products,
-                'total': pagination.total,
-                'page': page,
-                'pageSize': page_size
-            }
+            'data': pagination.to_dict(products)
         })
     except Exception as e:
         logger.error(f'获取产品列表失败: {str(e)}')
@@ -6,6 +6,8 @@ from app.models.base.enums import StatusEnum
 from app.extensions import db
 from app.models.rules.disease.disease import Disease
 from app.models.rules.disease.disease_category import DiseaseCategory
+from app.services.underwriting.reference_cache import invalidate_reference_data
+from app.services.underwriting.rule_graph import invalidate_rule_graph
 from sqlalchemy import or_
 
 @bp.route('/diseases')
@@ -90,6 +92,8 @@ def disease_create_api():
         
         db.session.add(disease)
         db.session.commit()
+        invalidate_rule_graph(disease.rule_id)
+        invalidate_reference_data('disease_create')
         
         return jsonify({
             'status': 'success',
@@ -121,7 +125,8 @@ def disease_update(id):
         if not data.get('risk_level'):
             return jsonify({'status': 'error', 'message': '风险等级不能为空'})
             
-        # 更新数据
+        # 更新数据(疾病可能移到其他规则，原规则的规则图也需要失效)
+        previous_rule_id = disease.rule_id
         disease.name = data['name']
         disease.category_id = data['category_id']
         disease.rule_id = data['rule_id']
@@ -137,6 +142,9 @@ def disease_update(id):
             })
         
         db.session.commit()
+        for rule_id in {previous_rule_id, disease.rule_id}:
+            invalidate_rule_graph(rule_id)
+        invalidate_reference_data('disease_update')
         
         return jsonify({
             'status': 'success',
@@ -156,8 +164,11 @@ def disease_delete(id):
     """删除疾病"""
     try:
         disease = Disease.query.get_or_404(id)
+        rule_id = disease.rule_id
         db.session.delete(disease)
         db.session.commit()
+        invalidate_rule_graph(rule_id)
+        invalidate_reference_data('disease_delete')
         
         return jsonify({
             'status': 'success',
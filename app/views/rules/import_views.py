@@ -4,7 +4,7 @@ from datetime import datetime
 from flask import Blueprint, request, jsonify, current_app, render_template
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
-from app.services.underwriting.rule_import_service import RuleImportService
+from app.services.underwriting.import_jobs import start_underwriting_import, get_job_status
 from app.models.rules.import_record import ImportRecord
 from app.models.rules.import_detail import ImportDetail
 import logging
@@ -117,90 +117,25 @@ def import_template(import_type):
         if import_type == 'underwriting':
             logger.info("=== 使用核保规则导入器 ===")
             logger.info(f"当前用户ID: {current_user.id}")
-            importer = RuleImportService(current_user)
+            record = start_underwriting_import(
+                file_path,
+                original_filename,
+                current_user=current_user
+            )
+            # 文件由后台任务处理完成后清理
+            file_path = None
             
-            try:
-                # 创建导入记录
-                logger.info("创建导入记录...")
-                importer.create_import_record(original_filename)  # 使用原始文件名
-                logger.info(f"导入记录创建成功，批次号: {importer.batch_no}")
-                
-                # 处理导入
-                logger.info("=== 开始处理导入 ===")
-                logger.info("验证文件...")
-                importer.validate_file(file_path)
-                logger.info("文件验证通过")
-                
-                logger.info("读取Excel文件...")
-                workbook = importer.read_excel(file_path)
-                logger.info(f"Excel读取成功，包含以下sheet: {workbook.sheet_names}")
-                
-                logger.info("验证sheet...")
-                importer.validate_sheets(workbook)
-                logger.info("sheet验证通过")
-                
-                # 处理各个sheet
-                logger.info("=== 开始处理疾病表 ===")
-                diseases_df = importer.read_sheet(workbook, '疾病')
-                logger.info(f"疾病表数据行数: {len(diseases_df)}")
-                importer.process_diseases(diseases_df)
-                logger.info("疾病表处理完成")
-                
-                logger.info("=== 开始处理问题表 ===")
-                questions_df = importer.read_sheet(workbook, '问题')
-                logger.info(f"问题表数据行数: {len(questions_df)}")
-                importer.process_questions(questions_df)
-                logger.info("问题表处理完成")
-                
-                logger.info("=== 开始处理答案表 ===")
-                answers_df = importer.read_sheet(workbook, '结论')
-                logger.info(f"答案表数据行数: {len(answers_df)}")
-                importer.process_answers(answers_df)
-                logger.info("答案表处理完成")
-                
-                # 提交事务
-                logger.info("提交数据库事务...")
-                db.session.commit()
-                logger.info("数据库事务提交成功")
-                
-                end_time = datetime.now()
-                duration = (end_time - start_time).total_seconds()
-                logger.info(f"=== 导入完成 ===")
-                logger.info(f"总耗时: {duration}秒")
-                logger.info(f"批次号: {importer.batch_no}")
-                logger.info(f"总记录数: {importer.import_record.total_count}")
-                logger.info(f"成功数: {importer.import_record.success_count}")
-                logger.info(f"失败数: {importer.import_record.error_count}")
-                
-                return jsonify({
-                    'code': 0,
-                    'message': '导入成功',
-                    'data': {
-                        'batch_no': importer.batch_no,
-                        'total': importer.import_record.total_count,
-                        'success': importer.import_record.success_count,
-                        'error': importer.import_record.error_count,
-                        'duration': duration
-                    }
-                })
-            except Exception as e:
-                logger.error("=== 导入处理失败 ===")
-                logger.error(f"错误类型: {type(e).__name__}")
-                logger.error(f"错误信息: {str(e)}")
-                logger.error("详细堆栈:")
-                logger.error(traceback.format_exc())
-                
-                if db.session:
-                    logger.info("回滚数据库事务...")
-                    db.session.rollback()
-                    logger.info("数据库事务已回滚")
-                
-                return jsonify({
-                    'code': 1,
-                    'message': f'导入处理失败：{str(e)}',
-                    'error_type': type(e).__name__,
-                    'stack_trace': traceback.format_exc()
-                })
+            duration = (datetime.now() - start_time).total_seconds()
+            logger.info(f"导入任务已提交，批次号: {record.batch_no}，耗时: {duration}秒")
+            
+            return jsonify({
+                'code': 0,
+                'message': '导入任务已提交',
+                'data': {
+                    'batch_no': record.batch_no,
+                    'status': record.status
+                }
+            })
         else:
             logger.error(f"不支持的导入类型：{import_type}")
             return jsonify({
@@ -263,6 +198,30 @@ def get_import_records():
             'message': str(e)
         })
 
+@bp.route('/import/records/<batch_no>/progress')
+@login_required
+def get_import_progress(batch_no):
+    """获取导入任务进度"""
+    try:
+        status = get_job_status(batch_no)
+        if status is None:
+            return jsonify({
+                'code': 1,
+                'message': '导入记录不存在'
+            })
+        return jsonify({
+            'code': 0,
+            'message': 'success',
+            'data': status
+        })
+    except Exception as e:
+        logger.error(f"获取导入进度失败: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({
+            'code': 1,
+            'message': str(e)
+        })
+
 @bp.route('/import/records/<batch_no>/details')
 @login_required
 def get_import_details(batch_no):
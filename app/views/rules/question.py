@@ -6,6 +6,7 @@ from app.models.base.enums import StatusEnum
 from app.extensions import db
 from app.models.rules.question.question import Question
 from app.models.rules.question.question_type import QuestionType
+from app.services.underwriting.rule_graph import invalidate_rule_graph
 from sqlalchemy import or_
 
 @bp.route('/questions')
@@ -89,6 +90,7 @@ def question_create_api():
         
         db.session.add(question)
         db.session.commit()
+        invalidate_rule_graph(question.rule_id)
         
         return jsonify({
             'status': 'success',
@@ -118,7 +120,8 @@ def question_update(id):
         if not data.get('rule_id'):
             return jsonify({'status': 'error', 'message': '所属规则不能为空'})
             
-        # 更新数据
+        # 更新数据(问题可能移到其他规则，原规则的规则图也需要失效)
+        previous_rule_id = question.rule_id
         question.content = data['content']
         question.type_id = data['type_id']
         question.rule_id = data['rule_id']
@@ -135,6 +138,8 @@ def question_update(id):
             })
         
         db.session.commit()
+        for rule_id in {previous_rule_id, question.rule_id}:
+            invalidate_rule_graph(rule_id)
         
         return jsonify({
             'status': 'success',
@@ -154,8 +159,10 @@ def question_delete(id):
     """删除问题"""
     try:
         question = Question.query.get_or_404(id)
+        rule_id = question.rule_id
         db.session.delete(question)
         db.session.commit()
+        invalidate_rule_graph(rule_id)
         
         return jsonify({
             'status': 'success',
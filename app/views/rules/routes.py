@@ -8,6 +8,7 @@ from app.extensions import db
 from flask_login import login_required
 from app.models.rules.disease.disease_category import DiseaseCategory
 from app.models.rules.disease.disease import Disease
+from app.services.underwriting.rule_graph import invalidate_rule_graph
 
 # 导入视图模块
 from . import underwriting
@@ -412,6 +413,8 @@ def update_disease(id):
             
         # 保存数据
         db.session.commit()
+        if disease.rule_id:
+            invalidate_rule_graph(disease.rule_id)
         
         return jsonify({
             'code': 0,
@@ -437,8 +440,11 @@ def delete_disease(id):
             })
             
         # 删除数据
+        rule_id = disease.rule_id
         db.session.delete(disease)
         db.session.commit()
+        if rule_id:
+            invalidate_rule_graph(rule_id)
         
         return jsonify({
             'code': 0,
@@ -10,6 +10,7 @@ import os
 import uuid
 from datetime import datetime
 from app.services.underwriting.rule_import_service import RuleImportService
+from app.services.underwriting.rule_graph import invalidate_rule_graph
 from app.models.rules.disease.disease import Disease
 from app.models.rules.question.question import Question
 from app.models.rules.answer.answer_option import AnswerOption
@@ -252,6 +253,7 @@ def underwriting_update(id):
             })
         
         db.session.commit()
+        invalidate_rule_graph(id)
         
         return jsonify({
             'status': 'success',
@@ -273,6 +275,7 @@ def underwriting_delete(id):
         rule = UnderwritingRule.query.get_or_404(id)
         db.session.delete(rule)
         db.session.commit()
+        invalidate_rule_graph(id)
         
         return jsonify({
             'status': 'success',
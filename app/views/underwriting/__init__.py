@@ -1,3 +1,4 @@
 from .routes import bp
+from . import sessions  # noqa: F401  问卷会话接口注册在同一蓝图上
 
-__all__ = ['bp'] 
\ No newline at end of file
+__all__ = ['bp'] 
@@ -4,10 +4,19 @@ from app.models.rules.ai.ai_parameter import AIParameter
 from app.models.rules.ai.ai_parameter_type import AIParameterType
 from app.models.rules.core.underwriting_rule import UnderwritingRule
 from app.decorators import login_required
+from app.utils.pagination import paginate, parse_count_mode
+from sqlalchemy.orm import joinedload
 import logging
 
 logger = logging.getLogger(__name__)
 
+def with_relations(query):
+    """``to_dict`` 用到的参数类型和规则在同一条SQL中连接加载，避免每行两次延迟加载查询"""
+    return query.options(
+        joinedload(AIParameter.parameter_type),
+        joinedload(AIParameter.rule)
+    )
+
 bp = Blueprint('ai_parameter', __name__, url_prefix='/api/v1/underwriting/ai-parameter')
 
 @bp.route('/test', methods=['GET'])
@@ -50,8 +59,13 @@ def get_public_parameters():
         rule_id = request.args.get('rule_id')
         page = request.args.get('page', 1, type=int)
         page_size = request.args.get('pageSize', 10, type=int)
+        cursor = request.args.get('cursor')
+        try:
+            count = parse_count_mode(request.args.get('count'))
+        except ValueError as e:
+            return jsonify({'code': 400, 'message': str(e)}), 400
         
-        logger.info(f'公开接口 - 获取智核参数列表, 参数: name={name}, type_id={parameter_type_id}, rule_id={rule_id}, page={page}, page_size={page_size}')
+        logger.info(f'公开接口 - 获取智核参数列表, 参数: name={name}, type_id={parameter_type_id}, rule_id={rule_id}, page={page}, page_size={page_size}, cursor={cursor}, count={count}')
         
         # 构建查询
         query = AIParameter.query
@@ -62,20 +76,19 @@ def get_public_parameters():
         if rule_id:
             query = query.filter(AIParameter.rule_id == rule_id)
         
-        # 分页查询
-        pagination = query.order_by(AIParameter.created_at.desc()).paginate(page=page, per_page=page_size, error_out=False)
+        # 分页查询，传入cursor时按 (created_at, id) 游标分页
+        try:
+            result = paginate(with_relations(query), AIParameter.created_at, AIParameter.id, page_size,
+                              cursor=cursor, page=page, count=count, count_query=query)
+        except ValueError as e:
+            return jsonify({'code': 400, 'message': str(e)}), 400
         
         response_data = {
             'code': 200,
             'message': 'success',
-            'data': {
-                'list': [item.to_dict() for item in pagination.items],
-                'total': pagination.total,
-                'page': pagination.page,
-                'pageSize': page_size
-            }
+            'data': result.to_dict([item.to_dict() for item in result.items])
         }
-        logger.info(f'公开接口 - 获取智核参数列表成功: total={pagination.total}')
+        logger.info(f'公开接口 - 获取智核参数列表成功: total={result.total}')
         return jsonify(response_data)
     except Exception as e:
         logger.error(f'公开接口 - 获取智核参数列表失败: {str(e)}')
@@ -100,16 +113,13 @@ def get_parameters():
         rule_id = request.args.get('rule_id')
         page = request.args.get('page', 1, type=int)
         page_size = request.args.get('pageSize', 10, type=int)
+        cursor = request.args.get('cursor')
+        try:
+            count = parse_count_mode(request.args.get('count'))
+        except ValueError as e:
+            return jsonify({'code': 400, 'message': str(e)}), 400
         
-        logger.info(f'查询参数: name={name}, type_id={parameter_type_id}, rule_id={rule_id}, page={page}, page_size={page_size}')
-        
-        # 先检查参数类型表中的数据
-        type_count = AIParameterType.query.count()
-        logger.info(f'参数类型表中的记录数: {type_count}')
-        
-        # 检查参数表中的数据
-        param_count = AIParameter.query.count()
-        logger.info(f'参数表中的记录数: {param_count}')
+        logger.info(f'查询参数: name={name}, type_id={parameter_type_id}, rule_id={rule_id}, page={page}, page_size={page_size}, cursor={cursor}, count={count}')
         
         # 构建查询
         query = AIParameter.query
@@ -121,30 +131,26 @@ def get_parameters():
             query = query.filter(AIParameter.rule_id == rule_id)
         
         # 添加SQL日志
-        logger.info(f'SQL查询: {query}')
+        logger.debug('SQL查询: %s', query)
         
-        # 分页查询
-        pagination = query.order_by(AIParameter.created_at.desc()).paginate(
-            page=page, per_page=page_size, error_out=False)
+        # 分页查询，传入cursor时按 (created_at, id) 游标分页
+        try:
+            pagination = paginate(with_relations(query), AIParameter.created_at, AIParameter.id, page_size,
+                                  cursor=cursor, page=page, count=count, count_query=query)
+        except ValueError as e:
+            return jsonify({'code': 400, 'message': str(e)}), 400
         
-        logger.info(f'查询结果: 总数={pagination.total}, 当前页={pagination.page}, 每页条数={page_size}')
+        logger.info(f'查询结果: 总数={pagination.total}, 当前页={pagination.page}, 每页条数={page_size}, nextCursor={pagination.next_cursor}')
         
-        # 记录每条数据的详细信息
-        for item in pagination.items:
-            logger.info(f'参数数据: id={item.id}, name={item.name}, '
-                       f'type_id={item.parameter_type_id}, rule_id={item.rule_id}, '
-                       f'type_name={item.parameter_type.name if item.parameter_type else "None"}, '
-                       f'rule_name={item.rule.name if item.rule else "None"}')
+        items = [item.to_dict() for item in pagination.items]
+        if logger.isEnabledFor(logging.DEBUG):
+            for item in items:
+                logger.debug('参数数据: %s', item)
         
         return jsonify({
             'code': 200,
             'message': 'success',
-            'data': {
-                'list': [item.to_dict() for item in pagination.items],
-                'total': pagination.total,
-                'page': pagination.page,
-                'pageSize': page_size
-            }
+            'data': pagination.to_dict(items)
         })
     except Exception as e:
         logger.error(f'获取参数列表失败: {str(e)}')
@@ -197,7 +203,7 @@ def get_parameter_types():
 @login_required
 def get_parameter(id):
     """获取智核参数详情"""
-    parameter = AIParameter.query.get_or_404(id)
+    parameter = with_relations(AIParameter.query).filter(AIParameter.id == id).first_or_404()
     return jsonify({
         'code': 200,
         'message': 'success',
@@ -1,4 +1,8 @@
-from flask import Blueprint, request, jsonify
+import os
+import tempfile
+from collections import Counter
+from io import BytesIO
+from flask import Blueprint, request, jsonify, current_app, send_file
 from app.models.rules import (
     UnderwritingRule,
     Disease,
@@ -6,16 +10,56 @@ from app.models.rules import (
     Question,
     Conclusion as Answer
 )
+from app.models.rules.ai.ai_parameter import AIParameter
+from app.models.rules.core.rule_version import RuleVersion
+from app.models.business.product.product import Product
 from app import db
+from app.services.underwriting.rule_graph import get_rule_graph, invalidate_rule_graph, evaluate_batch, applicant_error
+from app.services.underwriting.rule_publish_service import RulePublishService
+from app.services.underwriting.merged_plan import get_plan, plan_signature
+from app.services.underwriting.outcome_table import coverage
+from app.services.underwriting_rule_service import UnderwritingRuleService
+from app.services.underwriting.import_jobs import start_workbook_import, get_job_status
+from app.services.underwriting.rule_validator import validate_rule
+from app.services.underwriting.reference_cache import (
+    CATALOG_ALL_CATEGORIES,
+    CATALOG_ALL_DISEASES,
+    CATALOG_DISEASE_CATEGORIES,
+    CATALOG_DISEASES,
+    invalidate_reference_data,
+    load_all_categories,
+    load_all_diseases,
+    load_disease_categories,
+    load_diseases,
+    reference_cache
+)
 from app.utils.logging import get_logger
+from app.utils.pagination import COUNT_EXACT, COUNT_NONE, parse_count_mode
+from app.utils.conditional import add_etag, compute_etag, conditional, not_modified, set_validators
+from app.utils.serialization import SerializedCache, json_response, splice, stream_json
 
 logger = get_logger(__name__)
 
 bp = Blueprint('underwriting', __name__, url_prefix='/api/v1/underwriting')
+bp.after_request(add_etag)
+
+# 规则图中与请求无关的大数组(如全部答案)序列化后的缓存，按规则图版本区分
+graph_fragments = SerializedCache(max_size=64)
+
+# 规则导出时每批读取的行数
+EXPORT_BATCH_SIZE = 1000
 
 @bp.route('/rules', methods=['GET'])
 def get_rules():
-    """获取规则列表"""
+    """获取规则列表
+
+    查询参数:
+        page/pageSize: 页码分页(默认)
+        cursor: 游标分页，第一页传空字符串，之后传返回的nextCursor
+        count: 总数计算方式 exact/estimate/none；页码分页默认exact，游标分页默认none
+        withTotal: 游标分页时是否返回精确总数(等同count=exact)
+        simple: 简单模式，不返回疾病和结论明细
+    """
     try:
         # 获取查询参数
         name = request.args.get('name', '')
@@ -23,70 +67,44 @@ def get_rules():
         disease_category = request.args.get('diseaseCategory', '')
         page = request.args.get('page', 1, type=int)
         page_size = request.args.get('pageSize', 10, type=int)
+        cursor = request.args.get('cursor')
+        with_total = request.args.get('withTotal', 'false').lower() == 'true'
+        default_count = COUNT_EXACT if cursor is None or with_total else COUNT_NONE
         simple = request.args.get('simple', 'false').lower() == 'true'
         
-        logger.info(f'[请求参数] name={name}, status={status}, disease_category={disease_category}, page={page}, page_size={page_size}, simple={simple}')
-        
-        # 构建查询
-        query = UnderwritingRule.query
-        
-        # 记录原始SQL
-        logger.info(f'[原始SQL] {query.statement.compile(compile_kwargs={"literal_binds": True})}')
-        
-        # 应用过滤条件
-        if name:
-            query = query.filter(UnderwritingRule.name.like(f'%{name}%'))
-            logger.info(f'[添加名称过滤] name LIKE %{name}%')
-        if status:
-            query = query.filter(UnderwritingRule.status == status)
-            logger.info(f'[添加状态过滤] status = {status}')
-            
-        # 记录最终SQL
-        logger.info(f'[最终SQL] {query.statement.compile(compile_kwargs={"literal_binds": True})}')
-        
-        # 执行分页查询
-        pagination = query.order_by(UnderwritingRule.created_at.desc()).paginate(
-            page=page, per_page=page_size, error_out=False)
-            
-        logger.info(f'[分页结果] 总数={pagination.total}, 当前页={pagination.page}, 每页条数={page_size}')
-        
-        # 转换数据
-        rules = []
-        for rule in pagination.items:
-            # 记录原始数据
-            logger.info(f'[处理数据] 原始: id={rule.id}, name={rule.name}, version={rule.version}, status={rule.status}')
-            
-            # 使用 to_dict() 方法获取完整数据
-            rule_dict = rule.to_dict()
-            
-            # 如果是简单模式，只保留必要字段
-            if simple:
-                rule_dict = {
-                    'id': f'R{str(rule.id).zfill(3)}',
-                    'name': rule_dict['name'],
-                    'version': rule_dict['version'],
-                    'status': rule_dict['status'],
-                    'has_data': rule_dict['has_data'],
-                    'created_at': rule_dict['created_at'],
-                    'updated_at': rule_dict['updated_at']
-                }
-            
-            rules.append(rule_dict)
-            # 记录转换后的数据
-            logger.info(f'[处理数据] 转换后: {rule_dict}')
+        logger.info(f'[请求参数] name={name}, status={status}, disease_category={disease_category}, page={page}, page_size={page_size}, cursor={cursor}, simple={simple}')
         
-        response_data = {
+        try:
+            data = UnderwritingRuleService.list_rule_summaries(
+                name=name,
+                status=status,
+                page_size=page_size,
+                cursor=cursor,
+                page=page,
+                count=parse_count_mode(request.args.get('count'), default_count),
+                detail=not simple
+            )
+        except ValueError as e:
+            return jsonify({'code': 400, 'message': str(e)}), 400
+        
+        # 简单模式只保留必要字段
+        if simple:
+            data['list'] = [{
+                'id': f'R{str(rule["id"]).zfill(3)}',
+                'name': rule['name'],
+                'version': rule['version'],
+                'status': rule['status'],
+                'has_data': rule['has_data'],
+                'created_at': rule['created_at'],
+                'updated_at': rule['updated_at']
+            } for rule in data['list']]
+        
+        logger.info(f'[分页结果] 当前页条数={len(data["list"])}, 总数={data.get("total")}, nextCursor={data.get("nextCursor")}')
+        return jsonify({
             'code': 200,
             'message': 'success',
-            'data': {
-                'list': rules,
-                'total': pagination.total,
-                'page': pagination.page,
-                'pageSize': page_size
-            }
-        }
-        logger.info(f'[响应数据] {response_data}')
-        return jsonify(response_data)
+            'data': data
+        })
         
     except Exception as e:
         logger.error(f'获取规则列表失败: {str(e)}', exc_info=True)
@@ -96,6 +114,7 @@ def get_rules():
         })
 
 @bp.route('/rules/<string:id>', methods=['GET'])
+@conditional(UnderwritingRule, Question)
 def get_rule(id):
     """获取规则详情"""
     try:
@@ -139,35 +158,12 @@ def get_rule(id):
 
 @bp.route('/diseases', methods=['GET'])
 def get_diseases():
-    """获取疾病列表"""
+    """获取疾病列表(参考数据缓存)"""
     try:
-        logger.info("[API] 开始获取疾病列表")
-        logger.debug(f"[请求] 请求参数: {request.args}")
-        
-        diseases = Disease.query.all()
-        logger.info(f"[查询] 查询到疾病总数: {len(diseases)}")
-        
-        disease_list = []
-        for disease in diseases:
-            disease_dict = {
-                'code': disease.code,
-                'name': disease.name,
-                'category_name': disease.category_name,
-                'first_question_code': disease.first_question_code
-            }
-            disease_list.append(disease_dict)
-            logger.debug(f"[数据] 处理疾病数据: code={disease.code}, name={disease.name}")
-            
-        logger.debug(f"[响应] 返回疾病列表数量: {len(disease_list)}")
-        return jsonify({
-            "code": 200,
-            "data": disease_list,
-            "message": "success"
-        })
+        return reference_cache.response(CATALOG_DISEASES, load_diseases)
     except Exception as e:
         error_msg = f"获取疾病列表失败: {str(e)}"
         logger.error(f"[错误] {error_msg}", exc_info=True)
-        logger.error(f"[堆栈] 详细错误信息:", stack_info=True)
         return jsonify({
             "code": 500,
             "message": error_msg
@@ -179,53 +175,61 @@ def get_disease_questions(disease_code):
     try:
         logger.info(f"[API] 开始获取疾病问题, 疾病代码: {disease_code}")
         
-        # 1. 获取疾病信息
-        disease = Disease.query.filter_by(code=disease_code).first_or_404()
-        logger.debug(f"[查询] 查询到疾病信息: code={disease.code}, name={disease.name}")
-        
-        # 2. 获取关联的问题
-        question = Question.query.filter_by(code=disease.first_question_code).first_or_404()
-        logger.debug(f"[查询] 查询到问题信息: code={question.code}, content={question.content}")
-        
-        # 3. 获取问题对应的规则
-        rule = question.rule
-        logger.debug(f"[查询] 关联的规则信息: id={rule.id}, name={rule.name}")
-        
-        # 4. 获取规则下的结论选项
-        conclusions = Answer.query.filter_by(rule_id=rule.id).all()
-        logger.debug(f"[查询] 查询到结论选项数量: {len(conclusions)}")
-        
-        # 5. 构建返回数据
+        # 1. 定位疾病所属规则(列投影)，其余数据从内存中的规则图读取
+        row = db.session.query(Disease.rule_id, Disease.first_question_code) \
+            .filter(Disease.code == disease_code).first()
+        if row is None:
+            return jsonify({"code": 404, "message": "疾病不存在"}), 404
+        rule_id = row.rule_id
+        if rule_id is None:
+            # 未直接关联规则的疾病，通过第一个问题所属规则定位
+            rule_id = db.session.query(Question.rule_id) \
+                .filter(Question.code == row.first_question_code).limit(1).scalar()
+        
+        version = request.args.get('version')
+        graph = get_rule_graph(rule_id, version) if rule_id is not None else None
+        disease = graph.disease(disease_code) if graph else None
+        question = graph.first_question(disease_code) if graph else None
+        if not disease or not question:
+            return jsonify({"code": 404, "message": "疾病或问题不存在"}), 404
+        logger.debug(f"[图] 规则图: {graph!r}, 第一个问题: {question.code}")
+        
+        # 已发布的版本不可变，ETag只取决于版本号；当前规则图取决于编译时间
+        etag = compute_etag(request.full_path, graph.rule_id, graph.version if version else graph.stamp)
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
+        
+        # 2. 构建返回数据，全部答案与疾病无关，按规则图版本缓存序列化结果
+        answers = graph_fragments.get(
+            (graph.rule_id, 'answers'), graph.version if version else graph.stamp,
+            lambda: [{
+                'question_code': edge.question_code,
+                'answer_content': edge.answer_content,
+                'medical_conclusion': edge.medical_conclusion,
+                'critical_illness_conclusion': edge.critical_illness_conclusion,
+                'medical_special_code': edge.medical_special_code,
+                'critical_illness_special_code': edge.critical_illness_special_code,
+                'next_question_code': edge.next_question_code,
+                'display_order': edge.display_order
+            } for edge in graph.iter_edges()]
+        )
         question_data = {
             'disease': {
                 'code': disease.code,
                 'name': disease.name,
                 'category_name': disease.category_name
             },
-            'question': {
-                'code': question.code,
-                'content': question.content,
-                'question_type': question.question_type,
-                'attribute': question.attribute
-            },
-            'answers': [{
-                'question_code': conclusion.question_code,
-                'answer_content': conclusion.answer_content,
-                'medical_conclusion': conclusion.medical_conclusion,
-                'critical_illness_conclusion': conclusion.critical_illness_conclusion,
-                'medical_special_code': conclusion.medical_special_code,
-                'critical_illness_special_code': conclusion.critical_illness_special_code,
-                'next_question_code': conclusion.next_question_code,
-                'display_order': conclusion.display_order
-            } for conclusion in conclusions]
+            'question': question.to_dict(with_answers=False),
+            'answers': '@answers'
         }
-        logger.debug(f"[响应] 返回的问题数据: {question_data}")
         
-        return jsonify({
+        body = splice({
             "code": 200,
             "data": question_data,
             "message": "success"
-        })
+        }, {'@answers': answers})
+        return set_validators(json_response(body=body), etag)
     except Exception as e:
         error_msg = f"获取疾病问题失败: {str(e)}"
         logger.error(f"[错误] {error_msg}", exc_info=True)
@@ -235,7 +239,280 @@ def get_disease_questions(disease_code):
             "message": error_msg
         }), 500
 
+@bp.route('/rules/<string:rule_id>/evaluate', methods=['POST'])
+def evaluate_rule(rule_id):
+    """在规则图上评估一组答案
+
+    请求体:
+        {
+            "version": "20261018140352",        # 可选，发布的版本号或latest，为空时使用当前规则数据
+            "diseases": ["D001", ...],           # 可选，为空时评估已作答的疾病
+            "answers": {"Q001": "是", ...}       # 或 [{"question_code": "Q001", "answer_content": "是"}]
+        }
+    """
+    try:
+        numeric_id = normalize_rule_id(rule_id)
+        if not numeric_id:
+            return jsonify({"code": 400, "message": "无效的规则ID"}), 400
+        
+        data = request.get_json(silent=True) or {}
+        graph = get_rule_graph(numeric_id, data.get('version'))
+        if graph is None:
+            return jsonify({"code": 404, "message": "规则或版本不存在"}), 404
+        
+        result = graph.evaluate(data.get('answers'), data.get('diseases'))
+        logger.info(f"[评估] rule_id={numeric_id}, status={result.status}, diseases={len(result.outcomes)}")
+        return jsonify({
+            "code": 200,
+            "data": result.to_dict(),
+            "message": "success"
+        })
+    except Exception as e:
+        error_msg = f"核保评估失败: {str(e)}"
+        logger.error(f"[错误] {error_msg}", exc_info=True)
+        return jsonify({
+            "code": 500,
+            "message": error_msg
+        }), 500
+
+@bp.route('/rules/<string:rule_id>/plan', methods=['GET'])
+def get_merged_plan(rule_id):
+    """多个疾病的合并问卷计划：共享的问题只下发一次，按拓扑顺序排列
+
+    Query参数:
+    - diseases: 疾病编码，逗号分隔
+    - version: 可选，发布的版本号或latest，为空时使用当前规则数据
+    """
+    try:
+        numeric_id = normalize_rule_id(rule_id)
+        if not numeric_id:
+            return jsonify({"code": 400, "message": "无效的规则ID"}), 400
+        signature = plan_signature(code.strip() for code in request.args.get('diseases', '').split(','))
+        if not signature:
+            return jsonify({"code": 400, "message": "请选择疾病"}), 400
+        
+        version = request.args.get('version')
+        graph = get_rule_graph(numeric_id, version)
+        if graph is None:
+            return jsonify({"code": 404, "message": "规则或版本不存在"}), 404
+        
+        # 计划只取决于规则图和疾病集合
+        graph_version = graph.version if version else graph.stamp
+        etag = compute_etag(graph.rule_id, graph_version, signature)
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
+        
+        plan = get_plan(graph, signature)
+        missing = [code for code in signature if code not in plan.entries]
+        data = graph_fragments.get(
+            (graph.rule_id, 'plan', signature), graph_version,
+            lambda: plan.to_dict(graph)
+        )
+        body = splice({
+            "code": 200,
+            "data": '@plan',
+            "message": "success" if not missing else f"以下疾病不存在或未配置问题: {', '.join(missing)}"
+        }, {'@plan': data})
+        return set_validators(json_response(body=body), etag)
+    except Exception as e:
+        error_msg = f"获取合并问卷计划失败: {str(e)}"
+        logger.error(f"[错误] {error_msg}", exc_info=True)
+        return jsonify({
+            "code": 500,
+            "message": error_msg
+        }), 500
+
+@bp.route('/rules/<string:rule_id>/validate', methods=['GET'])
+def validate_rule_graph(rule_id):
+    """校验规则的问卷图：悬空引用、不可达问题、循环引用、缺少结论的终止答案等"""
+    try:
+        numeric_id = normalize_rule_id(rule_id)
+        if not numeric_id:
+            return jsonify({"code": 400, "message": "无效的规则ID"}), 400
+        
+        report = validate_rule(numeric_id)
+        if report is None:
+            return jsonify({"code": 404, "message": "规则不存在"}), 404
+        
+        return jsonify({
+            "code": 200,
+            "data": report.to_dict(),
+            "message": "success"
+        })
+    except Exception as e:
+        error_msg = f"规则校验失败: {str(e)}"
+        logger.error(f"[错误] {error_msg}", exc_info=True)
+        return jsonify({
+            "code": 500,
+            "message": error_msg
+        }), 500
+
+@bp.route('/rules/<string:rule_id>/coverage', methods=['GET'])
+def get_rule_coverage(rule_id):
+    """规则的路径覆盖统计：每个疾病枚举的答案路径数、待答状态、无效路径、最大深度和结论分布
+
+    Query参数:
+    - version: 可选，发布的版本号或latest，为空时使用当前规则数据
+    """
+    try:
+        numeric_id = normalize_rule_id(rule_id)
+        if not numeric_id:
+            return jsonify({"code": 400, "message": "无效的规则ID"}), 400
+        
+        graph = get_rule_graph(numeric_id, request.args.get('version'))
+        if graph is None:
+            return jsonify({"code": 404, "message": "规则或版本不存在"}), 404
+        
+        return jsonify({
+            "code": 200,
+            "data": coverage(graph),
+            "message": "success"
+        })
+    except Exception as e:
+        error_msg = f"获取路径覆盖统计失败: {str(e)}"
+        logger.error(f"[错误] {error_msg}", exc_info=True)
+        return jsonify({
+            "code": 500,
+            "message": error_msg
+        }), 500
+
+@bp.route('/rules/<string:rule_id>/publish', methods=['POST'])
+def publish_rule(rule_id):
+    """发布规则，冻结当前数据为不可变的版本快照
+
+    请求体:
+        {
+            "version": "v1.0",      # 可选，为空时按时间生成
+            "force": false          # 规则校验存在错误时是否仍然发布
+        }
+    """
+    try:
+        numeric_id = normalize_rule_id(rule_id)
+        if not numeric_id:
+            return jsonify({"code": 400, "message": "无效的规则ID"}), 400
+        
+        data = request.get_json(silent=True) or {}
+        try:
+            record, report = RulePublishService.publish(
+                numeric_id,
+                version=data.get('version'),
+                published_by=data.get('published_by'),
+                force=bool(data.get('force'))
+            )
+        except ValueError as e:
+            return jsonify({"code": 400, "message": str(e)}), 400
+        
+        return jsonify({
+            "code": 200,
+            "data": dict(record.to_dict(), validation=report.summary()),
+            "message": "发布成功"
+        })
+    except Exception as e:
+        db.session.rollback()
+        error_msg = f"发布规则失败: {str(e)}"
+        logger.error(f"[错误] {error_msg}", exc_info=True)
+        return jsonify({
+            "code": 500,
+            "message": error_msg
+        }), 500
+
+@bp.route('/rules/<string:rule_id>/versions', methods=['GET'])
+@conditional(RuleVersion)
+def get_rule_versions(rule_id):
+    """获取规则已发布的版本"""
+    try:
+        numeric_id = normalize_rule_id(rule_id)
+        if not numeric_id:
+            return jsonify({"code": 400, "message": "无效的规则ID"}), 400
+        
+        versions = RulePublishService.list_versions(numeric_id)
+        return jsonify({
+            "code": 200,
+            "data": [version.to_dict() for version in versions],
+            "message": "success"
+        })
+    except Exception as e:
+        error_msg = f"获取规则版本失败: {str(e)}"
+        logger.error(f"[错误] {error_msg}", exc_info=True)
+        return jsonify({
+            "code": 500,
+            "message": error_msg
+        }), 500
+
+@bp.route('/evaluate/batch', methods=['POST'])
+def evaluate_batch_applicants():
+    """批量核保评估
+
+    请求体:
+        {
+            "product_id": 1,                     # 与rule_id二选一，通过产品的智核参数定位规则
+            "rule_id": "R001",
+            "version": "latest",                 # 可选，发布的版本号，为空时使用当前规则数据
+            "applicants": [
+                {"id": "A001", "diseases": ["D001"], "answers": {"Q001": "是"}},
+                ...
+            ]
+        }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        applicants = data.get('applicants') or []
+        if not isinstance(applicants, list) or not applicants:
+            return jsonify({"code": 400, "message": "请提供申请人答案列表"}), 400
+        
+        max_size = current_app.config.get('UNDERWRITING_BATCH_MAX_SIZE', 10000)
+        if len(applicants) > max_size:
+            return jsonify({"code": 400, "message": f"单次最多评估{max_size}个申请人"}), 400
+        
+        # 逐个检查申请人的格式，指出第一个格式有误的申请人
+        for index, applicant in enumerate(applicants):
+            error = applicant_error(applicant)
+            if error:
+                return jsonify({"code": 400, "message": f"第{index + 1}个申请人(applicants[{index}])格式有误: {error}"}), 400
+        
+        # 定位规则
+        numeric_id = normalize_rule_id(data.get('rule_id'))
+        if not numeric_id and data.get('product_id'):
+            numeric_id = db.session.query(AIParameter.rule_id) \
+                .join(Product, Product.ai_parameter_id == AIParameter.id) \
+                .filter(Product.id == data['product_id']).scalar()
+        if not numeric_id:
+            return jsonify({"code": 400, "message": "请提供有效的rule_id或已配置规则的product_id"}), 400
+        
+        try:
+            # 响应只包含精简结果，不需要构造答案路径
+            graph, results = evaluate_batch(
+                numeric_id, applicants, version=data.get('version'),
+                vector_min_batch=current_app.config.get('UNDERWRITING_VECTOR_MIN_BATCH'),
+                with_paths=False
+            )
+        except ValueError as e:
+            return jsonify({"code": 404, "message": str(e)}), 404
+        
+        summary = Counter(result.status for _, result in results)
+        logger.info(f"[批量评估] rule_id={numeric_id}, total={len(results)}, summary={dict(summary)}")
+        return jsonify({
+            "code": 200,
+            "data": {
+                'rule_id': graph.rule_id,
+                'version': graph.version,
+                'total': len(results),
+                'summary': dict(summary),
+                'results': [dict(id=applicant_id, **result.to_summary()) for applicant_id, result in results]
+            },
+            "message": "success"
+        })
+    except Exception as e:
+        error_msg = f"批量核保评估失败: {str(e)}"
+        logger.error(f"[错误] {error_msg}", exc_info=True)
+        return jsonify({
+            "code": 500,
+            "message": error_msg
+        }), 500
+
 @bp.route('/rules/<string:rule_id>/questions', methods=['GET'])
+@conditional(UnderwritingRule, Question)
 def get_rule_questions(rule_id):
     """获取规则相关的问题列表"""
     try:
@@ -285,6 +562,7 @@ def get_rule_questions(rule_id):
         }), 500
 
 @bp.route('/rules/<string:rule_id>/conclusions', methods=['GET'])
+@conditional(Answer)
 def get_rule_conclusions(rule_id):
     """获取规则相关的结论列表"""
     try:
@@ -323,40 +601,19 @@ def get_rule_conclusions(rule_id):
 
 @bp.route('/disease-categories', methods=['GET'])
 def get_disease_categories():
-    """获取疾病大类列表"""
+    """获取疾病大类列表(参考数据缓存)"""
     try:
-        logger.info("[API] 开始获取疾病大类列表")
-        logger.debug(f"[请求] 请求参数: {request.args}")
-        
-        categories = DiseaseCategory.query.all()
-        logger.info(f"[查询] 查询到疾病大类总数: {len(categories)}")
-        
-        category_list = []
-        for category in categories:
-            category_dict = {
-                'code': category.code,
-                'name': category.name,
-                'description': category.description
-            }
-            category_list.append(category_dict)
-            logger.debug(f"[数据] 处理疾病大类数据: code={category.code}, name={category.name}")
-            
-        logger.debug(f"[响应] 返回疾病大类列表数量: {len(category_list)}")
-        return jsonify({
-            "code": 200,
-            "data": category_list,
-            "message": "success"
-        })
+        return reference_cache.response(CATALOG_DISEASE_CATEGORIES, load_disease_categories)
     except Exception as e:
         error_msg = f"获取疾病大类列表失败: {str(e)}"
         logger.error(f"[错误] {error_msg}", exc_info=True)
-        logger.error(f"[堆栈] 详细错误信息:", stack_info=True)
         return jsonify({
             "code": 500,
             "message": error_msg
         }), 500
 
 @bp.route('/rules/<string:rule_id>/answers', methods=['GET'])
+@conditional(UnderwritingRule, Question, Answer)
 def get_rule_answers(rule_id):
     """获取规则相关的答案列表"""
     try:
@@ -517,11 +774,14 @@ def export_rule(rule_id):
                 "message": "规则未导入数据,无法导出"
             }), 400
             
-        # 获取规则相关的所有数据
-        questions = Question.query.filter_by(rule_id=numeric_id).all()
-        answers = Answer.query.filter_by(rule_id=numeric_id).all()
+        # 问题和答案按列投影分批读取，边读边输出，不在内存中构造整个文档
+        questions = db.session.query(
+            Question.code, Question.content, Question.question_type, Question.attribute
+        ).filter(Question.rule_id == numeric_id).order_by(Question.id).yield_per(EXPORT_BATCH_SIZE)
+        answers = db.session.query(
+            Answer.code, Answer.content, Answer.decision, Answer.em_value
+        ).filter(Answer.rule_id == numeric_id).order_by(Answer.id).yield_per(EXPORT_BATCH_SIZE)
         
-        # 构建导出数据
         export_data = {
             'rule': {
                 'id': f"R{rule.id:03d}",
@@ -530,25 +790,28 @@ def export_rule(rule_id):
                 'description': rule.description,
                 'status': rule.status
             },
-            'questions': [{
+            'questions': '@questions',
+            'answers': '@answers'
+        }
+        
+        logger.info(f"[导出] 开始输出导出数据: rule_id={numeric_id}")
+        return stream_json({
+            "code": 200,
+            "data": export_data,
+            "message": "success"
+        }, {
+            '@questions': ({
                 'code': q.code,
                 'content': q.content,
                 'question_type': q.question_type,
                 'attribute': q.attribute
-            } for q in questions],
-            'answers': [{
+            } for q in questions),
+            '@answers': ({
                 'code': a.code,
                 'content': a.content,
                 'decision': a.decision,
                 'em_value': float(a.em_value) if a.em_value else None
-            } for a in answers]
-        }
-        
-        logger.info(f"[导出] 导出数据成功: questions={len(questions)}, answers={len(answers)}")
-        return jsonify({
-            "code": 200,
-            "data": export_data,
-            "message": "success"
+            } for a in answers)
         })
     except Exception as e:
         error_msg = f"导出规则数据失败: {str(e)}"
@@ -559,6 +822,57 @@ def export_rule(rule_id):
             "message": error_msg
         }), 500
 
+@bp.route('/rules/<string:rule_id>/export/artifact', methods=['GET'])
+def export_rule_artifact(rule_id):
+    """导出编译后的规则图(二进制制品)，可通过version参数导出已发布的版本"""
+    try:
+        numeric_id = normalize_rule_id(rule_id)
+        if not numeric_id:
+            return jsonify({"code": 400, "message": "无效的规则ID"}), 400
+        
+        version = request.args.get('version')
+        data, error = UnderwritingRuleService.export_rule_artifact(numeric_id, version)
+        if data is None:
+            return jsonify({"code": 404, "message": error}), 404
+        
+        logger.info(f"[导出] 规则制品导出成功: rule_id={numeric_id}, version={version}, size={len(data)}")
+        return send_file(
+            BytesIO(data),
+            mimetype='application/octet-stream',
+            as_attachment=True,
+            download_name=f"rule_{numeric_id}_{version or 'current'}.uwr"
+        )
+    except Exception as e:
+        error_msg = f"导出规则制品失败: {str(e)}"
+        logger.error(f"[错误] {error_msg}", exc_info=True)
+        return jsonify({
+            "code": 500,
+            "message": error_msg
+        }), 500
+
+@bp.route('/imports/<string:batch_no>', methods=['GET'])
+def get_import_job(batch_no):
+    """查询导入任务进度"""
+    try:
+        status = get_job_status(batch_no)
+        if status is None:
+            return jsonify({
+                "code": 404,
+                "message": "导入任务不存在"
+            }), 404
+        return jsonify({
+            "code": 200,
+            "message": "success",
+            "data": status
+        })
+    except Exception as e:
+        error_msg = f"查询导入任务失败: {str(e)}"
+        logger.error(f"[错误] {error_msg}")
+        return jsonify({
+            "code": 500,
+            "message": error_msg
+        }), 500
+
 @bp.route('/rules/<string:rule_id>/import', methods=['POST'])
 def import_rule(rule_id):
     """导入规则数据"""
@@ -602,203 +916,24 @@ def import_rule(rule_id):
         rule = UnderwritingRule.query.get_or_404(numeric_id)
         logger.debug(f"[查询] 查询到的规则对象: id={rule.id}, name={rule.name}")
         
-        # 检查是否已导入数据
-        has_data = bool(Question.query.filter_by(rule_id=numeric_id).first())
-        if has_data:
-            # 生成新的批次号
-            import datetime
-            batch_no = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
-            logger.info(f"[导入] 规则{rule_id}已有数据，使用新批次号: {batch_no}")
-        else:
-            batch_no = '000001'  # 第一次导入使用初始批次号
-            logger.info(f"[导入] 规则{rule_id}首次导入，使用初始批次号: {batch_no}")
+        # 保存文件到临时目录，由后台任务解析和写库
+        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as temp_file:
+            file.save(temp_file.name)
+            logger.info(f"[文件] 临时保存文件到: {temp_file.name}")
 
-        try:
-            # 保存文件到临时目录
-            import tempfile
-            import pandas as pd
-            import os
-            
-            with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as temp_file:
-                file.save(temp_file.name)
-                logger.info(f"[文件] 临时保存文件到: {temp_file.name}")
-                
-                # 首先获取所有sheet名称
-                xl = pd.ExcelFile(temp_file.name)
-                sheet_names = xl.sheet_names
-                logger.info(f"[Excel] 文件包含的sheet: {sheet_names}")
-                
-                # 读取疾病数据（第一个sheet），使用第一行作为列名，跳过第二行说明，从第三行开始读取数据
-                diseases_df = pd.read_excel(temp_file.name, sheet_name=0, header=0, skiprows=[1])
-                logger.info(f"[Excel] 读取疾病sheet成功, 列名: {list(diseases_df.columns)}, 行数: {len(diseases_df)}")
-                
-                # 读取问题数据（第二个sheet），使用第一行作为列名，跳过第二行说明，从第三行开始读取数据
-                questions_df = pd.read_excel(temp_file.name, sheet_name=1, header=0, skiprows=[1])
-                logger.info(f"[Excel] 读取问题sheet成功, 列名: {list(questions_df.columns)}, 行数: {len(questions_df)}")
-                
-                # 读取答案数据（第三个sheet），使用第一行作为列名，跳过第二行说明，从第三行开始读取数据
-                answers_df = pd.read_excel(temp_file.name, sheet_name=2, header=0, skiprows=[1])
-                logger.info(f"[Excel] 读取答案sheet成功, 列名: {list(answers_df.columns)}, 行数: {len(answers_df)}")
-                
-                # 验证必需的列是否存在
-                required_disease_columns = ['疾病大类编码', '疾病大类', '疾病编码', '疾病', '疾病第一个问题编码']
-                missing_disease_columns = [col for col in required_disease_columns if col not in diseases_df.columns]
-                if missing_disease_columns:
-                    error_msg = f"疾病sheet缺少必需的列: {', '.join(missing_disease_columns)}"
-                    logger.error(f"[错误] {error_msg}")
-                    return jsonify({
-                        "code": 400,
-                        "message": error_msg
-                    }), 400
+        record = start_workbook_import(numeric_id, temp_file.name, file.filename)
+        logger.info(f"[导入] 导入任务已提交: rule_id={rule_id}, batch_no={record.batch_no}")
 
-                required_question_columns = ['问题编码', '问题内容', '问题属性', '问题类型']
-                missing_question_columns = [col for col in required_question_columns if col not in questions_df.columns]
-                if missing_question_columns:
-                    error_msg = f"问题sheet缺少必需的列: {', '.join(missing_question_columns)}"
-                    logger.error(f"[错误] {error_msg}")
-                    return jsonify({
-                        "code": 400,
-                        "message": error_msg
-                    }), 400
-
-                required_answer_columns = ['问题编码', '答案内容', '重疾结论', '医疗险结论']
-                missing_answer_columns = [col for col in required_answer_columns if col not in answers_df.columns]
-                if missing_answer_columns:
-                    error_msg = f"答案sheet缺少必需的列: {', '.join(missing_answer_columns)}"
-                    logger.error(f"[错误] {error_msg}")
-                    return jsonify({
-                        "code": 400,
-                        "message": error_msg
-                    }), 400
-                
-                logger.info(f"[解析] Excel文件解析成功: 疾病数={len(diseases_df)}, 问题数={len(questions_df)}, 答案数={len(answers_df)}")
-                
-                # 开始事务
-                # 先处理疾病数据
-                for idx, row in diseases_df.iterrows():
-                    try:
-                        # 跳过空行
-                        if pd.isna(row['疾病编码']) or pd.isna(row['疾病']):
-                            logger.debug(f"[跳过] 跳过空行 [{idx+1}]")
-                            continue
-                            
-                        disease = Disease(
-                            rule_id=numeric_id,
-                            batch_no=batch_no,  # 添加批次号
-                            category_code=str(row['疾病大类编码']),
-                            category_name=str(row['疾病大类']),
-                            code=str(row['疾病编码']),
-                            name=str(row['疾病']),
-                            first_question_code=str(row['疾病第一个问题编码']),
-                            is_common=bool(row.get('是否为常见疾病', 0)),
-                            description=str(row.get('备注', '')) if pd.notna(row.get('备注')) else None
-                        )
-                        db.session.add(disease)
-                        logger.debug(f"[导入] 添加疾病 [{idx+1}/{len(diseases_df)}]: code={disease.code}, name={disease.name}, batch_no={batch_no}")
-                    except Exception as e:
-                        logger.error(f"[错误] 处理疾病数据失败 [行 {idx+1}]: {str(e)}, 数据: {row.to_dict()}")
-                        raise
-
-                # 处理问题数据
-                for idx, row in questions_df.iterrows():
-                    try:
-                        # 跳过空行
-                        if pd.isna(row['问题编码']) or pd.isna(row['问题内容']):
-                            logger.debug(f"[跳过] 跳过空行 [{idx+1}]")
-                            continue
-                            
-                        question = Question(
-                            rule_id=numeric_id,
-                            batch_no=batch_no,  # 添加批次号
-                            question_code=str(row['问题编码']),
-                            content=str(row['问题内容']),
-                            question_type=str(row['问题属性']),
-                            attribute=str(row['问题类型'])
-                        )
-                        db.session.add(question)
-                        logger.debug(f"[导入] 添加问题 [{idx+1}/{len(questions_df)}]: code={question.question_code}, content={question.content}, batch_no={batch_no}")
-                    except Exception as e:
-                        logger.error(f"[错误] 处理问题数据失败 [行 {idx+1}]: {str(e)}, 数据: {row.to_dict()}")
-                        raise
-
-                # 处理答案（结论）数据
-                logger.info(f"[处理] 开始处理答案数据, 总行数: {len(answers_df)}")
-                logger.info(f"[数据] 答案数据列名: {list(answers_df.columns)}")
-                
-                for idx, row in answers_df.iterrows():
-                    try:
-                        # 跳过空行
-                        if pd.isna(row['问题编码']) or pd.isna(row['答案内容']):
-                            logger.debug(f"[跳过] 跳过空行 [{idx+1}]")
-                            continue
-                        
-                        logger.debug(f"[数据] 正在处理第 {idx+1} 行答案数据:")
-                        logger.debug(f"- 问题编码: {row['问题编码']}")
-                        logger.debug(f"- 答案内容: {row['答案内容']}")
-                        logger.debug(f"- 医疗险结论: {row.get('医疗险结论', 'N/A')}")
-                        logger.debug(f"- 重疾结论: {row.get('重疾结论', 'N/A')}")
-                        
-                        answer = Answer(
-                            rule_id=numeric_id,
-                            batch_no=batch_no,  # 添加批次号
-                            question_code=str(row['问题编码']),
-                            answer_content=str(row['答案内容']),
-                            medical_conclusion=str(row['医疗险结论']) if pd.notna(row.get('医疗险结论')) else None,
-                            critical_illness_conclusion=str(row['重疾结论']) if pd.notna(row.get('重疾结论')) else None,
-                            medical_special_code=str(row['医疗特殊编码']) if pd.notna(row.get('医疗特殊编码')) else None,
-                            critical_illness_special_code=str(row['重疾特殊编码']) if pd.notna(row.get('重疾特殊编码')) else None,
-                            medical_special_desc=str(row['医疗特殊描述']) if pd.notna(row.get('医疗特殊描述')) else None,
-                            critical_illness_special_desc=str(row['重疾特殊描述']) if pd.notna(row.get('重疾特殊描述')) else None,
-                            next_question_code=str(row['对应下一个问题编码']) if pd.notna(row.get('对应下一个问题编码')) else None,
-                            display_order=int(row['答案展示顺序']) if pd.notna(row.get('答案展示顺序')) else 0,
-                            remark=str(row['备注（答案解释）']) if pd.notna(row.get('备注（答案解释）')) else None
-                        )
-                        db.session.add(answer)
-                        logger.debug(f"[导入] 添加答案 [{idx+1}/{len(answers_df)}]: question_code={answer.question_code}, answer_content={answer.answer_content}, batch_no={batch_no}")
-                    except Exception as e:
-                        logger.error(f"[错误] 处理答案数据失败 [行 {idx+1}]: {str(e)}, 数据: {row.to_dict()}")
-                        raise
-                
-                # 处理疾病大类数据
-                category_codes = diseases_df['疾病大类编码'].unique()
-                for code in category_codes:
-                    if pd.isna(code):
-                        continue
-                    # 获取该大类的第一条疾病记录
-                    category_data = diseases_df[diseases_df['疾病大类编码'] == code].iloc[0]
-                    category = DiseaseCategory(
-                        rule_id=numeric_id,
-                        batch_no=batch_no,  # 添加批次号
-                        code=str(code),
-                        name=str(category_data['疾病大类'])
-                    )
-                    db.session.add(category)
-                    logger.debug(f"[导入] 添加疾病大类: code={category.code}, name={category.name}, batch_no={batch_no}")
-
-                db.session.commit()
-                logger.info(f"[导入] 导入数据成功: questions={len(questions_df)}, answers={len(answers_df)}, categories={len(category_codes)}, batch_no={batch_no}")
-                
-        except Exception as e:
-            db.session.rollback()
-            error_msg = f"导入数据失败: {str(e)}"
-            logger.error(f"[错误] {error_msg}")
-            return jsonify({
-                "code": 500,
-                "message": error_msg
-            }), 500
-
-        finally:
-            # 删除临时文件
-            try:
-                os.unlink(temp_file.name)
-                logger.info(f"[清理] 删除临时文件: {temp_file.name}")
-            except Exception as e:
-                logger.error(f"[错误] 删除临时文件失败: {str(e)}")
-            
+        # 响应体的code保持200(前端按code判断成功)，异步受理只体现在HTTP状态码202和batch_no上，
+        # 进度通过 /imports/<batch_no> 查询
         return jsonify({
             "code": 200,
-            "message": "导入成功"
-        })
+            "message": "导入任务已提交",
+            "data": {
+                "batch_no": record.batch_no,
+                "status": record.status
+            }
+        }), 202
             
     except Exception as e:
         error_msg = f"导入规则数据失败: {str(e)}"
@@ -822,6 +957,7 @@ def normalize_rule_id(rule_id):
         return None
 
 @bp.route('/rules/<string:rule_id>/disease-categories', methods=['GET'])
+@conditional(UnderwritingRule, DiseaseCategory, Disease)
 def get_rule_disease_categories(rule_id):
     try:
         logger.info(f"[API] 开始获取规则关联的疾病大类列表, rule_id: {rule_id}")
@@ -876,6 +1012,7 @@ def get_rule_disease_categories(rule_id):
         }), 500
 
 @bp.route('/rules/<string:rule_id>/diseases', methods=['GET'])
+@conditional(UnderwritingRule, Disease)
 def get_rule_diseases(rule_id):
     try:
         logger.info(f"[API] 开始获取规则关联的疾病列表, rule_id: {rule_id}")
@@ -927,21 +1064,7 @@ def get_rule_diseases(rule_id):
 def get_all_diseases():
     """获取所有疾病数据（用于调试）"""
     try:
-        logger.info("[API] 开始获取所有疾病数据")
-        diseases = Disease.query.all()
-        logger.info(f"[查询] 查询到疾病总数: {len(diseases)}")
-        
-        disease_list = []
-        for disease in diseases:
-            disease_dict = disease.to_dict()
-            disease_list.append(disease_dict)
-            logger.debug(f"[数据] 疾病: id={disease.id}, code={disease.code}, name={disease.name}, rule_id={disease.rule_id}, category_id={disease.category_id}")
-            
-        return jsonify({
-            "code": 200,
-            "data": disease_list,
-            "message": "success"
-        })
+        return reference_cache.response(CATALOG_ALL_DISEASES, load_all_diseases)
     except Exception as e:
         error_msg = f"获取所有疾病数据失败: {str(e)}"
         logger.error(f"[错误] {error_msg}", exc_info=True)
@@ -955,21 +1078,7 @@ def get_all_diseases():
 def get_all_categories():
     """获取所有疾病大类数据（用于调试）"""
     try:
-        logger.info("[API] 开始获取所有疾病大类数据")
-        categories = DiseaseCategory.query.all()
-        logger.info(f"[查询] 查询到疾病大类总数: {len(categories)}")
-        
-        category_list = []
-        for category in categories:
-            category_dict = category.to_dict()
-            category_list.append(category_dict)
-            logger.debug(f"[数据] 疾病大类: id={category.id}, code={category.code}, name={category.name}, rule_id={category.rule_id}")
-            
-        return jsonify({
-            "code": 200,
-            "data": category_list,
-            "message": "success"
-        })
+        return reference_cache.response(CATALOG_ALL_CATEGORIES, load_all_categories)
     except Exception as e:
         error_msg = f"获取所有疾病大类数据失败: {str(e)}"
         logger.error(f"[错误] {error_msg}", exc_info=True)
@@ -979,6 +1088,15 @@ def get_all_categories():
             "message": error_msg
         }), 500
 
+@bp.route('/reference-cache/stats', methods=['GET'])
+def get_reference_cache_stats():
+    """参考数据缓存的命中统计"""
+    return jsonify({
+        "code": 200,
+        "data": reference_cache.stats(),
+        "message": "success"
+    })
+
 @bp.route('/rules/<string:rule_id>/diseases/associate', methods=['POST'])
 def associate_rule_diseases(rule_id):
     """关联规则和疾病"""
@@ -1026,6 +1144,8 @@ def associate_rule_diseases(rule_id):
                 logger.info(f"[关联] 疾病大类 {category.code} 关联到规则 {rule_id}")
                 
         db.session.commit()
+        invalidate_rule_graph(numeric_id)
+        invalidate_reference_data('associate_diseases')
         logger.info(f"[成功] 成功关联 {len(diseases)} 个疾病和 {len(category_ids)} 个疾病大类到规则 {rule_id}")
         
         return jsonify({
@@ -0,0 +1,150 @@
+"""问卷会话接口：逐题作答，每一步只返回下一个问题"""
+from flask import request, jsonify
+
+from app.services.underwriting.questionnaire_session import (
+    SessionError,
+    create_session,
+    get_session,
+    session_state,
+    session_store,
+    submit_answer
+)
+from app.utils.logging import get_logger
+from app.views.underwriting.routes import bp, normalize_rule_id
+
+logger = get_logger(__name__)
+
+
+def _session_token():
+    """会话令牌：请求头 X-Session-Token 或请求体中的token"""
+    data = request.get_json(silent=True) or {}
+    return request.headers.get('X-Session-Token') or data.get('token') or request.args.get('token')
+
+
+def _not_found(session_id):
+    return jsonify({
+        "code": 404,
+        "message": f"会话不存在或已过期: {session_id}，请携带会话令牌重试或重新创建会话"
+    }), 404
+
+
+@bp.route('/sessions', methods=['POST'])
+def create_questionnaire_session():
+    """创建问卷会话
+
+    请求体:
+        {
+            "rule_id": "R1",                  # 规则ID
+            "diseases": ["D001", ...],        # 申请人选择的疾病
+            "version": "latest",              # 可选，发布的版本号或latest，为空时使用当前规则数据
+            "answers": {"Q001": "是"}         # 可选，已知的答案
+        }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        rule_id = normalize_rule_id(data.get('rule_id'))
+        if not rule_id:
+            return jsonify({"code": 400, "message": "无效的规则ID"}), 400
+
+        try:
+            session = create_session(rule_id, data.get('diseases') or [], data.get('version'), data.get('answers'))
+        except SessionError as e:
+            return jsonify({"code": 400, "message": str(e)}), 400
+
+        return jsonify({
+            "code": 200,
+            "data": session_state(session),
+            "message": "success"
+        })
+    except Exception as e:
+        error_msg = f"创建问卷会话失败: {str(e)}"
+        logger.error(f"[错误] {error_msg}", exc_info=True)
+        return jsonify({
+            "code": 500,
+            "message": error_msg
+        }), 500
+
+
+@bp.route('/sessions/<string:session_id>', methods=['GET'])
+def get_questionnaire_session(session_id):
+    """获取会话的当前状态(下一个问题或核保结果)"""
+    try:
+        try:
+            session = get_session(session_id, _session_token())
+        except SessionError as e:
+            return jsonify({"code": 400, "message": str(e)}), 400
+        if session is None:
+            return _not_found(session_id)
+
+        return jsonify({
+            "code": 200,
+            "data": session_state(session),
+            "message": "success"
+        })
+    except Exception as e:
+        error_msg = f"获取问卷会话失败: {str(e)}"
+        logger.error(f"[错误] {error_msg}", exc_info=True)
+        return jsonify({
+            "code": 500,
+            "message": error_msg
+        }), 500
+
+
+@bp.route('/sessions/<string:session_id>/answers', methods=['POST'])
+def answer_questionnaire_session(session_id):
+    """提交一个问题的答案，返回下一个问题
+
+    请求体:
+        {
+            "question_code": "Q001",
+            "answer": "是",                  # 多选题传列表
+            "token": "..."                   # 可选，会话不在当前进程中时用于恢复
+        }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        question_code = data.get('question_code') or data.get('questionCode')
+        if not question_code:
+            return jsonify({"code": 400, "message": "问题编码不能为空"}), 400
+
+        try:
+            session = get_session(session_id, _session_token())
+            if session is None:
+                return _not_found(session_id)
+            submit_answer(session, question_code, data.get('answer', data.get('answer_content')))
+        except SessionError as e:
+            return jsonify({"code": 400, "message": str(e)}), 400
+
+        return jsonify({
+            "code": 200,
+            "data": session_state(session),
+            "message": "success"
+        })
+    except Exception as e:
+        error_msg = f"提交答案失败: {str(e)}"
+        logger.error(f"[错误] {error_msg}", exc_info=True)
+        return jsonify({
+            "code": 500,
+            "message": error_msg
+        }), 500
+
+
+@bp.route('/sessions/<string:session_id>', methods=['DELETE'])
+def delete_questionnaire_session(session_id):
+    """结束会话"""
+    session_store.delete(session_id)
+    return jsonify({
+        "code": 200,
+        "data": None,
+        "message": "success"
+    })
+
+
+@bp.route('/sessions/stats', methods=['GET'])
+def get_questionnaire_session_stats():
+    """会话缓存统计"""
+    return jsonify({
+        "code": 200,
+        "data": session_store.stats(),
+        "message": "success"
+    })
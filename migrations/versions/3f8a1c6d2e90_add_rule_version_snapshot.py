@@ -0,0 +1,38 @@
+"""add rule version snapshot
+
+Revision ID: 3f8a1c6d2e90
+Revises: 7c2d9e41a3b5
+Create Date: 2026-10-18 14:03:52.118406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f8a1c6d2e90'
+down_revision = '7c2d9e41a3b5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('rule_versions', sa.Column('rule_id', sa.Integer(), nullable=True))
+    op.add_column('rule_versions', sa.Column('snapshot', sa.JSON(), nullable=True))
+    op.add_column('rule_versions', sa.Column('checksum', sa.String(length=64), nullable=True))
+    op.add_column('rule_versions', sa.Column('published_at', sa.DateTime(), nullable=True))
+    op.add_column('rule_versions', sa.Column('published_by', sa.String(length=50), nullable=True))
+    op.create_foreign_key('fk_rule_versions_rule', 'rule_versions', 'underwriting_rules', ['rule_id'], ['id'])
+    op.create_index('ix_rule_versions_rule_id', 'rule_versions', ['rule_id'])
+    op.create_unique_constraint('uq_rule_versions_rule_version', 'rule_versions', ['rule_id', 'version'])
+
+
+def downgrade():
+    op.drop_constraint('uq_rule_versions_rule_version', 'rule_versions', type_='unique')
+    op.drop_index('ix_rule_versions_rule_id', table_name='rule_versions')
+    op.drop_constraint('fk_rule_versions_rule', 'rule_versions', type_='foreignkey')
+    op.drop_column('rule_versions', 'published_by')
+    op.drop_column('rule_versions', 'published_at')
+    op.drop_column('rule_versions', 'checksum')
+    op.drop_column('rule_versions', 'snapshot')
+    op.drop_column('rule_versions', 'rule_id')
@@ -0,0 +1,28 @@
+"""add import progress
+
+Revision ID: 7c2d9e41a3b5
+Revises: 455d66280d20
+Create Date: 2026-10-18 10:12:31.402118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2d9e41a3b5'
+down_revision = '455d66280d20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('rule_import_records', sa.Column('progress', sa.JSON(), nullable=True))
+    op.add_column('rule_import_records', sa.Column('started_at', sa.DateTime(), nullable=True))
+    op.add_column('rule_import_records', sa.Column('finished_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('rule_import_records', 'finished_at')
+    op.drop_column('rule_import_records', 'started_at')
+    op.drop_column('rule_import_records', 'progress')
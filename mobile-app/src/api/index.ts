@@ -1,5 +1,5 @@
 import type { Product, AIParameter } from './types/product';
-import type { Disease, Question, Answer, UnderwritingResult } from './types/underwriting';
+import type { Disease, Question, Answer, UnderwritingResult, QuestionnaireSessionResponse } from './types/underwriting';
 import type { UserInfo } from './types/user';
 import type { CreateOrderRequest, Order } from './types/order';
 
@@ -186,6 +186,24 @@ export const api = {
             }, [] as Question[])
         ),
 
+    // 问卷会话：逐题作答，服务端只返回下一个问题
+    createSession: (data: { rule_id: string | number; diseases: string[]; version?: string }) =>
+        request<QuestionnaireSessionResponse>('/underwriting/sessions', {
+            method: 'POST',
+            body: JSON.stringify(data),
+        }),
+
+    getSession: (sessionId: string, token?: string) =>
+        request<QuestionnaireSessionResponse>(`/underwriting/sessions/${sessionId}`, {
+            headers: token ? { 'X-Session-Token': token } : undefined,
+        }),
+
+    answerSession: (sessionId: string, questionCode: string, answer: string | string[], token?: string) =>
+        request<QuestionnaireSessionResponse>(`/underwriting/sessions/${sessionId}/answers`, {
+            method: 'POST',
+            body: JSON.stringify({ question_code: questionCode, answer, token }),
+        }),
+
     // 核保评估
     evaluate: (data: {
         productId: number;
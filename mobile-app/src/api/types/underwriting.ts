@@ -45,4 +45,42 @@ export interface UnderwritingResult {
     insuranceType?: string;
     reason?: string;
     additionalInfo?: Record<string, any>;
-} 
\ No newline at end of file
+} 
+// 问卷会话：每一步只返回下一个问题
+export interface SessionQuestion {
+    disease_code: string;
+    disease_name?: string;
+    code: string;
+    content?: string;
+    question_type?: string;
+    attribute?: string;
+    remark?: string;
+    multiple: boolean;
+    options: Array<{
+        answer_content: string;
+        display_order: number;
+    }>;
+}
+
+export interface QuestionnaireSessionState {
+    session_id: string;
+    token: string;
+    rule_id: number;
+    version?: string;
+    status: 'pending' | 'concluded' | 'invalid';
+    next_question: SessionQuestion | null;
+    progress: {
+        answered: number;
+        diseases: number;
+        concluded: number;
+    };
+    answers: Array<{ question_code: string; answer_content: string[] }>;
+    result?: Record<string, any>;
+    errors?: Array<{ disease_code: string; message?: string }>;
+}
+
+export interface QuestionnaireSessionResponse {
+    code: number;
+    message: string;
+    data: QuestionnaireSessionState;
+}
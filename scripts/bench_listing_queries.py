@@ -0,0 +1,124 @@
+"""产品和智核参数列表的查询次数与耗时对比
+
+在SQLite内存数据库中生成数据，比较逐行延迟加载关联对象(原先的列表查询)与连接加载时，
+取一页数据并转换为字典所需的查询次数和耗时。每个产品使用不同的类型、保司、渠道和智核参数，
+是延迟加载最差的情况。
+
+用法: python scripts/bench_listing_queries.py [--rows 100] [--repeat 20]
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+# 获取项目根目录并添加到 Python 路径
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root_dir)
+
+from flask import Flask
+from sqlalchemy import event
+
+from app.extensions import db
+from app.models import (
+    Product, ProductType, InsuranceCompany, Channel, AIParameter, AIParameterType, UnderwritingRule
+)
+from app.services.business.product import ProductService
+from app.views.underwriting.ai_parameter import with_relations
+
+
+def create_bench_app() -> Flask:
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def seed(rows: int):
+    parameter_type = AIParameterType(name='类型')
+    db.session.add(parameter_type)
+    db.session.flush()
+    for i in range(rows):
+        rule = UnderwritingRule(name=f'规则{i}')
+        product_type = ProductType(name=f'类型{i}', code=f'PT{i}')
+        company = InsuranceCompany(name=f'保司{i}', code=f'IC{i}')
+        channel = Channel(name=f'渠道{i}', code=f'CH{i}')
+        db.session.add_all([rule, product_type, company, channel])
+        db.session.flush()
+        parameter = AIParameter(name=f'参数{i}', parameter_type_id=parameter_type.id, rule_id=rule.id, value='1')
+        db.session.add(parameter)
+        db.session.flush()
+        db.session.add(Product(
+            name=f'产品{i}', product_code=f'P{i}', product_type_id=product_type.id,
+            insurance_company_id=company.id, channel_id=channel.id, ai_parameter_id=parameter.id
+        ))
+    db.session.commit()
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+def measure(name: str, load, repeat: int, counter: QueryCounter) -> dict:
+    timings = []
+    queries = 0
+    for _ in range(repeat):
+        # 每次从空的会话开始，避免标识映射中已加载的对象掩盖延迟加载
+        db.session.expunge_all()
+        counter.count = 0
+        started = time.perf_counter()
+        items = [item.to_dict() for item in load()]
+        timings.append((time.perf_counter() - started) * 1000)
+        queries = counter.count
+    return {'name': name, 'rows': len(items), 'queries': queries,
+            'mean': statistics.fmean(timings), 'p50': statistics.median(timings)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='列表查询的查询次数与耗时对比')
+    parser.add_argument('--rows', type=int, default=100, help='每页条数(也是生成的数据条数)')
+    parser.add_argument('--repeat', type=int, default=20, help='每种方式重复次数')
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    with app.app_context():
+        db.create_all()
+        seed(args.rows)
+
+        counter = QueryCounter()
+        event.listen(db.engine, 'before_cursor_execute', counter)
+
+        def lazy_products():
+            return Product.query.order_by(Product.created_at.desc(), Product.id.desc()).limit(args.rows).all()
+
+        def eager_products():
+            return ProductService.get_product_list(page=1, page_size=args.rows).items
+
+        def lazy_parameters():
+            return AIParameter.query.order_by(AIParameter.created_at.desc(), AIParameter.id.desc()) \
+                .limit(args.rows).all()
+
+        def eager_parameters():
+            return with_relations(AIParameter.query) \
+                .order_by(AIParameter.created_at.desc(), AIParameter.id.desc()).limit(args.rows).all()
+
+        results = [
+            measure('products/lazy', lazy_products, args.repeat, counter),
+            measure('products/joined', eager_products, args.repeat, counter),
+            measure('parameters/lazy', lazy_parameters, args.repeat, counter),
+            measure('parameters/joined', eager_parameters, args.repeat, counter),
+        ]
+
+    print(f'rows={args.rows}, repeat={args.repeat}')
+    print(f'{"listing":<20} {"rows":>5} {"queries":>8} {"mean":>10} {"p50":>10}')
+    for r in results:
+        print(f'{r["name"]:<20} {r["rows"]:>5} {r["queries"]:>8} {r["mean"]:>8.2f}ms {r["p50"]:>8.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
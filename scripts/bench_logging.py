@@ -0,0 +1,114 @@
+"""日志管道的请求延迟对比
+
+在最小的Flask应用中模拟每个请求输出若干条日志，比较以下配置下的请求延迟:
+
+- sync-10KB: 原先的配置，请求线程中同步写文件，10KB轮转
+- sync: 请求线程中同步写文件，50MB轮转，JSON Lines
+- queue: 经队列由后台线程写文件，50MB轮转，JSON Lines
+
+用法: python scripts/bench_logging.py [--requests 2000] [--records 20]
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import statistics
+
+# 获取项目根目录并添加到 Python 路径
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root_dir)
+
+from flask import Flask, jsonify
+
+from app.logging import configure_logging, stop_logging
+
+SCENARIOS = {
+    'sync-10KB': {'LOG_QUEUE': False, 'LOG_FILE_MAX_BYTES': 10240, 'LOG_FILE_FORMAT': 'text'},
+    'sync': {'LOG_QUEUE': False, 'LOG_FILE_MAX_BYTES': 50 * 1024 * 1024, 'LOG_FILE_FORMAT': 'json'},
+    'queue': {'LOG_QUEUE': True, 'LOG_FILE_MAX_BYTES': 50 * 1024 * 1024, 'LOG_FILE_FORMAT': 'json'},
+}
+
+
+def create_bench_app(records: int) -> Flask:
+    app = Flask(__name__)
+    logger = logging.getLogger('bench.request')
+
+    @app.route('/evaluate/<int:applicant_id>')
+    def evaluate(applicant_id):
+        for step in range(records):
+            logger.info('评估步骤: applicant=%s, step=%s', applicant_id, step,
+                        extra={'applicant_id': applicant_id, 'step': step})
+        return jsonify({'code': 200, 'data': {'applicant_id': applicant_id}, 'message': 'success'})
+
+    return app
+
+
+def run(name: str, overrides: dict, requests: int, records: int, workdir: str) -> dict:
+    config = {
+        'LOG_LEVEL': 'INFO',
+        'LOG_TO_STDOUT': False,
+        'LOG_FILE': os.path.join(workdir, name, 'app.log'),
+        'LOG_FILE_BACKUP_COUNT': 10,
+        **overrides
+    }
+    configure_logging(config)
+    client = create_bench_app(records).test_client()
+
+    # 预热
+    for i in range(50):
+        client.get(f'/evaluate/{i}')
+
+    latencies = []
+    started = time.perf_counter()
+    for i in range(requests):
+        begin = time.perf_counter()
+        client.get(f'/evaluate/{i}')
+        latencies.append((time.perf_counter() - begin) * 1000)
+    elapsed = time.perf_counter() - started
+
+    # 等待队列中的日志全部写出
+    drain_started = time.perf_counter()
+    stop_logging()
+    drain = time.perf_counter() - drain_started
+    for handler in logging.getLogger().handlers[:]:
+        logging.getLogger().removeHandler(handler)
+        handler.close()
+
+    latencies.sort()
+    return {
+        'name': name,
+        'mean': statistics.fmean(latencies),
+        'p50': latencies[len(latencies) // 2],
+        'p95': latencies[int(len(latencies) * 0.95)],
+        'p99': latencies[int(len(latencies) * 0.99)],
+        'rps': requests / elapsed,
+        'drain': drain * 1000,
+        'files': len(os.listdir(os.path.join(workdir, name))),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='日志管道的请求延迟对比')
+    parser.add_argument('--requests', type=int, default=2000, help='请求数')
+    parser.add_argument('--records', type=int, default=20, help='每个请求输出的日志条数')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='逗号分隔的场景名称')
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in args.scenarios.split(','):
+            results.append(run(name, SCENARIOS[name], args.requests, args.records, workdir))
+
+    print(f'requests={args.requests}, records/request={args.records}')
+    print(f'{"scenario":<10} {"mean":>8} {"p50":>8} {"p95":>8} {"p99":>8} {"req/s":>9} {"drain":>9} {"files":>6}')
+    for r in results:
+        print(
+            f'{r["name"]:<10} {r["mean"]:>6.3f}ms {r["p50"]:>6.3f}ms {r["p95"]:>6.3f}ms {r["p99"]:>6.3f}ms '
+            f'{r["rps"]:>9.0f} {r["drain"]:>7.1f}ms {r["files"]:>6}'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""向量化评估内核与逐个疾病行走的耗时对比
+
+生成一条合成规则(默认10000个问题)和一批申请人，比较:
+
+- walk: 每个申请人逐个疾病调用 ``CompiledRule.walk``，即纯Python的图行走
+- kernel: ``vector_kernel.evaluate_many``，结果包含答案路径
+- kernel/summary: 同上，不构造答案路径(批量评估接口使用的方式)
+
+两种方式的结果逐个比较，必须完全一致。
+
+用法: python scripts/bench_vector_kernel.py [--questions 10000] [--applicants 5000] [--terminal-rate 0.1] [--repeat 3]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+
+# 获取项目根目录并添加到 Python 路径
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root_dir)
+
+from app.services.underwriting import vector_kernel
+from app.services.underwriting.rule_graph import build_compiled_rule, normalize_answers
+
+CONCLUSIONS = ('标准体', '加费', '除外', '延期', '拒保', '人工核保')
+
+
+def synthetic_rule(questions: int, diseases: int, terminal_rate: float, rng: random.Random):
+    """合成规则：每个问题2-4个答案，非终止答案指向后面不远处的问题，
+    每个答案以terminal_rate的概率为终止答案，路径平均约经过 1/terminal_rate 个问题"""
+    question_rows = [
+        {'code': f'Q{i:05d}', 'content': f'问题{i}', 'attribute': None,
+         'question_type': '0' if rng.random() < 0.1 else '1', 'remark': None}
+        for i in range(questions)
+    ]
+    answer_rows = []
+    for i in range(questions):
+        for a in range(rng.randint(2, 4)):
+            terminal = i + 1 >= questions or rng.random() < terminal_rate
+            answer_rows.append({
+                'id': len(answer_rows) + 1,
+                'question_code': f'Q{i:05d}',
+                'answer_content': f'选项{a}',
+                'next_question_code': None if terminal else f'Q{min(questions - 1, i + rng.randint(1, 50)):05d}',
+                'medical_conclusion': rng.choice(CONCLUSIONS) if terminal else None,
+                'critical_illness_conclusion': rng.choice(CONCLUSIONS) if terminal else None,
+                'medical_special_code': f'M{rng.randint(1, 20)}' if terminal and rng.random() < 0.3 else None,
+                'critical_illness_special_code': None,
+                'medical_special_desc': None,
+                'critical_illness_special_desc': None,
+                'display_order': a,
+                'remark': None
+            })
+    step = max(1, questions // diseases)
+    disease_rows = [
+        {'code': f'D{j:04d}', 'name': f'疾病{j}', 'category_code': None, 'category_name': None,
+         'first_question_code': f'Q{min(questions - 1, j * step):05d}'}
+        for j in range(diseases)
+    ]
+    return build_compiled_rule(1, 'bench', disease_rows, question_rows, answer_rows)
+
+
+def synthetic_applicants(graph, count: int, rng: random.Random):
+    """沿所选疾病的路径随机作答，少数申请人多选或中途停止(待答)"""
+    disease_codes = list(graph.diseases)
+    applicants = []
+    for n in range(count):
+        chosen = rng.sample(disease_codes, rng.randint(1, 3))
+        answers = {}
+        for code in chosen:
+            question = graph.first_question(code)
+            while question is not None and rng.random() > 0.01:
+                options = [edge.answer_content for edge in question.answers]
+                if question.is_multiple and rng.random() < 0.05:
+                    answers[question.code] = rng.sample(options, 2)
+                    break
+                answer = answers.setdefault(question.code, rng.choice(options))
+                edge = question.answer_for(answer if isinstance(answer, str) else answer[0])
+                question = graph.question(edge.next_question_code) if edge.next_question_code else None
+        applicants.append({'id': n, 'diseases': chosen, 'answers': answers})
+    return applicants
+
+
+def walk_all(graph, applicants):
+    results = []
+    for applicant in applicants:
+        answers = normalize_answers(applicant['answers'])
+        results.append(graph.summarize(graph.walk(code, answers) for code in applicant['diseases']))
+    return results
+
+
+def measure(name: str, run, repeat: int) -> dict:
+    timings = []
+    results = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        results = run()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {'name': name, 'results': results, 'mean': statistics.fmean(timings), 'best': min(timings)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='向量化评估内核与逐个疾病行走的耗时对比')
+    parser.add_argument('--questions', type=int, default=10000, help='合成规则的问题数')
+    parser.add_argument('--diseases', type=int, default=500, help='合成规则的疾病数')
+    parser.add_argument('--applicants', type=int, default=5000, help='申请人数')
+    parser.add_argument('--terminal-rate', type=float, default=0.1, help='终止答案的比例，越小路径越长')
+    parser.add_argument('--repeat', type=int, default=3, help='每种方式重复次数')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    if not vector_kernel.available():
+        print('未安装numpy，无法使用向量化内核')
+        return 1
+
+    rng = random.Random(args.seed)
+    graph = synthetic_rule(args.questions, args.diseases, args.terminal_rate, rng)
+    applicants = synthetic_applicants(graph, args.applicants, rng)
+    answer_sets = [applicant['answers'] for applicant in applicants]
+    disease_sets = [applicant['diseases'] for applicant in applicants]
+
+    started = time.perf_counter()
+    vector_kernel.table_cache.get(graph)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    runs = [
+        measure('walk', lambda: walk_all(graph, applicants), args.repeat),
+        measure('kernel', lambda: vector_kernel.evaluate_many(graph, answer_sets, disease_sets), args.repeat),
+        measure('kernel/summary', lambda: vector_kernel.evaluate_many(
+            graph, answer_sets, disease_sets, with_paths=False), args.repeat),
+    ]
+
+    expected = [result.to_dict() for result in runs[0]['results']]
+    mismatches = sum(result.to_dict() != e for result, e in zip(runs[1]['results'], expected))
+    mismatches += sum(result.to_summary() != runs[0]['results'][i].to_summary()
+                      for i, result in enumerate(runs[2]['results']))
+
+    print(f'questions={len(graph.questions)}, edges={graph.edge_count}, diseases={len(graph.diseases)}, '
+          f'applicants={len(applicants)}, repeat={args.repeat}')
+    print(f'转移表构建: {build_ms:.2f}ms (每张规则图一次)')
+    print(f'{"evaluation":<16} {"mean":>10} {"best":>10} {"speedup":>8}')
+    for r in runs:
+        print(f'{r["name"]:<16} {r["mean"]:>8.2f}ms {r["best"]:>8.2f}ms {runs[0]["mean"] / r["mean"]:>7.1f}x')
+    print(f'结果不一致: {mismatches}')
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""测试环境
+
+规则图、评估缓存、结果表、合并计划、向量化内核和规则校验都是纯Python模块，测试不需要Flask应用和数据库:
+
+- 不执行 ``app/__init__.py``(导入时会创建应用并连接数据库)，``app`` 等包直接指向源码目录
+- ``app.extensions`` 和规则模型用占位模块代替，被测模块只在编译规则(查询数据库)时才用到它们
+- 未安装Flask/SQLAlchemy时用只包含被测模块所需名称的替身模块代替
+"""
+import sys
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+PACKAGES = ('app', 'app.services', 'app.services.underwriting', 'app.utils')
+
+MODELS = {
+    'app.models.rules.core.underwriting_rule': 'UnderwritingRule',
+    'app.models.rules.core.rule_version': 'RuleVersion',
+    'app.models.rules.disease.disease': 'Disease',
+    'app.models.rules.question.question': 'Question',
+    'app.models.rules.conclusion.conclusion': 'Conclusion',
+}
+
+
+def _module(name, **attributes):
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    sys.modules[name] = module
+    return module
+
+
+def _install():
+    for name in PACKAGES:
+        package = _module(name)
+        package.__path__ = [str(ROOT.joinpath(*name.split('.')))]
+
+    _module('app.extensions', db=None)
+    for name, model in MODELS.items():
+        parts = name.split('.')
+        for i in range(2, len(parts)):
+            sys.modules.setdefault('.'.join(parts[:i]), types.ModuleType('.'.join(parts[:i])))
+        _module(name, **{model: None})
+
+    try:
+        import flask  # noqa: F401
+    except ImportError:
+        _module(
+            'flask', current_app=None, g=None, request=None, jsonify=None,
+            has_app_context=lambda: False, has_request_context=lambda: False
+        )
+    try:
+        import sqlalchemy  # noqa: F401
+    except ImportError:
+        _module('sqlalchemy', event=None, func=None, select=None)
+        _module('sqlalchemy.engine', Engine=None)
+
+
+_install()
@@ -0,0 +1,112 @@
+"""疾病评估结果缓存"""
+from app.services.underwriting.evaluation_cache import EvaluationCache, canonical_answers, reachable_questions
+from app.services.underwriting.rule_graph import build_compiled_rule, normalize_answers
+
+
+def rule():
+    """D1: Q1(单选) -> Q2(多选)；D2: Q3"""
+    return build_compiled_rule(
+        1, 'test',
+        [{'code': 'D1', 'first_question_code': 'Q1'}, {'code': 'D2', 'first_question_code': 'Q3'}],
+        [
+            {'code': 'Q1', 'question_type': '1'},
+            {'code': 'Q2', 'question_type': '0'},
+            {'code': 'Q3', 'question_type': '1'},
+        ],
+        [
+            {'id': 1, 'question_code': 'Q1', 'answer_content': '是', 'next_question_code': 'Q2'},
+            {'id': 2, 'question_code': 'Q1', 'answer_content': '否', 'medical_conclusion': '标准体'},
+            {'id': 3, 'question_code': 'Q2', 'answer_content': 'A', 'medical_conclusion': '加费'},
+            {'id': 4, 'question_code': 'Q2', 'answer_content': 'B', 'medical_conclusion': '拒保'},
+            {'id': 5, 'question_code': 'Q3', 'answer_content': '是', 'medical_conclusion': '除外'},
+        ]
+    )
+
+
+def walk_all(graph, answers):
+    def resolve(codes):
+        resolve.calls += 1
+        return [graph.walk(code, answers) for code in codes]
+    resolve.calls = 0
+    return resolve
+
+
+def test_reachable_questions():
+    graph = rule()
+    assert dict(reachable_questions(graph, 'D1')) == {'Q1': False, 'Q2': True}
+    assert dict(reachable_questions(graph, 'D9')) == {}
+
+
+def test_canonical_answers():
+    """只保留疾病可达问题的答案，按问题编码排序，单选题只保留第一个答案"""
+    graph = rule()
+    answers = normalize_answers({'Q3': '是', 'Q2': ['B', 'A'], 'Q1': ['是', '否']})
+    assert canonical_answers(graph, 'D1', answers) == (('Q1', ('是',)), ('Q2', ('B', 'A')))
+    assert canonical_answers(graph, 'D2', answers) == (('Q3', ('是',)),)
+
+
+def test_hits_ignore_unrelated_answers():
+    graph = rule()
+    cache = EvaluationCache(max_entries=100, max_bytes=1 << 20)
+    first = normalize_answers({'Q1': '否', 'Q3': '是'})
+    second = normalize_answers({'Q1': '否'})
+
+    resolve = walk_all(graph, first)
+    outcomes = cache.evaluate(graph, ['D1', 'D2'], first, resolve)
+    assert outcomes == (graph.walk('D1', first), graph.walk('D2', first))
+
+    resolve = walk_all(graph, second)
+    assert cache.evaluate(graph, ['D1'], second, resolve) == (graph.walk('D1', second),)
+    assert resolve.calls == 0
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 2, 2)
+
+
+def test_missing_diseases_are_not_cached():
+    graph = rule()
+    cache = EvaluationCache(max_entries=100, max_bytes=1 << 20)
+    answers = normalize_answers({'Q1': '否'})
+    for _ in range(2):
+        outcomes = cache.evaluate(graph, ['D9'], answers, walk_all(graph, answers))
+        assert outcomes == (graph.walk('D9', answers),)
+    assert cache.stats()['entries'] == 0
+
+
+def test_recompiled_graph_misses():
+    """规则图重新编译后构建时间戳不同，旧结果不再命中"""
+    answers = normalize_answers({'Q1': '否'})
+    cache = EvaluationCache(max_entries=100, max_bytes=1 << 20)
+    graph = rule()
+    cache.evaluate(graph, ['D1'], answers, walk_all(graph, answers))
+    recompiled = rule()
+    recompiled.stamp = graph.stamp + 1
+    resolve = walk_all(recompiled, answers)
+    cache.evaluate(recompiled, ['D1'], answers, resolve)
+    assert resolve.calls == 1
+
+
+def test_eviction():
+    graph = rule()
+    cache = EvaluationCache(max_entries=2, max_bytes=1 << 20)
+    for answers in ({'Q1': '否'}, {'Q1': '是'}, {'Q1': '是', 'Q2': 'A'}):
+        answers = normalize_answers(answers)
+        cache.evaluate(graph, ['D1'], answers, walk_all(graph, answers))
+    stats = cache.stats()
+    assert (stats['entries'], stats['evictions']) == (2, 1)
+
+    small = EvaluationCache(max_entries=100, max_bytes=1)
+    answers = normalize_answers({'Q1': '否'})
+    small.evaluate(graph, ['D1'], answers, walk_all(graph, answers))
+    assert small.stats()['entries'] == 0
+    assert small.bytes == 0
+
+
+def test_disabled():
+    graph = rule()
+    cache = EvaluationCache(max_entries=0, max_bytes=1 << 20)
+    answers = normalize_answers({'Q1': '否'})
+    resolve = walk_all(graph, answers)
+    for _ in range(2):
+        cache.evaluate(graph, ['D1'], answers, resolve)
+    assert resolve.calls == 2
+    assert cache.stats()['entries'] == 0
@@ -0,0 +1,238 @@
+"""各评估路径与 ``CompiledRule.walk`` 的一致性
+
+向量化内核、疾病结果表、评估结果缓存和合并计划都是 ``walk`` 的加速实现，
+在随机生成的规则上逐个比较结果。生成的规则包含:
+
+- 环：答案的下一个问题可以指向任意问题(包括前面的问题和自身)
+- 悬空引用：下一个问题或疾病入口指向不存在的问题
+- 只有答案、问题表中没有的问题
+- 多选题：选中多个答案时展开多条分支
+"""
+import random
+
+import pytest
+
+from app.services.underwriting import merged_plan, outcome_table, rule_graph, vector_kernel
+from app.services.underwriting.evaluation_cache import evaluation_cache
+from app.services.underwriting.rule_graph import build_compiled_rule, normalize_answers
+
+CONCLUSIONS = ('标准体', '加费', '除外', '延期', '拒保', '人工核保', None)
+SEEDS = range(40)
+
+
+def random_rule(seed, questions=14, diseases=6):
+    rng = random.Random(seed)
+    question_rows, answer_rows = [], []
+
+    def answer(question_code, content, next_code):
+        terminal = next_code is None
+        answer_rows.append({
+            'id': len(answer_rows) + 1,
+            'question_code': question_code,
+            'answer_content': content,
+            'next_question_code': next_code,
+            'medical_conclusion': rng.choice(CONCLUSIONS) if terminal else None,
+            'critical_illness_conclusion': rng.choice(CONCLUSIONS) if terminal else None,
+            'medical_special_code': rng.choice((None, 'M1', 'M2')) if terminal else None,
+            'display_order': len(answer_rows)
+        })
+
+    for i in range(questions):
+        code = f'Q{i:02d}'
+        question_rows.append({'code': code, 'question_type': '0' if rng.random() < 0.3 else '1'})
+        for a in range(rng.randint(1, 3)):
+            roll = rng.random()
+            if roll < 0.45:
+                next_code = f'Q{rng.randrange(questions):02d}'
+            elif roll < 0.5:
+                next_code = rng.choice(('QX', 'QZ'))
+            else:
+                next_code = None
+            answer(code, f'A{a}', next_code)
+
+    # QZ只有答案，QX完全不存在
+    answer('QZ', 'A0', None)
+    answer('QZ', 'A1', f'Q{rng.randrange(questions):02d}')
+
+    disease_rows = [
+        {'code': f'D{j}', 'name': f'疾病{j}', 'first_question_code': f'Q{rng.randrange(questions):02d}'}
+        for j in range(diseases)
+    ]
+    disease_rows.append({'code': 'DX', 'first_question_code': 'QX'})
+    disease_rows.append({'code': 'DZ', 'first_question_code': 'QZ'})
+    disease_rows.append({'code': 'DN', 'first_question_code': None})
+    return build_compiled_rule(seed, 'test', disease_rows, question_rows, answer_rows)
+
+
+def random_answers(graph, rng):
+    """沿疾病的路径作答，夹杂多选、无效答案、多余空白和与路径无关的答案"""
+    answers = {}
+    for code in rng.sample(sorted(graph.diseases), 3):
+        question = graph.first_question(code)
+        seen = set()
+        while question is not None and question.code not in seen and rng.random() > 0.1:
+            seen.add(question.code)
+            options = [edge.answer_content for edge in question.answers]
+            roll = rng.random()
+            if roll < 0.05:
+                answers[question.code] = 'AX'
+                break
+            if roll < 0.25 and len(options) > 1:
+                answers[question.code] = rng.sample(options, 2)
+                break
+            chosen = answers.setdefault(question.code, rng.choice(options))
+            if isinstance(chosen, str):
+                edge = question.answer_for(chosen)
+                question = graph.question(edge.next_question_code) if edge and edge.next_question_code else None
+    if rng.random() < 0.3:
+        code = rng.choice(sorted(graph.questions))
+        answers[f' {code} '] = f" {rng.choice(['A0', 'A1', 'A2'])} "
+    if rng.random() < 0.2:
+        return [{'question_code': code, 'answer_content': value} for code, value in answers.items()]
+    return answers
+
+
+def random_diseases(graph, rng):
+    if rng.random() < 0.15:
+        return None
+    codes = rng.sample(sorted(graph.diseases), rng.randint(1, 3))
+    if rng.random() < 0.1:
+        codes.append('D99')
+    if rng.random() < 0.1:
+        codes[0] = f' {codes[0]} '
+    return codes
+
+
+def expected(graph, answers, disease_codes):
+    """逐个疾病在图上行走的结果，疾病的选取与 ``CompiledRule.evaluate`` 相同"""
+    normalized = normalize_answers(answers)
+    if disease_codes is None:
+        disease_codes = [code for code, d in graph.diseases.items() if d.first_question_code in normalized]
+    return graph.summarize(graph.walk(rule_graph._clean(code), normalized) for code in disease_codes)
+
+
+def cases(seed, count=60):
+    graph = random_rule(seed)
+    rng = random.Random(seed * 7919)
+    applicants = [(random_answers(graph, rng), random_diseases(graph, rng)) for _ in range(count)]
+    return graph, applicants
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_vector_kernel_matches_walk(seed):
+    if not vector_kernel.available():
+        pytest.skip('未安装numpy')
+    graph, applicants = cases(seed)
+    answer_sets = [answers for answers, _ in applicants]
+    disease_sets = [codes for _, codes in applicants]
+
+    with_paths = vector_kernel.evaluate_many(graph, answer_sets, disease_sets)
+    summaries = vector_kernel.evaluate_many(graph, answer_sets, disease_sets, with_paths=False)
+    for (answers, codes), result, summary in zip(applicants, with_paths, summaries):
+        reference = expected(graph, answers, codes)
+        assert result.to_dict() == reference.to_dict()
+        assert summary.to_summary() == reference.to_summary()
+        assert all(not outcome.path for outcome in summary.outcomes)
+
+
+def single_answer_paths(graph, first_question_code):
+    """每个问题只回答一个答案时可能出现的全部答案组合(包括停在某个问题待答的前缀)"""
+    paths = []
+
+    def visit(question_code, answers):
+        paths.append(answers)
+        question = graph.questions.get(question_code)
+        if question is None:
+            return
+        for content in {edge.answer_content for edge in question.answers}:
+            edge = question.answer_for(content)
+            step = {**answers, question_code: (content,)}
+            if edge.is_terminal or edge.next_question_code in step:
+                paths.append(step)
+            else:
+                visit(edge.next_question_code, step)
+
+    visit(first_question_code, {})
+    return paths
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_outcome_table_matches_walk(seed):
+    """结果表恰好包含每一条单选路径(及其前缀)，且每个条目与行走的结果相同"""
+    graph = random_rule(seed)
+    tabled = 0
+    for code, disease in graph.diseases.items():
+        table, reason = outcome_table.build_table(graph, code)
+        if table is None:
+            assert reason == outcome_table.REASON_DISEASE_MISSING
+            assert not disease.first_question_code
+            continue
+        tabled += 1
+        paths = single_answer_paths(graph, disease.first_question_code)
+        assert set(table.outcomes) == {tuple(sorted(answers.items())) for answers in paths}
+        for key, outcome in table.outcomes.items():
+            assert graph.walk(code, dict(key)) == outcome
+    assert tabled
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_outcome_table_lookup_matches_walk(seed):
+    graph, applicants = cases(seed)
+    hits = 0
+    for answers, _ in applicants:
+        normalized = normalize_answers(answers)
+        for code in graph.diseases:
+            outcome = outcome_table.lookup(graph, code, normalized)
+            if outcome is not None:
+                hits += 1
+                assert outcome == graph.walk(code, normalized)
+    assert hits
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_evaluate_matches_walk(seed):
+    """``CompiledRule.evaluate`` 依次经过评估结果缓存、结果表和合并计划"""
+    graph, applicants = cases(seed)
+    evaluation_cache.clear()
+    for _ in range(2):  # 第二遍全部命中缓存
+        for answers, codes in applicants:
+            assert graph.evaluate(answers, codes).to_dict() == expected(graph, answers, codes).to_dict()
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_merged_plan_matches_walk(seed):
+    graph, applicants = cases(seed)
+    for answers, codes in applicants:
+        codes = [rule_graph._clean(code) for code in codes or graph.diseases]
+        normalized = normalize_answers(answers)
+        merged = merged_plan.evaluate_merged(graph, codes, normalized)
+        assert list(merged) == [graph.walk(code, normalized) for code in codes]
+
+
+@pytest.mark.parametrize('vector_min_batch', [0, 1])
+def test_evaluate_batch_with_paths(monkeypatch, vector_min_batch):
+    """标量和向量化两条路径对 with_paths 的处理一致"""
+    if vector_min_batch and not vector_kernel.available():
+        pytest.skip('未安装numpy')
+    graph, applicants = cases(3, count=100)
+    monkeypatch.setattr(rule_graph, 'get_rule_graph', lambda rule_id, version=None: graph)
+    batch = [{'id': i, 'answers': answers, 'diseases': codes} for i, (answers, codes) in enumerate(applicants)]
+
+    _, full = rule_graph.evaluate_batch(graph.rule_id, batch, vector_min_batch=vector_min_batch)
+    _, bare = rule_graph.evaluate_batch(graph.rule_id, batch, vector_min_batch=vector_min_batch, with_paths=False)
+    assert [i for i, _ in full] == [i for i, _ in bare] == list(range(len(batch)))
+    for (_, result), (_, summary), (answers, codes) in zip(full, bare, applicants):
+        assert result.to_dict() == expected(graph, answers, codes).to_dict()
+        assert summary.to_summary() == result.to_summary()
+        assert all(not outcome.path for outcome in summary.outcomes)
+    assert any(outcome.path for _, result in full for outcome in result.outcomes)
+
+
+def test_applicant_error():
+    assert rule_graph.applicant_error({'id': 1, 'diseases': ['D1'], 'answers': {'Q1': '是'}}) is None
+    assert rule_graph.applicant_error({'answers': [{'question_code': 'Q1', 'answer_content': '是'}]}) is None
+    assert rule_graph.applicant_error({}) is None
+    assert rule_graph.applicant_error('A001')
+    assert rule_graph.applicant_error({'diseases': 'D1'})
+    assert rule_graph.applicant_error({'answers': ['Q1']})
+    assert rule_graph.applicant_error({'answers': 'Q1'})
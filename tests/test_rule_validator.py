@@ -0,0 +1,93 @@
+"""规则图校验"""
+from app.services.underwriting import rule_validator
+from app.services.underwriting.rule_graph import build_compiled_rule
+
+
+def answer(question_code, content, next_code=None, conclusion='标准体'):
+    return {
+        'id': None,
+        'question_code': question_code,
+        'answer_content': content,
+        'next_question_code': next_code,
+        'medical_conclusion': None if next_code else conclusion
+    }
+
+
+def validate(diseases, questions, answers):
+    graph = build_compiled_rule(
+        1, 'test',
+        [{'code': code, 'first_question_code': first} for code, first in diseases],
+        [{'code': code, 'question_type': '1'} for code in questions],
+        answers
+    )
+    return rule_validator.validate_graph(graph)
+
+
+def test_valid_rule():
+    report = validate(
+        [('D1', 'Q1')], ['Q1', 'Q2'],
+        [answer('Q1', '是', 'Q2'), answer('Q1', '否'), answer('Q2', '是', conclusion='拒保'), answer('Q2', '否')]
+    )
+    assert report.valid
+    assert report.counts == {}
+    assert (report.disease_count, report.question_count, report.edge_count) == (1, 2, 4)
+
+
+def test_structure_issues():
+    report = validate(
+        [('D1', 'Q1'), ('D2', 'Q9')], ['Q1', 'Q2', 'Q3', 'Q4', 'Q5'],
+        [
+            answer('Q1', '是', 'Q2'),
+            answer('Q1', '否', 'QX'),
+            answer('Q2', '是', 'Q1'),
+            answer('Q2', '否', conclusion=None),
+            answer('Q3', '是'),
+            answer('Q4', '是', 'Q4'),
+        ]
+    )
+    assert not report.valid
+    assert report.issues[rule_validator.ISSUE_MISSING_FIRST_QUESTION] == [
+        {'disease_code': 'D2', 'first_question_code': 'Q9'}
+    ]
+    assert report.issues[rule_validator.ISSUE_DANGLING_NEXT_QUESTION] == [
+        {'question_code': 'Q1', 'answer_content': '否', 'next_question_code': 'QX'}
+    ]
+    assert report.issues[rule_validator.ISSUE_TERMINAL_WITHOUT_CONCLUSION] == [
+        {'question_code': 'Q2', 'answer_content': '否'}
+    ]
+    assert report.issues[rule_validator.ISSUE_QUESTION_WITHOUT_ANSWERS] == [{'question_code': 'Q5'}]
+    assert sorted(i['question_code'] for i in report.issues[rule_validator.ISSUE_UNREACHABLE_QUESTION]) == \
+        ['Q3', 'Q4', 'Q5']
+    assert sorted(i['question_codes'] for i in report.issues[rule_validator.ISSUE_CYCLE]) == \
+        [['Q1', 'Q2'], ['Q4']]
+
+
+def test_orphan_answers():
+    """答案所属的问题不在问题表中：报告孤立答案，以及指向它的疾病入口和下一个问题"""
+    report = validate(
+        [('D1', 'Q1'), ('D2', 'QZ')], ['Q1'],
+        [answer('Q1', '是', 'QZ'), answer('Q1', '否'), answer('QZ', '是'), answer('QY', '否')]
+    )
+    assert not report.valid
+    assert report.issues[rule_validator.ISSUE_ORPHAN_ANSWER] == [
+        {'question_code': 'QZ', 'answer_content': '是'},
+        {'question_code': 'QY', 'answer_content': '否'},
+    ]
+    assert report.issues[rule_validator.ISSUE_MISSING_QUESTION] == [
+        {'question_code': 'Q1', 'answer_content': '是', 'next_question_code': 'QZ'},
+        {'disease_code': 'D2', 'first_question_code': 'QZ'},
+    ]
+    # 孤立答案不再重复报告为不可达的问题
+    assert rule_validator.ISSUE_UNREACHABLE_QUESTION not in report.counts
+
+
+def test_issue_details_are_capped():
+    questions = [f'Q{i}' for i in range(rule_validator.MAX_ISSUES_PER_TYPE + 10)]
+    report = validate([], questions, [answer(code, '是') for code in questions])
+    assert report.counts[rule_validator.ISSUE_UNREACHABLE_QUESTION] == len(questions)
+    assert len(report.issues[rule_validator.ISSUE_UNREACHABLE_QUESTION]) == rule_validator.MAX_ISSUES_PER_TYPE
+    assert report.valid
+    assert report.summary() == {
+        'valid': True, 'error_count': 0, 'warning_count': len(questions),
+        'counts': {rule_validator.ISSUE_UNREACHABLE_QUESTION: len(questions)}
+    }